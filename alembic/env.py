@@ -34,12 +34,20 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 from app.models import SQLModel
 from app.models.user import *
+from app.models.feed import *
+from app.models.job import *
 from app.models.recipe.recipe import *
 from app.models.recipe.action import *
 from app.models.recipe.allergen import *
 from app.models.recipe.claim import *
 from app.models.recipe.unit import *
 from app.models.recipe.tool import *
+from app.models.nutrition.food_item import *
+from app.models.nutrition.nutrition_entry import *
+from app.models.nutrition.nutrition_average import *
+from app.models.nutrition.nutrition_aggregate import *
+from app.models.nutrition.outlier_flag import *
+from app.models.nutrition.system_version import *
 
 target_metadata = SQLModel.metadata
 # target_metadata = None
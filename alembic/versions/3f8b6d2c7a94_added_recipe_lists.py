@@ -0,0 +1,60 @@
+"""added recipe lists
+
+Revision ID: 3f8b6d2c7a94
+Revises: e7a1f3c95b28
+Create Date: 2026-10-19 16:48:22.915306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlmodel import sql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8b6d2c7a94'
+down_revision: Union[str, None] = 'e7a1f3c95b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('recipelist',
+    sa.Column('name', sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('private', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('recipe_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_modified_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_recipelist_name'), 'recipelist', ['name'], unique=False)
+    # A user's lists, newest first
+    op.create_index('ix_recipelist_user_id_created_at', 'recipelist', ['user_id', 'created_at'], unique=False)
+    op.create_table('recipelistrecipe',
+    sa.Column('recipe_list_id', sa.Uuid(), nullable=False),
+    sa.Column('recipe_id', sa.Uuid(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('added_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], ),
+    sa.ForeignKeyConstraint(['recipe_list_id'], ['recipelist.id'], ),
+    sa.PrimaryKeyConstraint('recipe_list_id', 'recipe_id')
+    )
+    # List pages are keyset range reads over (position, recipe_id)
+    op.create_index('ix_recipelistrecipe_list_position', 'recipelistrecipe', ['recipe_list_id', 'position', 'recipe_id'], unique=False)
+    op.create_index('ix_recipelistrecipe_recipe_id', 'recipelistrecipe', ['recipe_id'], unique=False)
+    # Recipe deletes clear the recipe out of every timeline
+    op.create_index('ix_timelineentry_recipe_id', 'timelineentry', ['recipe_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timelineentry_recipe_id', table_name='timelineentry')
+    op.drop_index('ix_recipelistrecipe_recipe_id', table_name='recipelistrecipe')
+    op.drop_index('ix_recipelistrecipe_list_position', table_name='recipelistrecipe')
+    op.drop_table('recipelistrecipe')
+    op.drop_index('ix_recipelist_user_id_created_at', table_name='recipelist')
+    op.drop_index(op.f('ix_recipelist_name'), table_name='recipelist')
+    op.drop_table('recipelist')
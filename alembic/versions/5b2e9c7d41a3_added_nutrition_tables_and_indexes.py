@@ -0,0 +1,111 @@
+"""added nutrition tables and indexes
+
+Revision ID: 5b2e9c7d41a3
+Revises: 138a796027b5
+Create Date: 2026-10-19 10:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlmodel import sql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9c7d41a3'
+down_revision: Union[str, None] = '138a796027b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('fooditem',
+    sa.Column('name', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('description', sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_fooditem_name'), 'fooditem', ['name'], unique=True)
+    op.create_table('systemversion',
+    sa.Column('version_id', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('sub_version', sa.Integer(), nullable=False),
+    sa.Column('description', sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('published_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('version_id')
+    )
+    # Latest published version: ORDER BY year, month, sub_version DESC LIMIT 1
+    op.create_index('ix_systemversion_published_order', 'systemversion', ['year', 'month', 'sub_version'], unique=False, postgresql_where=sa.text('published_at IS NOT NULL'))
+    op.create_table('nutritionentry',
+    sa.Column('food_id', sa.Uuid(), nullable=False),
+    sa.Column('nutrition_id', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('source', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('created_by', sa.Uuid(), nullable=False),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['food_id'], ['fooditem.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Aggregate rebuilds and outlier detection group by (food, nutrient)
+    # and only read the value, so they can run as index-only scans
+    op.create_index('ix_nutritionentry_food_id_nutrition_id', 'nutritionentry', ['food_id', 'nutrition_id'], unique=False, postgresql_include=['value'])
+    op.create_table('nutritionaverage',
+    sa.Column('version_id', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('food_id', sa.Uuid(), nullable=False),
+    sa.Column('nutrition_id', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['food_id'], ['fooditem.id'], ),
+    sa.PrimaryKeyConstraint('version_id', 'food_id', 'nutrition_id')
+    )
+    # The primary key covers lookups by version and food; this one serves
+    # lookups by food across versions and food item deletes
+    op.create_index('ix_nutritionaverage_food_id', 'nutritionaverage', ['food_id'], unique=False)
+    op.create_table('nutritionaggregate',
+    sa.Column('food_id', sa.Uuid(), nullable=False),
+    sa.Column('nutrition_id', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('value_sum', sa.Float(), nullable=False),
+    sa.Column('mean', sa.Float(), nullable=False),
+    sa.Column('m2', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['food_id'], ['fooditem.id'], ),
+    sa.PrimaryKeyConstraint('food_id', 'nutrition_id')
+    )
+    op.create_table('outlierflag',
+    sa.Column('entry_id', sa.Uuid(), nullable=False),
+    sa.Column('flagged_by', sa.Uuid(), nullable=True),
+    sa.Column('decision', sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('reviewed_by', sa.Uuid(), nullable=True),
+    sa.Column('reviewed_at', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['entry_id'], ['nutritionentry.id'], ),
+    sa.ForeignKeyConstraint(['flagged_by'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['reviewed_by'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Outlier detection checks for an existing flag per entry
+    op.create_index('ix_outlierflag_entry_id', 'outlierflag', ['entry_id'], unique=False)
+    # Review queue: flags by decision, oldest first
+    op.create_index('ix_outlierflag_decision_created_at', 'outlierflag', ['decision', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outlierflag_decision_created_at', table_name='outlierflag')
+    op.drop_index('ix_outlierflag_entry_id', table_name='outlierflag')
+    op.drop_table('outlierflag')
+    op.drop_table('nutritionaggregate')
+    op.drop_index('ix_nutritionaverage_food_id', table_name='nutritionaverage')
+    op.drop_table('nutritionaverage')
+    op.drop_index('ix_nutritionentry_food_id_nutrition_id', table_name='nutritionentry')
+    op.drop_table('nutritionentry')
+    op.drop_index('ix_systemversion_published_order', table_name='systemversion')
+    op.drop_table('systemversion')
+    op.drop_index(op.f('ix_fooditem_name'), table_name='fooditem')
+    op.drop_table('fooditem')
@@ -0,0 +1,50 @@
+"""added follows and timelines
+
+Revision ID: 9c4d2a8e6f10
+Revises: 5b2e9c7d41a3
+Create Date: 2026-10-19 14:02:51.730412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4d2a8e6f10'
+down_revision: Union[str, None] = '5b2e9c7d41a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('userfollow',
+    sa.Column('follower_id', sa.Uuid(), nullable=False),
+    sa.Column('followed_id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['followed_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['follower_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('follower_id', 'followed_id')
+    )
+    op.add_column('user', sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('timelineentry',
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('recipe_id', sa.Uuid(), nullable=False),
+    sa.Column('author_id', sa.Uuid(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    # Feed pages are range reads over (user_id, created_at, recipe_id)
+    sa.PrimaryKeyConstraint('user_id', 'created_at', 'recipe_id')
+    )
+    # Backfill on follow and pulling recipes of widely followed authors
+    op.create_index('ix_recipe_author_id_created_at', 'recipe', ['author_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recipe_author_id_created_at', table_name='recipe')
+    op.drop_table('timelineentry')
+    op.drop_column('user', 'follower_count')
+    op.drop_table('userfollow')
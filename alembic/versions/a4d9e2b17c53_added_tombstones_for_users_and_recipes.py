@@ -0,0 +1,42 @@
+"""added tombstones for users and recipes
+
+Revision ID: a4d9e2b17c53
+Revises: 3f8b6d2c7a94
+Create Date: 2026-10-19 18:21:37.640182
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9e2b17c53'
+down_revision: Union[str, None] = '3f8b6d2c7a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('recipe', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    # The purger's queue: only tombstoned rows are indexed
+    op.create_index('ix_user_deleted_at', 'user', ['deleted_at'], unique=False, postgresql_where=sa.text('deleted_at IS NOT NULL'))
+    op.create_index('ix_recipe_deleted_at', 'recipe', ['deleted_at'], unique=False, postgresql_where=sa.text('deleted_at IS NOT NULL'))
+    # Lookups the purger makes by the deleted user or recipe
+    op.create_index('ix_recipe_original_recipe_id', 'recipe', ['original_recipe_id'], unique=False)
+    op.create_index('ix_recipe_previous_version_id', 'recipe', ['previous_version_id'], unique=False)
+    op.create_index('ix_userrecipesave_recipe_id', 'userrecipesave', ['recipe_id'], unique=False)
+    op.create_index('ix_nutritionentry_created_by', 'nutritionentry', ['created_by'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_nutritionentry_created_by', table_name='nutritionentry')
+    op.drop_index('ix_userrecipesave_recipe_id', table_name='userrecipesave')
+    op.drop_index('ix_recipe_previous_version_id', table_name='recipe')
+    op.drop_index('ix_recipe_original_recipe_id', table_name='recipe')
+    op.drop_index('ix_recipe_deleted_at', table_name='recipe')
+    op.drop_index('ix_user_deleted_at', table_name='user')
+    op.drop_column('recipe', 'deleted_at')
+    op.drop_column('user', 'deleted_at')
@@ -0,0 +1,60 @@
+"""added background jobs
+
+Revision ID: b8e3c5a1d627
+Revises: a4d9e2b17c53
+Create Date: 2026-10-19 19:02:11.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlmodel import sql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e3c5a1d627'
+down_revision: Union[str, None] = 'a4d9e2b17c53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('job',
+    sa.Column('kind', sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('status', sql.sqltypes.AutoString(length=16), server_default='queued', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('progress_done', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('progress_total', sa.Integer(), nullable=True),
+    sa.Column('error', sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('dedupe_key', sql.sqltypes.AutoString(length=255), nullable=True),
+    sa.Column('created_by', sa.Uuid(), nullable=True),
+    sa.Column('worker', sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('run_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Workers claim queued jobs in the order they become due
+    op.create_index('ix_job_queued_run_at', 'job', ['run_at'], unique=False, postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('ix_job_running_heartbeat_at', 'job', ['heartbeat_at'], unique=False, postgresql_where=sa.text("status = 'running'"))
+    # At most one queued job per dedupe key
+    op.create_index('ix_job_queued_dedupe_key', 'job', ['dedupe_key'], unique=True, postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('ix_job_finished_at', 'job', ['finished_at'], unique=False, postgresql_where=sa.text('finished_at IS NOT NULL'))
+    op.create_index('ix_job_created_by', 'job', ['created_by'], unique=False, postgresql_where=sa.text('created_by IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_job_created_by', table_name='job', postgresql_where=sa.text('created_by IS NOT NULL'))
+    op.drop_index('ix_job_finished_at', table_name='job', postgresql_where=sa.text('finished_at IS NOT NULL'))
+    op.drop_index('ix_job_queued_dedupe_key', table_name='job', postgresql_where=sa.text("status = 'queued'"))
+    op.drop_index('ix_job_running_heartbeat_at', table_name='job', postgresql_where=sa.text("status = 'running'"))
+    op.drop_index('ix_job_queued_run_at', table_name='job', postgresql_where=sa.text("status = 'queued'"))
+    op.drop_table('job')
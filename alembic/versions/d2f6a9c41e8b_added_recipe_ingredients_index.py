@@ -0,0 +1,28 @@
+"""added recipe ingredients index
+
+Revision ID: d2f6a9c41e8b
+Revises: b8e3c5a1d627
+Create Date: 2026-10-19 21:14:52.306719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6a9c41e8b'
+down_revision: Union[str, None] = 'b8e3c5a1d627'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Containment lookups for the recipes nesting a sub-recipe, made when
+    # deleting and purging recipes; the column is json, so index it as jsonb
+    op.create_index('ix_recipe_ingredients', 'recipe', [sa.text('(ingredients::jsonb) jsonb_path_ops')], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recipe_ingredients', table_name='recipe', postgresql_using='gin')
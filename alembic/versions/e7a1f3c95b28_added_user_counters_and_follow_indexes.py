@@ -0,0 +1,44 @@
+"""added user counters and follow indexes
+
+Revision ID: e7a1f3c95b28
+Revises: 9c4d2a8e6f10
+Create Date: 2026-10-19 15:36:08.204917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a1f3c95b28'
+down_revision: Union[str, None] = '9c4d2a8e6f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('following_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('recipe_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('saves_received_count', sa.Integer(), server_default='0', nullable=False))
+    # Start every counter from the rows it counts; author_id is compared as
+    # text because older schemas stored it as a string
+    op.execute(
+        'UPDATE "user" SET '
+        'follower_count = (SELECT count(*) FROM userfollow WHERE followed_id = "user".id), '
+        'following_count = (SELECT count(*) FROM userfollow WHERE follower_id = "user".id), '
+        'recipe_count = (SELECT count(*) FROM recipe WHERE recipe.author_id::text = "user".id::text), '
+        'saves_received_count = (SELECT coalesce(sum(save_count), 0) FROM recipe WHERE recipe.author_id::text = "user".id::text)'
+    )
+    # Follower and following lists: keyset range reads, newest follow first
+    op.create_index('ix_userfollow_followed_id_created_at', 'userfollow', ['followed_id', 'created_at', 'follower_id'], unique=False)
+    op.create_index('ix_userfollow_follower_id_created_at', 'userfollow', ['follower_id', 'created_at', 'followed_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_userfollow_follower_id_created_at', table_name='userfollow')
+    op.drop_index('ix_userfollow_followed_id_created_at', table_name='userfollow')
+    op.drop_column('user', 'saves_received_count')
+    op.drop_column('user', 'recipe_count')
+    op.drop_column('user', 'following_count')
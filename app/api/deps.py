@@ -1,4 +1,6 @@
-from typing import Annotated
+import time
+import hashlib
+from typing import Annotated, Any
 from collections.abc import AsyncGenerator
 
 import jwt
@@ -8,10 +10,11 @@ from jwt.exceptions import InvalidTokenError, ExpiredSignatureError
 from pydantic import ValidationError
 
 from sqlmodel import Session
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, make_transient_to_detached
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import security
+from app.core.cache import Cache
 from app.core.config import settings
 from app.core.db import engine
 from app.models.user import TokenPayload, User
@@ -20,6 +23,10 @@ from app.models.user import TokenPayload, User
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"/login/access-token"
 )
+# Same scheme for routes anonymous users may call too
+optional_oauth2 = OAuth2PasswordBearer(
+    tokenUrl=f"/login/access-token", auto_error=False
+)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession]:
@@ -33,8 +40,45 @@ async def get_db() -> AsyncGenerator[AsyncSession]:
 SessionDep = Annotated[AsyncSession, Depends(get_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
+# Recently verified access tokens: SHA-256 digest -> (subject, exp).
+# Each entry expires together with its token.
+token_cache = Cache(
+    "verified_token",
+    maxsize=settings.TOKEN_CACHE_SIZE,
+    ttu=lambda _digest, verified, _now: verified[1],
+    timer=time.time,
+)
+
+# Column values of recently authenticated users, keyed by user ID
+user_cache = Cache(
+    "current_user", maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+def evict_user(user_id: Any) -> None:
+    """
+    Drop a user from the authentication cache after changing or deleting it.
+    """
+    user_cache.pop(str(user_id))
+
+
+def revoke_tokens(subject: Any) -> None:
+    """
+    Drop every cached verification of a subject's tokens, so they are
+    checked again in full on their next use.
+    """
+    subject = str(subject)
+    for digest, (token_subject, _) in token_cache.items():
+        if token_subject == subject:
+            token_cache.pop(digest)
+
+
+def _verify_token(token: str) -> str | None:
+    digest = hashlib.sha256(token.encode()).digest()
+    verified = token_cache.get(digest)
+    if verified is not None:
+        return verified[0]
 
-async def get_current_user(session: SessionDep, token: TokenDep) -> User:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
@@ -45,7 +89,29 @@ async def get_current_user(session: SessionDep, token: TokenDep) -> User:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = await session.get(User, token_data.sub)
+    if token_data.sub and "exp" in payload:
+        token_cache.set(digest, (token_data.sub, float(payload["exp"])))
+    return token_data.sub
+
+
+async def _load_user(session: AsyncSession, user_id: str) -> User | None:
+    data = user_cache.get(user_id)
+    if data is None:
+        user = await session.get(User, user_id)
+        if user:
+            user_cache.set(user_id, user.model_dump())
+        return user
+
+    # Attach the cached row to this session without a round-trip, so routes
+    # can still update or delete the user
+    user = User(**data)
+    make_transient_to_detached(user)
+    return await session.merge(user, load=False)
+
+
+async def get_current_user(session: SessionDep, token: TokenDep) -> User:
+    subject = _verify_token(token)
+    user = await _load_user(session, subject)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -56,6 +122,17 @@ async def get_current_user(session: SessionDep, token: TokenDep) -> User:
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
+async def get_optional_user(
+    session: SessionDep, token: Annotated[str | None, Depends(optional_oauth2)]
+) -> User | None:
+    if not token:
+        return None
+    return await get_current_user(session, token)
+
+
+OptionalUser = Annotated[User | None, Depends(get_optional_user)]
+
+
 async def get_current_active_superuser(current_user: CurrentUser) -> User:
     if not current_user.is_superuser:
         raise HTTPException(
@@ -1,12 +1,18 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from app.api.routes import login, users, recipe
+from app.core.limits import admit_writes
+from app.api.routes import login, users, recipe, recipe_lists, nutrition, limits, jobs, metrics
 
 
 # API router instance
-api_router = APIRouter()
+api_router = APIRouter(dependencies=[Depends(admit_writes)])
 
 # Register API routers
 api_router.include_router(login.router, tags=['auth'])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(recipe.router, prefix="/recipes", tags=["recipes"])
+api_router.include_router(recipe_lists.router, prefix="/recipe-lists", tags=["recipe-lists"])
+api_router.include_router(nutrition.router, tags=["nutrition"])
+api_router.include_router(limits.router, prefix="/limits", tags=["limits"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
@@ -0,0 +1,49 @@
+from typing import Any, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from sqlmodel import func, select
+
+from app.api.deps import SessionDep, CurrentUser, get_current_active_superuser
+from app.models.job import Job, JobPublic, JobsPublic
+
+
+router = APIRouter()
+
+
+@router.get("/", dependencies=[Depends(get_current_active_superuser)], response_model=JobsPublic)
+async def read_jobs(
+    session: SessionDep,
+    status: Optional[str] = None,  # e.g., "failed"
+    kind: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> Any:
+    """
+    Retrieve background jobs, newest first, optionally by status and kind.
+    """
+    filters = []
+    if status:
+        filters.append(Job.status == status)
+    if kind:
+        filters.append(Job.kind == kind)
+
+    count_result = await session.execute(select(func.count()).select_from(Job).where(*filters))
+    count = count_result.scalar()
+
+    statement = select(Job).where(*filters).order_by(Job.created_at.desc()).offset(skip).limit(limit)
+    results = await session.execute(statement)
+    return JobsPublic(data=results.scalars().all(), count=count)
+
+
+@router.get("/{job_id}", response_model=JobPublic)
+async def read_job(job_id: UUID, session: SessionDep, current_user: CurrentUser) -> Any:
+    """
+    Get the status, progress and result of a job queued by the current user.
+    """
+    job = await session.get(Job, job_id)
+    # Other users' jobs are reported as missing
+    if not job or (job.created_by != current_user.id and not current_user.is_superuser):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
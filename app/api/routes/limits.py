@@ -0,0 +1,17 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.core import limits
+from app.api.deps import get_current_active_superuser
+
+
+router = APIRouter()
+
+
+@router.get("/", dependencies=[Depends(get_current_active_superuser)], response_model=dict)
+async def read_limit_counters() -> Any:
+    """
+    Counters of every rate limiter and admission queue in this worker.
+    """
+    return limits.get_counters()
@@ -1,11 +1,11 @@
 from datetime import timedelta
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app import crud
-from app.core import security
+from app.crud import crud_user as crud
+from app.core import limits, security
 from app.core.config import settings
 from app.models.user import Token, UserPublic
 from app.api.deps import CurrentUser, SessionDep
@@ -16,14 +16,23 @@ router = APIRouter()
 
 @router.post("/login/access-token")
 async def login_access_token(
-    session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    request: Request,
+    session: SessionDep,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = await crud.authenticate(
-        session=session, email=form_data.username, password=form_data.password
-    )
+    # Throttle before spending any time on hashing
+    ip = limits.client_ip(request)
+    limits.rate_limit(limits.login_ip_limiter, ip)
+    # Per account across all clients, so spreading guesses over many IPs
+    # doesn't multiply the attempts an account gets
+    limits.rate_limit(limits.login_account_limiter, form_data.username.lower())
+    async with limits.auth_limiter:
+        user = await crud.authenticate(
+            session=session, email=form_data.username, password=form_data.password
+        )
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Response
+
+from app.core import metrics
+
+
+router = APIRouter()
+
+
+@router.get("", include_in_schema=False)
+async def read_metrics() -> Response:
+    """
+    Metrics in the Prometheus text format, for scraping. Covers every worker
+    when PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
 from uuid import UUID
-from typing import List, Optional
+from typing import Annotated, List, Literal, Optional
 
 from sqlmodel import select
 
+from app.core.config import settings
+from app.core.jobs import enqueue
+from app.models.job import Job, JobPublic
 from app.models.user import Message
 from app.crud import crud_nutrition as crud
-from app.api.deps import SessionDep, CurrentUser
+from app.api.deps import SessionDep, CurrentUser, get_current_active_superuser
 from app.models.nutrition.food_item import *
 from app.models.nutrition.nutrition_entry import *
 from app.models.nutrition.nutrition_average import *
+from app.models.nutrition.nutrition_aggregate import *
 from app.models.nutrition.outlier_flag import *
 from app.models.nutrition.system_version import *
+from app.utils import nutrition_import, version_diff
 
 
 router = APIRouter()
@@ -20,7 +25,7 @@ router = APIRouter()
 async def create_food(
     food_in: FoodItemCreate,
     session: SessionDep,
-    current_user: CurrentUser,  # Add auth if needed
+    current_user: CurrentUser,
 ) -> FoodItem:
     """
     Create a new food item.
@@ -40,6 +45,23 @@ async def read_foods(
     return await crud.get_food_items(session=session, skip=skip, limit=limit)
 
 
+@router.get("/foods/nutrition", response_model=FoodNutritionMatrix)
+async def get_foods_nutrition(
+    *,
+    food_ids: Annotated[List[UUID], Query(min_length=1, max_length=500)],
+    version: Optional[str] = None,
+    session: SessionDep,
+    response: Response,
+) -> FoodNutritionMatrix:
+    """
+    Get nutrition averages for many food items as a food x nutrient matrix (latest or by version).
+    """
+    version_id = version or await crud.get_latest_version_id(session=session)
+    matrix = await crud.get_food_nutrition_matrix(session=session, version_id=version_id, food_ids=food_ids)
+    await _set_cache_headers(session, response, version)
+    return matrix
+
+
 @router.get("/foods/{food_id}", response_model=FoodItemPublic)
 async def read_food(
     food_id: str,
@@ -54,7 +76,11 @@ async def read_food(
     return food
 
 
-@router.patch("/foods/{food_id}", response_model=FoodItemPublic)
+@router.patch(
+    "/foods/{food_id}",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=FoodItemPublic,
+)
 async def update_food(
     food_id: str,
     food_in: FoodItemUpdate,
@@ -66,7 +92,11 @@ async def update_food(
     return await crud.update_food_item(session=session, food_id=food_id, food_in=food_in)
 
 
-@router.delete("/foods/{food_id}", response_model=Message)
+@router.delete(
+    "/foods/{food_id}",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=Message,
+)
 async def delete_food(
     food_id: str,
     session: SessionDep,
@@ -80,46 +110,37 @@ async def delete_food(
 @router.get("/foods/{food_id}/nutrition", response_model=dict)
 async def get_food_nutrition(
     *,
-    food_id: str,
+    food_id: UUID,
     version: Optional[str] = None,  # e.g., "1.0.3.1"
     session: SessionDep,
+    response: Response,
 ) -> dict:
     """
     Get nutrition averages for a food item (latest or by version).
     """
-    # If version is provided, fetch specific version; else fetch latest
-    if version:
-        averages = await session.exec(
-            select(NutritionAverage)
-            .where(NutritionAverage.food_id == food_id)
-            .where(NutritionAverage.version_id == version)
-        )
-    else:
-        # Find the latest version
-        latest_version = await session.exec(
-            select(SystemVersion)
-            .order_by(SystemVersion.year.desc(), SystemVersion.month.desc(), SystemVersion.sub_version.desc())
-            .limit(1)
-        )
-        latest_version = latest_version.first()
-        if not latest_version:
-            raise HTTPException(status_code=404, detail="No system versions found")
-        version = latest_version.version_id
-        averages = await session.exec(
-            select(NutritionAverage)
-            .where(NutritionAverage.food_id == food_id)
-            .where(NutritionAverage.version_id == version)
-        )
-
-    # Format response
-    nutrition_data = {}
-    for avg in averages:
-        nutrition_data[avg.nutrition_id] = {
-            "value": avg.value,
-            "unit": "kJ"  # Replace with actual unit from NutritionMetadata
-        }
-
-    return nutrition_data
+    version_id = version or await crud.get_latest_version_id(session=session)
+    nutrition = await crud.get_food_nutrition(session=session, version_id=version_id, food_ids=[food_id])
+    await _set_cache_headers(session, response, version)
+    return nutrition[food_id]
+
+
+async def _set_cache_headers(session: SessionDep, response: Response, version: Optional[str]) -> None:
+    # Published versions never change; "latest" moves whenever one is published
+    if version is None:
+        response.headers["Cache-Control"] = f"public, max-age={settings.LATEST_VERSION_CACHE_SECONDS}"
+    elif await crud.is_version_published(session=session, version_id=version):
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+
+
+@router.get("/foods/{food_id}/aggregates", response_model=List[NutritionAggregatePublic])
+async def read_food_aggregates(
+    food_id: UUID,
+    session: SessionDep,
+) -> List[NutritionAggregate]:
+    """
+    Get the running count, mean and variance of every nutrient recorded for a food item.
+    """
+    return await crud.get_nutrition_aggregates(session=session, food_id=food_id)
 
 
 @router.post("/nutrition-entries/", response_model=NutritionEntryPublic, status_code=status.HTTP_201_CREATED)
@@ -134,6 +155,30 @@ async def create_nutrition_entry(
     return await crud.create_nutrition_entry(session=session, entry_in=entry_in, user=current_user)
 
 
+@router.post("/nutrition-entries/import", response_model=NutritionImportResult)
+async def import_nutrition_entries(
+    request: Request,
+    session: SessionDep,
+    current_user: CurrentUser,
+    format: Literal["csv", "ndjson"] = "csv",
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+) -> NutritionImportResult:
+    """
+    Bulk import nutrition entries from a raw CSV or NDJSON request body.
+
+    CSV needs a header row; both formats take food_id, nutrition_id, value
+    and an optional source. Retrying an upload with the same Idempotency-Key
+    skips rows that were already imported; without a key every upload is new.
+    """
+    return await nutrition_import.import_nutrition_entries(
+        session=session,
+        chunks=request.stream(),
+        format=format,
+        user=current_user,
+        import_key=idempotency_key,
+    )
+
+
 @router.get("/nutrition-entries/{entry_id}", response_model=NutritionEntryPublic)
 async def read_nutrition_entry(
     entry_id: UUID,
@@ -163,27 +208,34 @@ async def read_nutrition_entries(
 @router.patch("/nutrition-entries/{entry_id}", response_model=NutritionEntryPublic)
 async def update_nutrition_entry(
     entry_id: UUID,
-    entry_in: NutritionEntryCreate,
+    entry_in: NutritionEntryUpdate,
     session: SessionDep,
+    current_user: CurrentUser,
 ) -> NutritionEntry:
     """
-    Update a nutrition entry.
+    Update one of your nutrition entries, or anyone's as a superuser.
     """
-    return await crud.update_nutrition_entry(session=session, entry_id=entry_id, entry_in=entry_in)
+    return await crud.update_nutrition_entry(session=session, entry_id=entry_id, entry_in=entry_in, user=current_user)
 
 
 @router.delete("/nutrition-entries/{entry_id}", response_model=Message)
 async def delete_nutrition_entry(
     entry_id: UUID,
     session: SessionDep,
+    current_user: CurrentUser,
 ) -> Message:
     """
-    Delete a nutrition entry.
+    Delete one of your nutrition entries, or anyone's as a superuser.
     """
-    return await crud.delete_nutrition_entry(session=session, entry_id=entry_id)
+    return await crud.delete_nutrition_entry(session=session, entry_id=entry_id, user=current_user)
 
 
-@router.post("/nutrition-averages/", response_model=NutritionAveragePublic, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/nutrition-averages/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=NutritionAveragePublic,
+    status_code=status.HTTP_201_CREATED,
+)
 async def create_nutrition_average(
     average_in: NutritionAverageCreate,
     session: SessionDep,
@@ -222,7 +274,12 @@ async def read_nutrition_averages(
     return await crud.get_nutrition_averages(session=session, skip=skip, limit=limit)
 
 
-@router.post("/outlier-flags/", response_model=OutlierFlagPublic, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/outlier-flags/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=OutlierFlagPublic,
+    status_code=status.HTTP_201_CREATED,
+)
 async def create_outlier_flag(
     flag_in: OutlierFlagCreate,
     session: SessionDep,
@@ -233,6 +290,23 @@ async def create_outlier_flag(
     return await crud.create_outlier_flag(session=session, flag_in=flag_in)
 
 
+@router.post(
+    "/outlier-flags/detect",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=JobPublic,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def run_outlier_detection(session: SessionDep, current_user: CurrentUser) -> Job:
+    """
+    Queue outlier detection now instead of waiting for the scheduled run.
+    Follow the returned job at /jobs/{job_id}.
+    """
+    job = await enqueue(session, "detect_outliers", created_by=current_user.id, dedupe_key="detect_outliers")
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
 @router.get("/outlier-flags/{flag_id}", response_model=OutlierFlagPublic)
 async def read_outlier_flag(
     flag_id: int,
@@ -252,14 +326,20 @@ async def read_outlier_flags(
     session: SessionDep,
     skip: int = 0,
     limit: int = 100,
+    decision: Optional[str] = None,  # e.g., "pending"
 ) -> List[OutlierFlag]:
     """
-    Retrieve multiple outlier flags with pagination.
+    Retrieve multiple outlier flags with pagination, optionally by decision.
     """
-    return await crud.get_outlier_flags(session=session, skip=skip, limit=limit)
+    return await crud.get_outlier_flags(session=session, skip=skip, limit=limit, decision=decision)
 
 
-@router.post("/system-versions/", response_model=SystemVersionPublic, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/system-versions/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=SystemVersionPublic,
+    status_code=status.HTTP_201_CREATED,
+)
 async def create_system_version(
     version_in: SystemVersionCreate,
     session: SessionDep,
@@ -270,6 +350,82 @@ async def create_system_version(
     return await crud.create_system_version(session=session, version_in=version_in)
 
 
+@router.post(
+    "/system-versions/{version_id}/rebuild-averages",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=JobPublic,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def rebuild_system_version_averages(
+    version_id: str,
+    session: SessionDep,
+    current_user: CurrentUser,
+) -> Job:
+    """
+    Queue a rebuild of the nutrition averages of a system version from all
+    nutrition entries. Follow the returned job at /jobs/{job_id}.
+    """
+    version = await session.get(SystemVersion, version_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="System version not found")
+    if version.published_at:
+        raise HTTPException(status_code=409, detail="Published system versions cannot be changed")
+
+    job = await enqueue(
+        session,
+        "rebuild_nutrition_averages",
+        {"version_id": version_id},
+        created_by=current_user.id,
+        dedupe_key=f"rebuild_nutrition_averages:{version_id}",
+    )
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+@router.post(
+    "/system-versions/{version_id}/publish",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=SystemVersionPublic,
+)
+async def publish_system_version(
+    version_id: str,
+    session: SessionDep,
+) -> SystemVersion:
+    """
+    Publish a system version. Its nutrition averages can no longer be changed.
+    """
+    return await crud.publish_system_version(session=session, version_id=version_id)
+
+
+@router.get("/system-versions/{version_id}/diff/{target_version_id}", response_model=NutritionVersionDiff)
+async def diff_system_versions(
+    version_id: str,
+    target_version_id: str,
+    session: SessionDep,
+    threshold: Annotated[float, Query(ge=0)] = 0.01,
+    kind: Optional[Literal["added", "removed", "changed"]] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> NutritionVersionDiff:
+    """
+    Compare the nutrition averages of two system versions.
+
+    Lists (food, nutrient) pairs added or removed in the target version and
+    values that moved by more than `threshold` relative to the base version,
+    largest first.
+    """
+    return await version_diff.diff_versions(
+        session=session,
+        base_version=version_id,
+        target_version=target_version_id,
+        threshold=threshold,
+        kind=kind,
+        skip=skip,
+        limit=limit,
+    )
+
+
 @router.get("/system-versions/{version_id}", response_model=SystemVersionPublic)
 async def read_system_version(
     version_id: str,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, UploadFile, HTTPException, status, File
+from fastapi import APIRouter, UploadFile, HTTPException, Query, status, File
 
 from pydantic import ValidationError
 
@@ -6,12 +6,23 @@ from sqlmodel import func, select
 
 import uuid
 import json
-from typing import Any, Literal
+from typing import Annotated, Any, List, Literal, Optional
 
 from app.crud import crud_recipe
 from app.models.user import Message
-from app.api.deps import SessionDep, CurrentUser
-from app.models.recipe.recipe import Recipe, RecipeCreate, RecipeUpdate, RecipePublic, RecipesPublic, UserRecipeSave
+from app.api.deps import SessionDep, CurrentUser, OptionalUser, evict_user
+from app.models.recipe.recipe import (
+    Recipe,
+    RecipeCreate,
+    RecipeUpdate,
+    RecipePublic,
+    RecipesPublic,
+    RecipeIds,
+    RecipeIdsPublic,
+    UserRecipeSave,
+    FlattenedRecipePublic,
+)
+from app.utils.sub_recipes import flatten_recipe
 
 
 router = APIRouter()
@@ -50,8 +61,12 @@ async def create_recipe(
         
         # Create and save the recipe in the database
         db_recipe = await crud_recipe.create_recipe(session, recipe_in, file.filename)
+        evict_user(recipe_in.author_id)
         
         return db_recipe
+
+    except HTTPException:
+        raise
     
     except json.JSONDecodeError as e:
         raise HTTPException(
@@ -87,13 +102,16 @@ async def edit_recipe(
     if not base_recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
+    author_id = current_user.id
+
     # Create new version
     new_version = await crud_recipe.create_recipe_version(
         session=session,
         base_recipe=base_recipe,
         update_data=update_data.model_dump(exclude_unset=True),
-        current_user_id=current_user.id
+        current_user_id=author_id
     )
+    evict_user(author_id)
 
     return new_version
 
@@ -142,6 +160,21 @@ async def get_recipe_versions(
     )
 
 
+@router.get("/{recipe_id}/flattened", response_model=FlattenedRecipePublic)
+async def read_flattened_recipe(
+    recipe_id: uuid.UUID,
+    session: SessionDep,
+    servings: float | None = None,
+) -> Any:
+    """
+    Get a recipe's bill of raw materials with all sub-recipes resolved and scaled
+    """
+    recipe = await session.get(Recipe, recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return await flatten_recipe(session, recipe, servings=servings)
+
+
 @router.get(
     "",
     response_model=RecipesPublic,
@@ -150,13 +183,21 @@ async def get_recipe_versions(
 async def read_recipes(
     *,
     session: SessionDep,
+    viewer: OptionalUser,
+    ids: Annotated[Optional[List[uuid.UUID]], Query(max_length=500)] = None,
     skip: int = 0,
     limit: int = 100,
     sort: Literal["save_count", "date"] = "date"
 ) -> Any:
     """
-    Retrieve recipes with optional sorting by save_count or created_at.
+    Retrieve recipes with optional sorting by save_count or created_at, or
+    the recipes with the given ids in one query. Signed-in users also get
+    their per-recipe flags.
     """
+    if ids:
+        recipes = await crud_recipe.get_recipes_by_ids(session, viewer, ids)
+        recipes = await crud_recipe.annotate_recipes(session, viewer, recipes)
+        return RecipesPublic(data=recipes, count=len(recipes))
 
     # Create and execute statement to get count of all recipes
     count_statement = select(func.count()).select_from(Recipe)
@@ -172,7 +213,7 @@ async def read_recipes(
     # Statement to offset, limit and return recipes queried from database
     statement = select(Recipe).order_by(order_by).offset(skip).limit(limit)
     recipes_results = await session.execute(statement)
-    recipes = recipes_results.scalars().all()
+    recipes = await crud_recipe.annotate_recipes(session, viewer, recipes_results.scalars().all())
 
     return RecipesPublic(data=recipes, count=count)
 
@@ -203,6 +244,32 @@ async def read_saved_recipes(
     return RecipesPublic(data=recipes, count=count)
 
 
+@router.post("/me/saved-recipes", response_model=RecipeIdsPublic)
+async def save_recipes(
+    recipes_in: RecipeIds,
+    current_user: CurrentUser,
+    session: SessionDep,
+) -> Any:
+    """
+    Save many recipes at once. Returns the ids that were newly saved.
+    """
+    saved = await crud_recipe.save_recipes(session, current_user, recipes_in.recipe_ids)
+    return RecipeIdsPublic(recipe_ids=saved)
+
+
+@router.delete("/me/saved-recipes", response_model=RecipeIdsPublic)
+async def unsave_recipes(
+    recipe_ids: Annotated[List[uuid.UUID], Query(min_length=1, max_length=500)],
+    current_user: CurrentUser,
+    session: SessionDep,
+) -> Any:
+    """
+    Unsave many recipes at once. Returns the ids that were saved before.
+    """
+    unsaved = await crud_recipe.unsave_recipes(session, current_user, recipe_ids)
+    return RecipeIdsPublic(recipe_ids=unsaved)
+
+
 @router.post(
     "/me/saved-recipes/{recipe_id}",
     response_model=Message,
@@ -216,31 +283,7 @@ async def save_recipe(
     """
     Save a recipe to the current user's saved recipes.
     """
-    # Verify the recipe exists
-    recipe = await session.get(Recipe, recipe_id)
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-
-    # Check if the recipe is already saved
-    result = await session.execute(
-        select(UserRecipeSave).where(
-            UserRecipeSave.user_id == current_user.id,
-            UserRecipeSave.recipe_id == recipe_id,
-        )
-    )
-    existing_save = result.scalar()
-    if existing_save:
-        raise HTTPException(status_code=409, detail="Recipe already saved")
-
-    # Create the save record
-    save_record = UserRecipeSave(user_id=current_user.id, recipe_id=recipe_id)
-    session.add(save_record)
-
-    # Update the recipe's save count
-    recipe.save_count += 1
-
-    await session.commit()
-    await session.refresh(save_record)
+    await crud_recipe.save_recipe(session=session, user=current_user, recipe_id=recipe_id)
     return Message(message="Recipe saved successfully")
 
 
@@ -256,26 +299,7 @@ async def unsave_recipe(
     """
     Remove a recipe from the current user's saved recipes.
     """
-    # Find the saved recipe record
-    result = await session.execute(
-        select(UserRecipeSave).where(
-            UserRecipeSave.user_id == current_user.id,
-            UserRecipeSave.recipe_id == recipe_id,
-        )
-    )
-    save_record = result.scalar()
-    if not save_record:
-        raise HTTPException(status_code=404, detail="Saved recipe not found")
-
-    # Delete the save record
-    await session.delete(save_record)
-
-    # Update the recipe's save count
-    recipe = await session.get(Recipe, recipe_id)
-    if recipe and recipe.save_count > 0:
-        recipe.save_count -= 1
-
-    await session.commit()
+    await crud_recipe.unsave_recipe(session=session, user=current_user, recipe_id=recipe_id)
     return Message(message="Recipe unsaved successfully")
 
 
@@ -301,7 +325,9 @@ async def delete_recipe(
         )
     
     # Delete, commit and return Message response
+    author_id = recipe.author_id
     await crud_recipe.delete_recipe(session, recipe)
+    evict_user(author_id)
     return Message(message="Recipe deleted successfully")
 
 
@@ -312,6 +338,7 @@ async def delete_recipe(
 )
 async def search_recipes(
     session: SessionDep,
+    viewer: OptionalUser,
     query: str,
     skip: int = 0,
     limit: int = 50,
@@ -333,7 +360,7 @@ async def search_recipes(
         .limit(limit)
     )
     results = await session.execute(statement)
-    recipes = results.scalars().all()
+    recipes = await crud_recipe.annotate_recipes(session, viewer, results.scalars().all())
 
     return RecipesPublic(data=recipes, count=count)
 
@@ -0,0 +1,145 @@
+import uuid
+from typing import Annotated, Any, List, Optional
+
+from fastapi import APIRouter, Query, status
+
+from app.crud import crud_recipe
+from app.crud import crud_recipe_list as crud
+from app.api.deps import SessionDep, CurrentUser
+from app.models.user import Message
+from app.models.recipe.recipe import (
+    RecipeIds,
+    RecipeListCreate,
+    RecipeListPublic,
+    RecipeListRecipesPublic,
+    RecipeListsPublic,
+    RecipeListUpdate,
+)
+
+
+router = APIRouter()
+
+
+@router.post("/", response_model=RecipeListPublic, status_code=status.HTTP_201_CREATED)
+async def create_recipe_list(
+    list_in: RecipeListCreate, session: SessionDep, current_user: CurrentUser
+) -> Any:
+    """
+    Create a recipe list for the current user.
+    """
+    return await crud.create_recipe_list(session, current_user, list_in)
+
+
+@router.get("/", response_model=RecipeListsPublic)
+async def read_recipe_lists(
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_id: Optional[uuid.UUID] = None,
+    skip: int = 0,
+    limit: int = Query(default=50, ge=1, le=100),
+) -> Any:
+    """
+    Get a user's recipe lists, the current user's by default.
+    """
+    return await crud.get_recipe_lists(
+        session, owner_id=user_id or current_user.id, viewer=current_user, skip=skip, limit=limit
+    )
+
+
+@router.get("/{list_id}", response_model=RecipeListPublic)
+async def read_recipe_list(
+    list_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+) -> Any:
+    """
+    Get a recipe list.
+    """
+    return await crud.get_recipe_list(session, list_id, current_user)
+
+
+@router.patch("/{list_id}", response_model=RecipeListPublic)
+async def update_recipe_list(
+    list_id: uuid.UUID,
+    list_in: RecipeListUpdate,
+    session: SessionDep,
+    current_user: CurrentUser,
+) -> Any:
+    """
+    Rename a recipe list or change its privacy.
+    """
+    recipe_list = await crud.get_own_recipe_list(session, list_id, current_user)
+    return await crud.update_recipe_list(session, recipe_list, list_in)
+
+
+@router.delete("/{list_id}", response_model=Message)
+async def delete_recipe_list(
+    list_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+) -> Message:
+    """
+    Delete a recipe list. The recipes themselves are kept.
+    """
+    recipe_list = await crud.get_own_recipe_list(session, list_id, current_user)
+    await crud.delete_recipe_list(session, recipe_list)
+    return Message(message="Recipe list deleted successfully")
+
+
+@router.get("/{list_id}/recipes", response_model=RecipeListRecipesPublic)
+async def read_list_recipes(
+    list_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=100),
+) -> Any:
+    """
+    Get the recipes in a list, in list order.
+    """
+    recipe_list = await crud.get_recipe_list(session, list_id, current_user)
+    page = await crud.get_list_recipes(session, recipe_list, current_user, cursor=cursor, limit=limit)
+    page.data = await crud_recipe.annotate_recipes(session, current_user, page.data)
+    return page
+
+
+@router.post("/{list_id}/recipes", response_model=RecipeListPublic)
+async def add_list_recipes(
+    list_id: uuid.UUID,
+    recipes_in: RecipeIds,
+    session: SessionDep,
+    current_user: CurrentUser,
+) -> Any:
+    """
+    Append recipes to the end of a list, in the order given.
+    """
+    recipe_list = await crud.get_own_recipe_list(session, list_id, current_user)
+    await crud.add_recipes(session, recipe_list, current_user, recipes_in.recipe_ids)
+    return recipe_list
+
+
+@router.delete("/{list_id}/recipes", response_model=RecipeListPublic)
+async def remove_list_recipes(
+    list_id: uuid.UUID,
+    recipe_ids: Annotated[List[uuid.UUID], Query(min_length=1, max_length=500)],
+    session: SessionDep,
+    current_user: CurrentUser,
+) -> Any:
+    """
+    Remove recipes from a list.
+    """
+    recipe_list = await crud.get_own_recipe_list(session, list_id, current_user)
+    await crud.remove_recipes(session, recipe_list, recipe_ids)
+    return recipe_list
+
+
+@router.put("/{list_id}/recipes/order", response_model=RecipeListPublic)
+async def reorder_list_recipes(
+    list_id: uuid.UUID,
+    recipes_in: RecipeIds,
+    session: SessionDep,
+    current_user: CurrentUser,
+) -> Any:
+    """
+    Move recipes to the front of a list in the order given; the rest follow
+    in their current order.
+    """
+    recipe_list = await crud.get_own_recipe_list(session, list_id, current_user)
+    await crud.reorder_recipes(session, recipe_list, recipes_in.recipe_ids)
+    return recipe_list
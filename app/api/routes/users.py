@@ -2,14 +2,20 @@ import uuid
 from typing import Any, Literal
 
 from sqlmodel import func, select
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 
 from app.crud import crud_user as crud
+from app.crud import crud_follow, crud_recipe
+from app.core import limits
 from app.core.config import settings
 from app.api.deps import (
     CurrentUser,
     SessionDep,
+    evict_user,
     get_current_active_superuser,
+    revoke_tokens,
 )
 from app.models.recipe.recipe import (
     Recipe,
@@ -17,10 +23,13 @@ from app.models.recipe.recipe import (
     RecipesPublic,
     UserRecipeSave
 )
+from app.models.feed import FeedPublic
 from app.models.user import (
     Message,
     User,
     UserCreate,
+    UserProfile,
+    UserProfilesPublic,
     UserPublic,
     UserRegister,
     UsersPublic,
@@ -83,7 +92,8 @@ async def update_user_me(
             raise HTTPException(
                 status_code=409, detail="User with this email already exists"
             )
-    updated_user = await crud.update_user(session, current_user, user_in)
+    updated_user = await crud.update_user(session=session, db_user=current_user, user_in=user_in)
+    evict_user(current_user.id)
     return updated_user
 
 
@@ -95,6 +105,21 @@ async def read_user_me(current_user: CurrentUser) -> Any:
     return current_user
 
 
+@router.get("/me/feed", response_model=FeedPublic)
+async def read_feed(
+    current_user: CurrentUser,
+    session: SessionDep,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+) -> Any:
+    """
+    Get recipes from the users the current user follows, newest first.
+    """
+    feed = await crud_follow.get_feed(session=session, user=current_user, cursor=cursor, limit=limit)
+    feed.data = await crud_recipe.annotate_recipes(session, current_user, feed.data)
+    return feed
+
+
 @router.get("/me/my-recipes", response_model=RecipesPublic)
 async def read_user_recipes(
     current_user: CurrentUser, 
@@ -162,31 +187,7 @@ async def save_recipe(
     """
     Save a recipe to the current user's saved recipes.
     """
-    # Verify the recipe exists
-    recipe = await session.get(Recipe, recipe_id)
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-
-    # Check if the recipe is already saved
-    result = await session.execute(
-        select(UserRecipeSave).where(
-            UserRecipeSave.user_id == current_user.id,
-            UserRecipeSave.recipe_id == recipe_id,
-        )
-    )
-    existing_save = result.scalar()
-    if existing_save:
-        raise HTTPException(status_code=409, detail="Recipe already saved")
-
-    # Create the save record
-    save_record = UserRecipeSave(user_id=current_user.id, recipe_id=recipe_id)
-    session.add(save_record)
-
-    # Update the recipe's save count
-    recipe.save_count += 1
-
-    await session.commit()
-    await session.refresh(save_record)
+    await crud_recipe.save_recipe(session=session, user=current_user, recipe_id=recipe_id)
     return Message(message="Recipe saved successfully")
 
 
@@ -203,26 +204,7 @@ async def unsave_recipe(
     Remove a recipe from the current user's saved recipes.
     """
 
-    # Find the saved recipe record
-    result = await session.execute(
-        select(UserRecipeSave).where(
-            UserRecipeSave.user_id == current_user.id,
-            UserRecipeSave.recipe_id == recipe_id,
-        )
-    )
-    save_record = result.scalar()
-    if not save_record:
-        raise HTTPException(status_code=404, detail="Saved recipe not found")
-
-    # Delete the save record
-    await session.delete(save_record)
-
-    # Update the recipe's save count
-    recipe = await session.get(Recipe, recipe_id)
-    if recipe and recipe.save_count > 0:
-        recipe.save_count -= 1
-
-    await session.commit()
+    await crud_recipe.unsave_recipe(session=session, user=current_user, recipe_id=recipe_id)
     return Message(message="Recipe unsaved successfully")
 
 
@@ -235,16 +217,19 @@ async def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    await session.delete(current_user)
-    await session.commit()
+    user_id = current_user.id
+    await crud.delete_user(session=session, db_user=current_user)
+    evict_user(user_id)
+    revoke_tokens(user_id)
     return Message(message="User deleted successfully")
 
 
 @router.post("/signup", response_model=UserPublic)
-async def register_user(session: SessionDep, user_in: UserRegister) -> Any:
+async def register_user(request: Request, session: SessionDep, user_in: UserRegister) -> Any:
     """
     Create new user without the need to be logged in.
     """
+    limits.rate_limit(limits.signup_ip_limiter, limits.client_ip(request))
     user = await crud.get_user_by_email(session=session, email=user_in.email)
     if user:
         raise HTTPException(
@@ -252,7 +237,8 @@ async def register_user(session: SessionDep, user_in: UserRegister) -> Any:
             detail="The user with this email already exists in the system",
         )
     user_create = UserCreate.model_validate(user_in)
-    user = await crud.create_user(session=session, user_create=user_create)
+    async with limits.auth_limiter:
+        user = await crud.create_user(session=session, user_create=user_create)
     return user
 
 
@@ -276,6 +262,81 @@ async def read_user_by_id(
     return user
 
 
+@router.get("/{user_id}/profile", response_model=UserProfile)
+async def read_user_profile(
+    user_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+) -> Any:
+    """
+    Get a user's public profile with their follower, following and recipe counts.
+    """
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+@router.get("/{user_id}/followers", response_model=UserProfilesPublic)
+async def read_followers(
+    user_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=100),
+) -> Any:
+    """
+    Get the users following a user, most recent first.
+    """
+    return await crud_follow.get_follows(
+        session=session, user_id=user_id, direction="followers", cursor=cursor, limit=limit
+    )
+
+
+@router.get("/{user_id}/following", response_model=UserProfilesPublic)
+async def read_following(
+    user_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=100),
+) -> Any:
+    """
+    Get the users a user follows, most recent first.
+    """
+    return await crud_follow.get_follows(
+        session=session, user_id=user_id, direction="following", cursor=cursor, limit=limit
+    )
+
+
+@router.post(
+    "/{user_id}/follow",
+    response_model=Message,
+    status_code=status.HTTP_201_CREATED,
+)
+async def follow_user(
+    user_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+) -> Message:
+    """
+    Follow a user.
+    """
+    follower_id = current_user.id
+    await crud_follow.follow_user(session=session, follower=current_user, followed_id=user_id)
+    evict_user(follower_id)
+    return Message(message="User followed successfully")
+
+
+@router.delete("/{user_id}/follow", response_model=Message)
+async def unfollow_user(
+    user_id: uuid.UUID, session: SessionDep, current_user: CurrentUser
+) -> Message:
+    """
+    Unfollow a user.
+    """
+    follower_id = current_user.id
+    await crud_follow.unfollow_user(session=session, follower=current_user, followed_id=user_id)
+    evict_user(follower_id)
+    return Message(message="User unfollowed successfully")
+
+
 @router.patch(
     "/{user_id}",
     dependencies=[Depends(get_current_active_superuser)],
@@ -305,6 +366,9 @@ async def update_user(
             )
 
     db_user = await crud.update_user(session=session, db_user=db_user, user_in=user_in)
+    evict_user(user_id)
+    if not db_user.is_active:
+        revoke_tokens(user_id)
     return db_user
 
 
@@ -322,6 +386,7 @@ async def delete_user(
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    await session.delete(user)
-    await session.commit()
+    await crud.delete_user(session=session, db_user=user)
+    evict_user(user_id)
+    revoke_tokens(user_id)
     return Message(message="User deleted successfully")
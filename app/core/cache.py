@@ -0,0 +1,82 @@
+import time
+from typing import Any, Callable, Hashable
+
+from cachetools import LRUCache, TTLCache, TLRUCache
+
+
+# Registry of every in-process cache, keyed by name
+caches: dict[str, "Cache"] = {}
+
+_MISSING = object()
+
+
+def _notifying(cache_class: type, on_evict: Callable[[Hashable, Any], None]) -> type:
+    # cachetools makes room through popitem(), so that is where evictions show
+    class NotifyingCache(cache_class):
+        def popitem(self) -> tuple[Hashable, Any]:
+            key, value = super().popitem()
+            on_evict(key, value)
+            return key, value
+
+    return NotifyingCache
+
+
+class Cache:
+    """
+    Bounded in-process cache with hit/miss accounting.
+
+    Backed by an LRU cache, a TTL cache when `ttl` is given, or a per-item
+    expiry cache when `ttu` (time-to-use) is given. Each worker process has
+    its own copy, so entries must be safe to serve slightly stale or be
+    evicted explicitly on writes. `on_evict` is called with every entry
+    dropped to make room for another.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float | None = None,
+        ttu: Callable[[Hashable, Any, float], float] | None = None,
+        timer: Callable[[], float] = time.monotonic,
+        on_evict: Callable[[Hashable, Any], None] | None = None,
+    ) -> None:
+        self.name = name
+        if ttu is not None:
+            cache_class, kwargs = TLRUCache, {"ttu": ttu, "timer": timer}
+        elif ttl is not None:
+            cache_class, kwargs = TTLCache, {"ttl": ttl, "timer": timer}
+        else:
+            cache_class, kwargs = LRUCache, {}
+        if on_evict is not None:
+            cache_class = _notifying(cache_class, on_evict)
+        self._data = cache_class(maxsize=maxsize, **kwargs)
+        self.hits = 0
+        self.misses = 0
+        caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        return list(self._data.items())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
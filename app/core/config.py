@@ -71,4 +71,98 @@ class Settings(BaseSettings):
     SUPERUSERS: list[str] = os.getenv("SUPERUSER")
     SUPERUSER_PASSWORD: str = os.getenv("SUPERUSER_PASSWORD")
 
+    # Werkzeug hash method, as written at the start of stored hashes; hashes
+    # made with another method are upgraded on the next successful login
+    PASSWORD_HASH_METHOD: str = "scrypt:32768:8:1"
+    # Threads hashing passwords per worker; more requests queue for a free one
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Token bucket rate limits on auth routes, per worker
+    LOGIN_RATE_PER_IP_PER_MINUTE: float = 20
+    LOGIN_RATE_PER_IP_BURST: int = 10
+    LOGIN_RATE_PER_ACCOUNT_PER_MINUTE: float = 5
+    LOGIN_RATE_PER_ACCOUNT_BURST: int = 5
+    SIGNUP_RATE_PER_IP_PER_MINUTE: float = 5
+    SIGNUP_RATE_PER_IP_BURST: int = 5
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    # Addresses of the reverse proxies in front of the API, whose
+    # X-Forwarded-For / Forwarded headers name the client ("*" trusts any)
+    FORWARDED_ALLOW_IPS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+
+    # Admission control: concurrent password-hashing requests, concurrent
+    # requests per write route, and how many may queue for how long
+    AUTH_CONCURRENCY_LIMIT: int = 8
+    WRITE_CONCURRENCY_LIMIT: int = 16
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+
+    # Verified access tokens kept per worker until they expire
+    TOKEN_CACHE_SIZE: int = 10_000
+
+    # Authenticated users kept per worker; changes made elsewhere show up within the TTL
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_SIZE: int = 10_000
+
+    # Follow feed: authors with more followers than this are not fanned out
+    # to follower timelines but merged in when the feed is read
+    FEED_FANOUT_MAX_FOLLOWERS: int = 10_000
+    # Recent recipes copied into a timeline when following someone
+    FEED_BACKFILL_SIZE: int = 50
+
+    # Deleted users and recipes are tombstoned, then purged by a background job
+    # in batches of this many rows, each in its own transaction
+    PURGE_BATCH_SIZE: int = 500
+
+    # Background jobs: workers started in each API process (0 when they run
+    # apart, via `python -m app.worker`), how often idle workers look for
+    # jobs, and how often running jobs report they are alive
+    JOB_WORKERS: int = 2
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_HEARTBEAT_SECONDS: int = 15
+    # Running jobs silent for this long are assumed lost and requeued
+    JOB_STALE_SECONDS: int = 120
+    # Failed attempts are retried after exponential backoff, up to this many
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 5.0
+    JOB_RETRY_MAX_SECONDS: float = 600.0
+    # Finished jobs are kept this long for their status and result
+    JOB_RETENTION_DAYS: int = 7
+
+    # Per-request SQL timing: a Server-Timing header on each response, and
+    # every statement logged (up to a cap) for requests slower than this
+    SERVER_TIMING_HEADER: bool = True
+    SLOW_REQUEST_MS: float = 1000
+    SLOW_REQUEST_MAX_QUERIES: int = 200
+    # N+1 detection, for development and tests: "warn" logs and "raise" fails
+    # when a request runs one statement shape more than N_PLUS_ONE_THRESHOLD
+    # times, or an AsyncSession lazy loads a relationship
+    N_PLUS_ONE_CHECK: Literal["off", "warn", "raise"] = "off"
+    N_PLUS_ONE_THRESHOLD: int = 10
+    # How often event loop lag, pool and cache figures are sampled for /metrics
+    METRICS_SAMPLE_SECONDS: float = 1.0
+
+    # Flattened sub-recipe bills of materials kept per worker
+    RECIPE_FLATTEN_CACHE_SIZE: int = 4096
+
+    # Automatic outlier detection over nutrition entries (modified z-score)
+    OUTLIER_Z_THRESHOLD: float = 3.5
+    OUTLIER_MIN_GROUP_SIZE: int = 5
+    OUTLIER_FLAG_BATCH_SIZE: int = 1000
+    # Entries held in memory while scoring, plus the rest of the group they end in
+    OUTLIER_SCAN_BATCH_SIZE: int = 20000
+    # 0 disables the scheduled job; it can still be queued on demand
+    OUTLIER_DETECTION_INTERVAL_MINUTES: int = 0
+
+    # Bulk nutrition entry imports
+    NUTRITION_IMPORT_CHUNK_SIZE: int = 5000
+    NUTRITION_IMPORT_MAX_ERRORS: int = 1000
+
+    # Food nutrition lookups (published versions never change)
+    LATEST_VERSION_CACHE_SECONDS: int = 60
+    # Local directory for memory-mapped snapshots of published versions
+    NUTRITION_SNAPSHOT_DIR: str = "snapshots"
+    NUTRITION_SNAPSHOT_CACHE_SIZE: int = 8
+    # Computed diffs between two published versions kept per worker
+    NUTRITION_DIFF_CACHE_SIZE: int = 16
+
 settings = Settings()  # type: ignore
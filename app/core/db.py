@@ -1,13 +1,18 @@
+import time
 import logging
 from jsonschema.exceptions import ValidationError
 
 from sqlmodel import select, SQLModel
+from sqlalchemy import event
+from sqlalchemy.orm import Session, ORMExecuteState, with_loader_criteria
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 from app.crud import crud_user
 
 from app.core.config import settings
+from app.core.metrics import POOL_WAITING, POOL_WAIT_SECONDS
 from app.utils.data_loader import load_data
 
 from app.models.user import User, UserCreate
@@ -25,15 +30,45 @@ from app.models.recipe.thickness import Thickness
 from app.models.recipe.container import Container
 
 
+class TimedPool(AsyncAdaptedQueuePool):
+    """
+    The default async pool, also measuring how long checkouts wait.
+    """
+
+    def _do_get(self):
+        POOL_WAITING.inc()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAITING.dec()
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+
 # Use an async engine
 DATABASE_URL = str(settings.SQLALCHEMY_DATABASE_URI)
-engine = create_async_engine(DATABASE_URL, pool_size=10)
+engine = create_async_engine(DATABASE_URL, pool_size=10, poolclass=TimedPool)
 
 # AsyncSession maker
 AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted(execute_state: ORMExecuteState) -> None:
+    # Tombstoned users and recipes are invisible to every ORM read, joins and
+    # relationship loads included, until they are purged. Statements that
+    # need them pass execution_options(include_deleted=True).
+    if not execute_state.is_select or execute_state.is_column_load:
+        return
+    if execute_state.execution_options.get("include_deleted", False):
+        return
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(User, User.deleted_at.is_(None), include_aliases=True),
+        with_loader_criteria(Recipe, Recipe.deleted_at.is_(None), include_aliases=True),
+    )
+
+
 async def init_db() -> None:
     """NOTE: Tables should be created with Alembic migrations"""
 
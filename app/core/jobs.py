@@ -0,0 +1,266 @@
+import os
+import uuid
+import random
+import socket
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from sqlmodel import select
+from sqlalchemy import case, delete, func, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+# Imported as a module: app.core.db imports the crud modules, which queue jobs
+from app.core import db
+from app.models.job import Job
+
+
+logger = logging.getLogger(__name__)
+
+# Registered handlers by job kind: async (session, context, **payload) -> JSON-able result
+handlers: dict[str, Callable[..., Awaitable[Any]]] = {}
+
+# Set on enqueue, so idle workers in this process look again without waiting
+# out their poll interval (jobs queued by other processes are found by polling)
+_wakeup = asyncio.Event()
+
+
+class JobFailed(Exception):
+    """
+    Raised by a handler for failures retrying cannot fix.
+    """
+
+
+def job_handler(kind: str):
+    """
+    Register the decorated coroutine as the handler of `kind` jobs.
+    """
+    def register(handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        handlers[kind] = handler
+        return handler
+    return register
+
+
+async def enqueue(
+    session: AsyncSession,
+    kind: str,
+    payload: dict | None = None,
+    *,
+    created_by: uuid.UUID | None = None,
+    dedupe_key: str | None = None,
+) -> Job:
+    """
+    Queue a job in the caller's transaction, so it exists exactly when the
+    change that needs it is committed. The caller commits.
+
+    With `dedupe_key`, a job already queued under the same key is returned
+    instead of queueing another.
+    """
+    insert = (
+        pg_insert(Job)
+        .values(
+            id=uuid.uuid4(),
+            kind=kind,
+            status="queued",
+            attempts=0,
+            progress_done=0,
+            payload=payload or {},
+            dedupe_key=dedupe_key,
+            created_by=created_by,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+        )
+        .on_conflict_do_nothing(index_elements=["dedupe_key"], index_where=text("status = 'queued'"))
+        .returning(Job.id)
+    )
+    while True:
+        job_id = (await session.execute(insert)).scalar()
+        if job_id is None:
+            result = await session.execute(
+                select(Job.id).where(Job.dedupe_key == dedupe_key, Job.status == "queued")
+            )
+            job_id = result.scalar()
+        # Otherwise the queued job was claimed in between; queue a new one
+        if job_id is not None:
+            break
+    _wakeup.set()
+    return await session.get(Job, job_id)
+
+
+class JobContext:
+    """
+    Handed to handlers to report progress, which also serves as a heartbeat.
+    """
+
+    def __init__(self, job_id: uuid.UUID, attempt: int) -> None:
+        self.job_id = job_id
+        self.attempt = attempt
+
+    async def progress(self, done: int, total: int | None = None) -> None:
+        # Written in its own transaction so it is visible while the job runs
+        async with db.AsyncSessionLocal() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id == self.job_id)
+                .values(progress_done=done, progress_total=total, heartbeat_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+
+async def _claim(session: AsyncSession, worker: str):
+    # Claim the next due job; SKIP LOCKED lets concurrent workers pass over
+    # rows another worker is claiming instead of queueing behind it
+    next_job = (
+        select(Job.id)
+        .where(Job.status == "queued", Job.run_at <= func.now())
+        .order_by(Job.run_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(Job)
+        .where(Job.id == next_job)
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            worker=worker,
+            started_at=func.now(),
+            heartbeat_at=func.now(),
+        )
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.first()
+    await session.commit()
+    return claimed
+
+
+def _seconds(seconds: float):
+    return text(f"interval '{seconds:.3f} seconds'")
+
+
+async def _tidy(session: AsyncSession) -> None:
+    # Requeue jobs whose worker died mid-run. Their attempt still counts, so
+    # a job that keeps killing its worker ends up failed
+    out_of_attempts = Job.attempts >= Job.max_attempts
+    await session.execute(
+        update(Job)
+        .where(Job.status == "running", Job.heartbeat_at < func.now() - _seconds(settings.JOB_STALE_SECONDS))
+        .values(
+            status=case((out_of_attempts, "failed"), else_="queued"),
+            finished_at=case((out_of_attempts, func.now()), else_=None),
+            run_at=func.now(),
+            worker=None,
+            error="Worker stopped responding",
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        delete(Job)
+        .where(Job.finished_at < func.now() - _seconds(settings.JOB_RETENTION_DAYS * 86400))
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+
+async def _set(job_id: uuid.UUID, **values) -> None:
+    async with db.AsyncSessionLocal() as session:
+        await session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+
+def retry_delay(attempt: int) -> float:
+    """
+    Exponential backoff with jitter before retrying after `attempt` failures.
+    """
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def _heartbeat(job_id: uuid.UUID) -> None:
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        try:
+            await _set(job_id, heartbeat_at=func.now())
+        except Exception:
+            logger.warning(f"Job {job_id} missed a heartbeat", exc_info=True)
+
+
+async def _run(job_id: uuid.UUID, kind: str, payload: dict, attempt: int, max_attempts: int) -> None:
+    handler = handlers.get(kind)
+    if handler is None:
+        await _set(job_id, status="failed", error=f"Unknown job kind: {kind}", finished_at=func.now())
+        return
+
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        async with db.AsyncSessionLocal() as session:
+            result = await handler(session, JobContext(job_id, attempt), **payload)
+    except asyncio.CancelledError:
+        # Shutting down: put the job back without spending an attempt
+        await asyncio.shield(_set(
+            job_id, status="queued", attempts=Job.attempts - 1, worker=None, run_at=func.now()
+        ))
+        raise
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if isinstance(e, JobFailed) or attempt >= max_attempts:
+            logger.exception(f"Job {job_id} ({kind}) failed")
+            await _set(job_id, status="failed", error=error, finished_at=func.now())
+        else:
+            logger.warning(f"Job {job_id} ({kind}) failed on attempt {attempt}, retrying: {error}")
+            await _set(
+                job_id,
+                status="queued",
+                error=error,
+                worker=None,
+                run_at=func.now() + _seconds(retry_delay(attempt)),
+            )
+    else:
+        await _set(job_id, status="succeeded", result=result, error=None, finished_at=func.now())
+    finally:
+        heartbeat.cancel()
+
+
+async def run_worker(name: str) -> None:
+    """
+    Claim and run jobs one at a time until cancelled.
+    """
+    while True:
+        _wakeup.clear()
+        claimed = None
+        try:
+            async with db.AsyncSessionLocal() as session:
+                claimed = await _claim(session, name)
+                if claimed is None:
+                    await _tidy(session)
+        except Exception:
+            logger.exception(f"Job worker {name} could not claim a job")
+
+        if claimed is not None:
+            try:
+                await _run(*claimed)
+            except Exception:
+                # Could not record the outcome; the job is recovered once stale
+                logger.exception(f"Job worker {name} lost track of job {claimed[0]}")
+            continue
+        try:
+            await asyncio.wait_for(_wakeup.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(count: int) -> list[asyncio.Task]:
+    """
+    Start `count` workers in the running event loop.
+    """
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    return [asyncio.create_task(run_worker(f"{prefix}:{i}")) for i in range(count)]
@@ -0,0 +1,210 @@
+import math
+import time
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Hashable
+
+from cachetools import LRUCache
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+
+
+# Registry of every limiter, keyed by name, for the counters endpoint
+limiters: dict[str, "TokenBucketLimiter | ConcurrencyLimiter"] = {}
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets refilling at `per_minute` up to `burst` tokens.
+
+    Buckets live in a bounded LRU, so an evicted key simply starts again
+    with a full bucket.
+    """
+
+    def __init__(self, name: str, per_minute: float, burst: int) -> None:
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._buckets: LRUCache = LRUCache(maxsize=settings.RATE_LIMIT_MAX_KEYS)
+        self.allowed = 0
+        self.limited = 0
+        limiters[name] = self
+
+    def acquire(self, key: Hashable) -> float:
+        """
+        Take a token for `key`. Returns 0 if allowed, otherwise the seconds
+        until a token is available.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            self.allowed += 1
+            return 0
+        self._buckets[key] = (tokens, now)
+        self.limited += 1
+        return (1 - tokens) / self.rate
+
+    def counters(self) -> dict:
+        return {"allowed": self.allowed, "limited": self.limited, "keys": len(self._buckets)}
+
+
+class ConcurrencyLimiter:
+    """
+    Async context manager admitting at most `limit` holders at once.
+
+    Up to `max_queue` more wait for a slot for `timeout` seconds; anything
+    beyond that is shed with a 503.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        limiters[name] = self
+
+    def _reject(self) -> HTTPException:
+        self.shed += 1
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    async def __aenter__(self) -> None:
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise self._reject()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._reject()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def counters(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+login_ip_limiter = TokenBucketLimiter(
+    "login_ip", settings.LOGIN_RATE_PER_IP_PER_MINUTE, settings.LOGIN_RATE_PER_IP_BURST
+)
+login_account_limiter = TokenBucketLimiter(
+    "login_account", settings.LOGIN_RATE_PER_ACCOUNT_PER_MINUTE, settings.LOGIN_RATE_PER_ACCOUNT_BURST
+)
+signup_ip_limiter = TokenBucketLimiter(
+    "signup_ip", settings.SIGNUP_RATE_PER_IP_PER_MINUTE, settings.SIGNUP_RATE_PER_IP_BURST
+)
+
+# Shared by every route that hashes a password
+auth_limiter = ConcurrencyLimiter(
+    "auth",
+    settings.AUTH_CONCURRENCY_LIMIT,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+
+
+def _forwarded_for(request: Request) -> list[str]:
+    # Addresses the request passed through, nearest proxy last
+    if "x-forwarded-for" in request.headers:
+        return [
+            address.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for address in header.split(",")
+        ]
+    addresses = []
+    for header in request.headers.getlist("forwarded"):
+        for element in header.split(","):
+            for pair in element.split(";"):
+                name, _, value = pair.strip().partition("=")
+                if name.lower() != "for":
+                    continue
+                value = value.strip('"')
+                # [IPv6]:port or IPv4:port
+                if value.startswith("["):
+                    value = value[1:].partition("]")[0]
+                elif value.count(":") == 1:
+                    value = value.partition(":")[0]
+                addresses.append(value)
+    return addresses
+
+
+def client_ip(request: Request) -> str:
+    """
+    The address of the client, read back through the forwarding headers of
+    trusted proxies in FORWARDED_ALLOW_IPS; the first untrusted hop is the
+    client, as anything before it could have been sent by the client itself.
+    """
+    trusted = settings.FORWARDED_ALLOW_IPS
+    ip = request.client.host if request.client else "unknown"
+    if not trusted:
+        return ip
+    for address in reversed(_forwarded_for(request)):
+        if "*" not in trusted and ip not in trusted:
+            break
+        ip = address
+    return ip
+
+
+def rate_limit(limiter: TokenBucketLimiter, key: Hashable) -> None:
+    """
+    Raise a 429 if `key` has no tokens left in `limiter`.
+    """
+    retry_after = limiter.acquire(key)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+async def admit_writes(request: Request) -> AsyncGenerator[None]:
+    """
+    Cap concurrent requests per write route, so a burst on one endpoint
+    cannot hold every database connection.
+    """
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        yield
+        return
+
+    route = request.scope.get("route")
+    name = f"{request.method} {route.path if route else request.url.path}"
+    limiter = limiters.get(name)
+    if limiter is None:
+        limiter = ConcurrencyLimiter(
+            name,
+            settings.WRITE_CONCURRENCY_LIMIT,
+            settings.ADMISSION_MAX_QUEUE,
+            settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        )
+    async with limiter:
+        yield
+
+
+def get_counters() -> dict[str, dict]:
+    return {name: limiter.counters() for name, limiter in sorted(limiters.items())}
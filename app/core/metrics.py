@@ -0,0 +1,111 @@
+import os
+import time
+import asyncio
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy.pool import Pool
+from starlette.types import Scope
+
+from app.core.cache import caches
+
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker process writes its samples
+# to files in that directory and a scrape of any worker reports all of them.
+# The directory must be emptied before the server starts.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to serve a request", ["method", "route"]
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_duration_seconds", "Time a request spent in SQL statements", ["method", "route"]
+)
+REQUESTS = Counter("http_requests", "Requests served", ["method", "route", "status"])
+
+# Summed over live workers; each worker has its own pool
+POOL_SIZE = Gauge("db_pool_size", "Connections the pool keeps open", multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", multiprocess_mode="livesum")
+POOL_WAITING = Gauge("db_pool_waiting", "Checkouts waiting for a connection", multiprocess_mode="livesum")
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Time a checkout waited for a connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+CACHE_HITS = Counter("cache_hits", "In-process cache hits", ["cache"])
+CACHE_MISSES = Counter("cache_misses", "In-process cache misses", ["cache"])
+CACHE_ENTRIES = Gauge("cache_entries", "Entries held in in-process caches", ["cache"], multiprocess_mode="livesum")
+
+
+def observe_request(scope: Scope, status_code: int, seconds: float, db_seconds: float) -> None:
+    # Labelled by route template, so path parameters don't multiply the series
+    route = scope.get("route")
+    labels = (scope["method"], route.path if route else "unmatched")
+    REQUEST_SECONDS.labels(*labels).observe(seconds)
+    REQUEST_DB_SECONDS.labels(*labels).observe(db_seconds)
+    REQUESTS.labels(*labels, str(status_code)).inc()
+
+
+def sample(pool: Pool, counted: dict[str, tuple[int, int]]) -> None:
+    """
+    Copy pool and cache figures into their metrics. `counted` holds the
+    cache hits and misses already added to the counters.
+    """
+    POOL_SIZE.set(pool.size())
+    POOL_CHECKED_OUT.set(pool.checkedout())
+    # Negative while the pool itself still has room
+    POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    for name, cache in list(caches.items()):
+        hits, misses = counted.get(name, (0, 0))
+        CACHE_HITS.labels(name).inc(max(cache.hits - hits, 0))
+        CACHE_MISSES.labels(name).inc(max(cache.misses - misses, 0))
+        CACHE_ENTRIES.labels(name).set(len(cache))
+        counted[name] = (cache.hits, cache.misses)
+
+
+async def monitor_loop(pool: Pool, interval_seconds: float) -> None:
+    """
+    Measure event loop lag and sample the pool and caches every
+    `interval_seconds` until cancelled.
+    """
+    counted: dict[str, tuple[int, int]] = {}
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval_seconds)
+        EVENT_LOOP_LAG_SECONDS.observe(max(time.perf_counter() - start - interval_seconds, 0))
+        sample(pool, counted)
+
+
+def mark_process_dead() -> None:
+    # Drops this worker's live gauges from the shared directory on shutdown
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render() -> tuple[bytes, str]:
+    """
+    Every metric in the Prometheus text format, with its content type.
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,94 @@
+import os
+import re
+import sys
+import logging
+from collections import Counter
+
+import greenlet
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.ext.asyncio import async_session
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(CORE_DIR)
+
+# Literals and bound parameters, whatever the driver's paramstyle
+_VALUES = re.compile(r"'(?:[^']|'')*'|\$\d+|%\(\w+\)s|\?|\b\d+(?:\.\d+)?\b")
+# Type casts asyncpg adds to parameters, as in $1::UUID or $2::VARCHAR[]
+_CASTS = re.compile(r"\?::\w+(?:\(\?\))?(?:\[\])?")
+# IN lists and VALUES rows of any length
+_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROWS = re.compile(r"\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+")
+
+
+class NPlusOneError(Exception):
+    """
+    Raised in "raise" mode when a request repeats a statement or lazy loads.
+    """
+
+
+def fingerprint(statement: str) -> str:
+    """
+    The shape of a statement: its text with values and list lengths erased,
+    so the same query for different rows has the same fingerprint.
+    """
+    shape = _VALUES.sub("?", statement)
+    shape = _CASTS.sub("?", shape)
+    shape = _LISTS.sub("?, ...", shape)
+    shape = _ROWS.sub("(?, ...), ...", shape)
+    return " ".join(shape.split())
+
+
+def _app_stack() -> str:
+    # Frames of our code outside the event plumbing in app/core, innermost
+    # last. Statements run in SQLAlchemy's greenlet, so the walk continues
+    # into the awaiting coroutine's frames
+    frames = []
+    frame, current = sys._getframe(1), greenlet.getcurrent()
+    while True:
+        while frame:
+            path = frame.f_code.co_filename
+            if path.startswith(APP_DIR) and not path.startswith(CORE_DIR):
+                frames.append(f"  {os.path.relpath(path, os.path.dirname(APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}")
+            frame = frame.f_back
+        current = current.parent
+        if current is None:
+            break
+        frame = current.gr_frame
+    return "\n".join(reversed(frames))
+
+
+def _report(problem: str) -> None:
+    message = f"{problem}\n{_app_stack()}"
+    if settings.N_PLUS_ONE_CHECK == "raise":
+        raise NPlusOneError(message)
+    logger.warning(message)
+
+
+def check_repeats(repeats: Counter, statement: str) -> None:
+    """
+    Count a statement under its fingerprint in `repeats`, and report it the
+    first time it runs more than N_PLUS_ONE_THRESHOLD times.
+    """
+    shape = fingerprint(statement)
+    repeats[shape] += 1
+    if repeats[shape] == settings.N_PLUS_ONE_THRESHOLD + 1:
+        _report(f"Statement ran more than {settings.N_PLUS_ONE_THRESHOLD} times in one request: {shape[:500]}")
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _check_lazy_load(execute_state: ORMExecuteState) -> None:
+    # Lazy loads under an AsyncSession only work inside run_sync and similar,
+    # and then quietly issue one query per object
+    if settings.N_PLUS_ONE_CHECK == "off" or not execute_state.is_select:
+        return
+    if execute_state.lazy_loaded_from is None:
+        return
+    if async_session(execute_state.session) is None:
+        return
+    _report(f"Lazy load of {execute_state.loader_strategy_path[-1]} under AsyncSession")
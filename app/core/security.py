@@ -1,5 +1,7 @@
+import asyncio
 from datetime import datetime, timedelta, timezone
 from typing import Any
+from concurrent.futures import ThreadPoolExecutor
 
 import jwt
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -9,6 +11,20 @@ from app.core.config import settings
 
 ALGORITHM = "HS256"
 
+# PBKDF2 and scrypt release the GIL, so a few threads keep hashing off the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+
+
+def _stored_method(method: str) -> str:
+    # werkzeug stores shorthand like "scrypt" or "pbkdf2:sha256" expanded
+    # with its default parameters, so read it back from a hash
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+_HASH_PREFIX = _stored_method(settings.PASSWORD_HASH_METHOD)
+
 
 def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
@@ -17,9 +33,19 @@ def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
     return encoded_jwt
 
 
-def verify_password(plain_password: str, password_hash: str) -> bool:
-    return check_password_hash(password_hash, plain_password)
+async def verify_password(plain_password: str, password_hash: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _hash_executor, check_password_hash, password_hash, plain_password
+    )
+
+
+async def get_password_hash(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _hash_executor, generate_password_hash, password, settings.PASSWORD_HASH_METHOD
+    )
 
 
-def get_password_hash(password: str) -> str:
-    return generate_password_hash(password)
+def needs_rehash(password_hash: str) -> bool:
+    return password_hash.split("$", 1)[0] != _HASH_PREFIX
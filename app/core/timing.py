@@ -0,0 +1,160 @@
+import time
+import logging
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.nplusone import check_repeats
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Longest statement text kept for the slow request log
+MAX_STATEMENT_LENGTH = 1000
+
+
+class RequestTiming:
+    """
+    SQL statements run while serving one request, and the time they took.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        # (seconds, statement) of the first SLOW_REQUEST_MAX_QUERIES statements
+        self.statements: list[tuple[float, str]] = []
+        # Runs per statement fingerprint, when N+1 checks are on
+        self.repeats: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        if len(self.statements) < settings.SLOW_REQUEST_MAX_QUERIES:
+            self.statements.append((seconds, statement))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def header(self) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries", '
+            f"total;dur={self.elapsed() * 1000:.1f}"
+        )
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def current_timing() -> RequestTiming | None:
+    return _current.get()
+
+
+@contextmanager
+def tracking() -> Iterator[RequestTiming]:
+    """
+    Time the statements run inside the block, as for a request. Lets
+    scripts and tests check a unit of work outside the middleware. Nested
+    blocks add to the outermost one, so a script wrapping a request made
+    in-process sees the statements the request ran.
+    """
+    timing = _current.get()
+    if timing is not None:
+        yield timing
+        return
+    timing = RequestTiming()
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Runs in the awaiting task's context, which SQLAlchemy carries into its greenlet
+    timing = _current.get()
+    if timing is None:
+        return
+    if settings.N_PLUS_ONE_CHECK != "off":
+        check_repeats(timing.repeats, statement)
+    context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    timing = _current.get()
+    start = getattr(context, "_query_start", None)
+    if timing is not None and start is not None:
+        timing.record(statement, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """
+    Count the queries and sum the database time of each request.
+
+    Reported in a `Server-Timing` header, the request metrics and a log line
+    with the figures as structured fields; requests slower than SLOW_REQUEST_MS also log every
+    statement they ran. Written as plain ASGI so streamed responses are
+    passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_timed(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_HEADER:
+                    MutableHeaders(scope=message).append("Server-Timing", timing.header())
+            await send(message)
+
+        with tracking() as timing:
+            try:
+                await self.app(scope, receive, send_timed)
+            finally:
+                metrics.observe_request(scope, status_code, timing.elapsed(), timing.db_seconds)
+                _log(scope, status_code, timing)
+
+
+def _log(scope: Scope, status_code: int, timing: RequestTiming) -> None:
+    route = scope.get("route")
+    fields = {
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": getattr(route, "path", None),
+        "status": status_code,
+        "duration_ms": round(timing.elapsed() * 1000, 1),
+        "db_ms": round(timing.db_seconds * 1000, 1),
+        "db_queries": timing.queries,
+    }
+    summary = (
+        f"{fields['method']} {fields['path']} {status_code} in {fields['duration_ms']} ms, "
+        f"{timing.queries} queries in {fields['db_ms']} ms"
+    )
+    if fields["duration_ms"] < settings.SLOW_REQUEST_MS:
+        logger.info(summary, extra=fields)
+        return
+
+    lines = [f"Slow request: {summary}"]
+    for seconds, statement in timing.statements:
+        lines.append(f"  {seconds * 1000:8.1f} ms  {' '.join(statement.split())[:MAX_STATEMENT_LENGTH]}")
+    if timing.queries > len(timing.statements):
+        lines.append(f"  ... {timing.queries - len(timing.statements)} more")
+    logger.warning("\n".join(lines), extra=fields)
@@ -0,0 +1,190 @@
+import uuid
+from typing import Literal, Optional
+
+from fastapi import HTTPException, status
+
+from sqlmodel import select
+from sqlalchemy import delete, literal, tuple_, update, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.crud_user import adjust_counters
+from app.models.user import User, UserFollow, UserProfilesPublic
+from app.models.feed import TimelineEntry, FeedPublic
+from app.models.recipe.recipe import Recipe
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+TIMELINE_COLUMNS = ["user_id", "created_at", "recipe_id", "author_id"]
+
+
+async def follow_user(session: AsyncSession, follower: User, followed_id: uuid.UUID) -> None:
+    """
+    Follow a user and copy their recent recipes into the follower's timeline.
+    """
+    if followed_id == follower.id:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="Cannot follow yourself")
+    if not await session.get(User, followed_id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    result = await session.execute(
+        pg_insert(UserFollow)
+        .values(follower_id=follower.id, followed_id=followed_id)
+        .on_conflict_do_nothing()
+        .returning(UserFollow.followed_id)
+    )
+    if result.first() is None:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Already following this user")
+
+    result = await session.execute(
+        update(User)
+        .where(User.id == followed_id)
+        .values(follower_count=User.follower_count + 1)
+        .returning(User.follower_count)
+        .execution_options(synchronize_session=False)
+    )
+    follower_count = result.scalar()
+    await adjust_counters(session, follower.id, following_count=1)
+
+    # Recipes of widely followed authors are pulled at read time instead
+    if follower_count <= settings.FEED_FANOUT_MAX_FOLLOWERS:
+        recent = (
+            select(literal(follower.id), Recipe.created_at, Recipe.id, Recipe.author_id)
+            .where(Recipe.author_id == followed_id, Recipe.private.is_(False))
+            .order_by(Recipe.created_at.desc())
+            .limit(settings.FEED_BACKFILL_SIZE)
+        )
+        await session.execute(
+            pg_insert(TimelineEntry).from_select(TIMELINE_COLUMNS, recent).on_conflict_do_nothing()
+        )
+    await session.commit()
+
+
+async def unfollow_user(session: AsyncSession, follower: User, followed_id: uuid.UUID) -> None:
+    """
+    Unfollow a user and drop their recipes from the follower's timeline.
+    """
+    result = await session.execute(
+        delete(UserFollow)
+        .where(UserFollow.follower_id == follower.id, UserFollow.followed_id == followed_id)
+        .returning(UserFollow.followed_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.first() is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not following this user")
+
+    await adjust_counters(session, followed_id, follower_count=-1)
+    await adjust_counters(session, follower.id, following_count=-1)
+    await session.execute(
+        delete(TimelineEntry)
+        .where(TimelineEntry.user_id == follower.id, TimelineEntry.author_id == followed_id)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+
+async def get_follows(
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    direction: Literal["followers", "following"],
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> UserProfilesPublic:
+    """
+    A user's followers or the users they follow, most recent first.
+
+    Keyset paginated on (followed at, user ID), so each page is one range
+    read of a (user, created_at) index however many follows the user has.
+    """
+    if not await session.get(User, user_id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    if direction == "followers":
+        owner, other = UserFollow.followed_id, UserFollow.follower_id
+    else:
+        owner, other = UserFollow.follower_id, UserFollow.followed_id
+
+    statement = select(User, UserFollow.created_at).join(UserFollow, other == User.id).where(owner == user_id)
+    if cursor:
+        statement = statement.where(tuple_(UserFollow.created_at, other) < tuple_(*decode_cursor(cursor)))
+    statement = statement.order_by(UserFollow.created_at.desc(), other.desc()).limit(limit)
+    rows = (await session.execute(statement)).all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        user, followed_at = rows[-1]
+        next_cursor = encode_cursor(followed_at, user.id)
+    return UserProfilesPublic(data=[user for user, _ in rows], next_cursor=next_cursor)
+
+
+async def fan_out_recipe(session: AsyncSession, recipe: Recipe) -> None:
+    """
+    Write a new recipe into the timeline of every follower of its author.
+
+    Must run after the recipe is flushed and in the same transaction. Skipped
+    for private recipes and for authors above FEED_FANOUT_MAX_FOLLOWERS,
+    whose recipes are merged into feeds when they are read.
+    """
+    if recipe.private:
+        return
+    author_followers = await session.execute(
+        select(User.follower_count).where(User.id == recipe.author_id)
+    )
+    if (author_followers.scalar() or 0) > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        return
+
+    followers = (
+        select(UserFollow.follower_id, Recipe.created_at, Recipe.id, Recipe.author_id)
+        .join(Recipe, Recipe.author_id == UserFollow.followed_id)
+        .where(Recipe.id == recipe.id)
+    )
+    await session.execute(
+        pg_insert(TimelineEntry).from_select(TIMELINE_COLUMNS, followers).on_conflict_do_nothing()
+    )
+
+
+async def get_feed(
+    session: AsyncSession, user: User, cursor: Optional[str] = None, limit: int = 20
+) -> FeedPublic:
+    """
+    Recipes from people the user follows, newest first, keyset paginated.
+
+    Reads a page of the user's precomputed timeline and, in the same
+    statement, the newest recipes of followed authors too big to fan out.
+    """
+    timeline = select(TimelineEntry.created_at, TimelineEntry.recipe_id).where(
+        TimelineEntry.user_id == user.id
+    )
+    pulled = (
+        select(Recipe.created_at, Recipe.id)
+        .join(UserFollow, UserFollow.followed_id == Recipe.author_id)
+        .join(User, User.id == Recipe.author_id)
+        .where(
+            UserFollow.follower_id == user.id,
+            User.follower_count > settings.FEED_FANOUT_MAX_FOLLOWERS,
+            Recipe.private.is_(False),
+        )
+    )
+    if cursor:
+        after = tuple_(*decode_cursor(cursor))
+        timeline = timeline.where(tuple_(TimelineEntry.created_at, TimelineEntry.recipe_id) < after)
+        pulled = pulled.where(tuple_(Recipe.created_at, Recipe.id) < after)
+    timeline = timeline.order_by(TimelineEntry.created_at.desc(), TimelineEntry.recipe_id.desc()).limit(limit)
+    pulled = pulled.order_by(Recipe.created_at.desc(), Recipe.id.desc()).limit(limit)
+
+    # UNION also drops recipes both fanned out and pulled after an author
+    # crossed the fan-out threshold
+    page = union(timeline, pulled).subquery()
+    result = await session.execute(
+        select(Recipe)
+        .join(page, page.c.recipe_id == Recipe.id)
+        .order_by(page.c.created_at.desc(), page.c.recipe_id.desc())
+        .limit(limit)
+    )
+    recipes = result.scalars().all()
+
+    next_cursor = None
+    if len(recipes) == limit:
+        next_cursor = encode_cursor(recipes[-1].created_at, recipes[-1].id)
+    return FeedPublic(data=recipes, next_cursor=next_cursor)
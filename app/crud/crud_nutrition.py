@@ -1,15 +1,41 @@
+import logging
+
+import numpy as np
+
 from sqlmodel import select, func
+from sqlalchemy import Select, Uuid, delete, literal, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import HTTPException, status
+from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
+from app.core.cache import Cache
+from app.core.config import settings
+from app.models.recipe.nutrition import Nutrition
+from app.models.recipe.unit import Unit
 from app.models.nutrition.food_item import *
 from app.models.nutrition.nutrition_entry import *
 from app.models.nutrition.nutrition_average import *
+from app.models.nutrition.nutrition_aggregate import *
 from app.models.nutrition.outlier_flag import *
 from app.models.nutrition.system_version import *
 from app.models.user import User, Message
 from app.api.deps import SessionDep
+from app.utils import snapshots
+
+
+logger = logging.getLogger(__name__)
+
+# ID of the most recently published system version. Publishing clears it in
+# this worker; other workers may serve the previous version until the TTL
+# (LATEST_VERSION_CACHE_SECONDS, a minute by default) expires
+latest_version_cache = Cache(
+    "latest_system_version", maxsize=1, ttl=settings.LATEST_VERSION_CACHE_SECONDS
+)
+
+# Published version IDs seen by this process (publishing is one-way)
+_published_versions: set[str] = set()
 
 
 async def create_food_item(session: SessionDep, food_in: FoodItemCreate) -> FoodItem:
@@ -92,12 +118,156 @@ async def delete_food_item(session: SessionDep, food_id: str) -> Message:
     await session.commit()
     return Message(message="Food item deleted successfully")
 
+def entry_partials(*criteria, entries=NutritionEntry.__table__) -> Select:
+    """
+    Per (food, nutrient) partial aggregates over the nutrition entries matching `criteria`.
+
+    `entries` may be any table with food_id, nutrition_id and value columns,
+    such as an import staging table.
+    """
+    return (
+        select(
+            entries.c.food_id,
+            entries.c.nutrition_id,
+            func.count().label("entry_count"),
+            func.sum(entries.c.value).label("value_sum"),
+            func.avg(entries.c.value).label("mean"),
+            (func.var_pop(entries.c.value) * func.count()).label("m2"),
+        )
+        .where(*criteria)
+        .group_by(entries.c.food_id, entries.c.nutrition_id)
+    )
+
+def _single_partial(food_id: UUID, nutrition_id: str, value: float) -> Select:
+    return select(
+        literal(food_id, Uuid).label("food_id"),
+        literal(nutrition_id).label("nutrition_id"),
+        literal(1).label("entry_count"),
+        literal(value).label("value_sum"),
+        literal(value).label("mean"),
+        literal(0.0).label("m2"),
+    )
+
+async def add_to_aggregates(session: SessionDep, partials: Select) -> None:
+    """
+    Merge partial aggregates into the running (food, nutrient) aggregates.
+
+    Uses the pairwise form of Welford's update (Chan et al.), so a single
+    entry and a whole import batch go through the same upsert.
+    """
+    stmt = pg_insert(NutritionAggregate).from_select(
+        ["food_id", "nutrition_id", "entry_count", "value_sum", "mean", "m2"], partials
+    )
+    current, new = NutritionAggregate.__table__.c, stmt.excluded
+    count = current.entry_count + new.entry_count
+    delta = new.mean - current.mean
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[current.food_id, current.nutrition_id],
+            set_={
+                "entry_count": count,
+                "value_sum": current.value_sum + new.value_sum,
+                "mean": (current.value_sum + new.value_sum) / count,
+                "m2": current.m2 + new.m2 + delta * delta * current.entry_count * new.entry_count / count,
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+async def remove_from_aggregates(session: SessionDep, partials: Select) -> None:
+    """
+    Subtract partial aggregates from the running (food, nutrient) aggregates.
+
+    Inverse of `add_to_aggregates`; groups left without entries are dropped.
+    """
+    parts = partials.subquery()
+    remaining = NutritionAggregate.entry_count - parts.c.entry_count
+    remaining_sum = NutritionAggregate.value_sum - parts.c.value_sum
+    remaining_mean = remaining_sum / func.nullif(remaining, 0)
+    delta = parts.c.mean - remaining_mean
+    await session.execute(
+        update(NutritionAggregate)
+        .where(
+            NutritionAggregate.food_id == parts.c.food_id,
+            NutritionAggregate.nutrition_id == parts.c.nutrition_id,
+        )
+        .values(
+            entry_count=remaining,
+            value_sum=remaining_sum,
+            mean=func.coalesce(remaining_mean, 0.0),
+            # Clamp float drift so the variance never goes negative
+            m2=func.greatest(
+                NutritionAggregate.m2 - parts.c.m2
+                - func.coalesce(delta * delta * remaining * parts.c.entry_count / NutritionAggregate.entry_count, 0.0),
+                0.0,
+            ),
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    emptied = partials.subquery()
+    await session.execute(
+        delete(NutritionAggregate)
+        .where(
+            NutritionAggregate.entry_count <= 0,
+            tuple_(NutritionAggregate.food_id, NutritionAggregate.nutrition_id).in_(
+                select(emptied.c.food_id, emptied.c.nutrition_id)
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def get_nutrition_aggregates(session: SessionDep, food_id: UUID) -> List[NutritionAggregate]:
+    """
+    Get the running aggregates of every nutrient recorded for a food item.
+    """
+    statement = (
+        select(NutritionAggregate)
+        .where(NutritionAggregate.food_id == food_id)
+        .order_by(NutritionAggregate.nutrition_id)
+    )
+    results = await session.execute(statement)
+    return results.scalars().all()
+
+async def rebuild_nutrition_averages(session: SessionDep, version_id: str) -> int:
+    """
+    Recompute the running aggregates from all entries and materialise them
+    as the nutrition averages of a system version. Returns the number of averages.
+    """
+    version = await session.get(SystemVersion, version_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="System version not found")
+    if version.published_at:
+        raise HTTPException(status_code=409, detail="Published system versions cannot be changed")
+
+    # Rebuild the aggregates from scratch in one set-based pass
+    await session.execute(delete(NutritionAggregate))
+    await add_to_aggregates(session, entry_partials())
+
+    # Replace the version's averages with the aggregate means
+    await session.execute(delete(NutritionAverage).where(NutritionAverage.version_id == version_id))
+    result = await session.execute(
+        pg_insert(NutritionAverage).from_select(
+            ["version_id", "food_id", "nutrition_id", "value", "created_at"],
+            select(
+                literal(version_id),
+                NutritionAggregate.food_id,
+                NutritionAggregate.nutrition_id,
+                NutritionAggregate.mean,
+                func.now(),
+            ),
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
 async def create_nutrition_entry(session: SessionDep, entry_in: NutritionEntryCreate, user: User) -> NutritionEntry:
     """
     Create a new nutrition entry.
     """
     entry = NutritionEntry(**entry_in.dict(), created_by=user.id)
     session.add(entry)
+    await add_to_aggregates(session, _single_partial(entry.food_id, entry.nutrition_id, entry.value))
     await session.commit()
     await session.refresh(entry)
     return entry
@@ -122,30 +292,49 @@ async def get_nutrition_entries(session: SessionDep, skip: int = 0, limit: int =
 
     return NutritionEntriesPublic(data=entries, count=count)
 
-async def update_nutrition_entry(session: SessionDep, entry_id: UUID, entry_in: NutritionEntryCreate) -> NutritionEntry:
+def _check_entry_owner(entry: NutritionEntry, user: User) -> None:
+    if entry.created_by != user.id and not user.is_superuser:
+        raise HTTPException(status_code=403, detail="Cannot change another user's nutrition entry")
+
+async def update_nutrition_entry(session: SessionDep, entry_id: UUID, entry_in: NutritionEntryUpdate, user: User) -> NutritionEntry:
     """
-    Update a nutrition entry.
+    Update a nutrition entry. Only its author or a superuser may.
     """
     entry = await session.get(NutritionEntry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Nutrition entry not found")
+    _check_entry_owner(entry, user)
 
-    for key, value in entry_in.dict().items():
+    previous = (entry.food_id, entry.nutrition_id, entry.value)
+    for key, value in entry_in.dict(exclude_unset=True).items():
         setattr(entry, key, value)
 
+    # Move the value between aggregates only if it actually changed
+    if previous != (entry.food_id, entry.nutrition_id, entry.value):
+        await remove_from_aggregates(session, _single_partial(*previous))
+        await add_to_aggregates(session, _single_partial(entry.food_id, entry.nutrition_id, entry.value))
+
     session.add(entry)
     await session.commit()
     await session.refresh(entry)
     return entry
 
-async def delete_nutrition_entry(session: SessionDep, entry_id: UUID) -> Message:
+async def delete_nutrition_entry(session: SessionDep, entry_id: UUID, user: User) -> Message:
     """
-    Delete a nutrition entry.
+    Delete a nutrition entry. Only its author or a superuser may.
     """
     entry = await session.get(NutritionEntry, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Nutrition entry not found")
-
+    _check_entry_owner(entry, user)
+
+    await remove_from_aggregates(session, _single_partial(entry.food_id, entry.nutrition_id, entry.value))
+    # Its outlier flags go with it, as when a user's entries are purged
+    await session.execute(
+        delete(OutlierFlag)
+        .where(OutlierFlag.entry_id == entry.id)
+        .execution_options(synchronize_session=False)
+    )
     await session.delete(entry)
     await session.commit()
     return Message(message="Nutrition entry deleted successfully")
@@ -154,6 +343,8 @@ async def create_nutrition_average(session: SessionDep, average_in: NutritionAve
     """
     Create a new nutrition average.
     """
+    if await is_version_published(session, average_in.version_id):
+        raise HTTPException(status_code=409, detail="Published system versions cannot be changed")
     average = NutritionAverage(**average_in.dict())
     session.add(average)
     await session.commit()
@@ -190,11 +381,15 @@ async def get_outlier_flag(session: SessionDep, flag_id: int) -> Optional[Outlie
     """
     return await session.get(OutlierFlag, flag_id)
 
-async def get_outlier_flags(session: SessionDep, skip: int = 0, limit: int = 100) -> List[OutlierFlag]:
+async def get_outlier_flags(
+    session: SessionDep, skip: int = 0, limit: int = 100, decision: Optional[str] = None
+) -> List[OutlierFlag]:
     """
-    Retrieve multiple outlier flags with pagination.
+    Retrieve multiple outlier flags with pagination, oldest first.
     """
-    statement = select(OutlierFlag).offset(skip).limit(limit)
+    statement = select(OutlierFlag).order_by(OutlierFlag.created_at, OutlierFlag.id).offset(skip).limit(limit)
+    if decision:
+        statement = statement.where(OutlierFlag.decision == decision)
     results = await session.execute(statement)
     return results.scalars().all()
 
@@ -221,3 +416,133 @@ async def get_system_versions(session: SessionDep, skip: int = 0, limit: int = 1
     statement = select(SystemVersion).offset(skip).limit(limit)
     results = await session.execute(statement)
     return results.scalars().all()
+
+async def publish_system_version(session: SessionDep, version_id: str) -> SystemVersion:
+    """
+    Publish a system version, freezing its nutrition averages.
+    """
+    version = await session.get(SystemVersion, version_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="System version not found")
+    if version.published_at:
+        raise HTTPException(status_code=409, detail="System version is already published")
+
+    version.published_at = datetime.utcnow()
+    session.add(version)
+    await session.commit()
+    await session.refresh(version)
+
+    _published_versions.add(version_id)
+    latest_version_cache.clear()
+    try:
+        await snapshots.build_snapshot(session, version_id)
+    except Exception:
+        # Readers build the snapshot on demand if it is missing
+        logger.exception(f"Could not write snapshot of system version {version_id}")
+    return version
+
+async def is_version_published(session: SessionDep, version_id: str) -> bool:
+    """
+    Check whether a system version is published.
+    """
+    if version_id in _published_versions:
+        return True
+    version = await session.get(SystemVersion, version_id)
+    if version and version.published_at:
+        _published_versions.add(version_id)
+        return True
+    return False
+
+async def get_latest_version_id(session: SessionDep) -> str:
+    """
+    Get the ID of the most recently published system version.
+    """
+    version_id = latest_version_cache.get("latest")
+    if version_id is None:
+        result = await session.execute(
+            select(SystemVersion.version_id)
+            .where(SystemVersion.published_at.is_not(None))
+            .order_by(SystemVersion.year.desc(), SystemVersion.month.desc(), SystemVersion.sub_version.desc())
+            .limit(1)
+        )
+        version_id = result.scalar()
+        if version_id is None:
+            raise HTTPException(status_code=404, detail="No system versions found")
+        latest_version_cache.set("latest", version_id)
+        _published_versions.add(version_id)
+    return version_id
+
+async def get_food_nutrition(
+    session: SessionDep, version_id: str, food_ids: List[UUID]
+) -> dict[UUID, dict[str, dict]]:
+    """
+    Get the nutrition averages of many food items in a system version.
+
+    Returns {food_id: {nutrition_id: {"value", "unit_id", "unit"}}}. Published
+    versions are served from their memory-mapped snapshot, drafts from the
+    database in one query with their units joined.
+    """
+    if await is_version_published(session, version_id):
+        snapshot = await snapshots.get_snapshot(session, version_id)
+        return {food_id: snapshot.food(food_id) for food_id in food_ids}
+
+    nutrition: dict[UUID, dict[str, dict]] = {food_id: {} for food_id in food_ids}
+    results = await session.execute(
+        select(
+            NutritionAverage.food_id,
+            NutritionAverage.nutrition_id,
+            NutritionAverage.value,
+            Nutrition.unit_id,
+            Unit.name,
+        )
+        .outerjoin(Nutrition, Nutrition.id == NutritionAverage.nutrition_id)
+        .outerjoin(Unit, Unit.id == Nutrition.unit_id)
+        .where(NutritionAverage.version_id == version_id)
+        .where(NutritionAverage.food_id.in_(nutrition))
+        .order_by(NutritionAverage.food_id, NutritionAverage.nutrition_id)
+    )
+    for food_id, nutrition_id, value, unit_id, unit in results.all():
+        nutrition[food_id][nutrition_id] = {"value": value, "unit_id": unit_id, "unit": unit}
+    return nutrition
+
+async def get_food_nutrition_matrix(
+    session: SessionDep, version_id: str, food_ids: List[UUID]
+) -> FoodNutritionMatrix:
+    """
+    Get the nutrition averages of many food items as a food x nutrient matrix.
+    """
+    food_ids = list(dict.fromkeys(food_ids))
+    if await is_version_published(session, version_id):
+        # Slice the snapshot directly, keeping only nutrients the foods have
+        snapshot = await snapshots.get_snapshot(session, version_id)
+        matrix = snapshot.dense(food_ids)
+        columns = np.flatnonzero(~np.isnan(matrix).all(axis=0))
+        matrix = matrix[:, columns]
+        return FoodNutritionMatrix(
+            version_id=version_id,
+            food_ids=food_ids,
+            nutrition_ids=[snapshot.nutrition_ids[column] for column in columns],
+            units=[snapshot.units[column] for column in columns],
+            values=np.where(np.isnan(matrix), None, matrix).tolist(),
+        )
+
+    nutrition = await get_food_nutrition(session, version_id, food_ids)
+    units = {
+        nutrition_id: values["unit"]
+        for food in nutrition.values()
+        for nutrition_id, values in food.items()
+    }
+    nutrition_ids = sorted(units)
+    return FoodNutritionMatrix(
+        version_id=version_id,
+        food_ids=food_ids,
+        nutrition_ids=nutrition_ids,
+        units=[units[nutrition_id] for nutrition_id in nutrition_ids],
+        values=[
+            [
+                nutrition[food_id][nutrition_id]["value"] if nutrition_id in nutrition[food_id] else None
+                for nutrition_id in nutrition_ids
+            ]
+            for food_id in food_ids
+        ],
+    )
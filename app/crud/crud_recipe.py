@@ -1,12 +1,29 @@
 import uuid
-from typing import Any
+from typing import Any, Sequence
+from datetime import datetime
+from collections import Counter, defaultdict
 
 from fastapi import HTTPException, status
 
-from sqlmodel import select
+from sqlmodel import func, select
+from sqlalchemy import Integer, Uuid, delete, literal, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.recipe.recipe import Recipe, RecipeCreate
+from app.core.jobs import enqueue
+from app.crud.crud_follow import fan_out_recipe
+from app.crud.crud_recipe_list import visible_recipes
+from app.crud.crud_user import adjust_counters
+from app.models.user import User, UserFollow
+from app.models.recipe.recipe import (
+    Recipe,
+    RecipeCreate,
+    RecipeList,
+    RecipeListRecipe,
+    RecipePublic,
+    UserRecipeSave,
+)
+from app.utils.sub_recipes import invalidate_flattened, nesting_recipe, validate_sub_recipes
 
 
 async def create_recipe(
@@ -20,13 +37,23 @@ async def create_recipe(
     try:
         # Convert the input model to a database model
         recipe = Recipe(**recipe_in.model_dump(), file_path=filename)
+
+        # Reject missing or cyclic sub-recipes before anything is written
+        await validate_sub_recipes(session, recipe)
         
-        # Add and commit the recipe to the database
+        # Add the recipe and push it to followers' timelines in one transaction
         session.add(recipe)
+        await session.flush()
+        await fan_out_recipe(session, recipe)
+        await adjust_counters(session, recipe.author_id, recipe_count=1)
         await session.commit()
         await session.refresh(recipe)
         
         return recipe
+
+    except HTTPException:
+        await session.rollback()
+        raise
     
     except Exception as e:
         await session.rollback()
@@ -38,10 +65,26 @@ async def create_recipe(
 
 async def delete_recipe(session: AsyncSession, recipe: Recipe) -> None:
     """
-    Delete a recipe from the database.
+    Tombstone a recipe. Reads stop seeing it at once; its saves, list
+    entries and timeline entries are removed by a purge job queued in the
+    same transaction. Recipes nested in another recipe can't be deleted, as
+    that recipe would no longer resolve.
     """
-    await session.delete(recipe)
+    parent_id = await nesting_recipe(session, recipe.id)
+    if parent_id:
+        raise HTTPException(
+            status.HTTP_409_CONFLICT, detail=f"Recipe is used as a sub-recipe by recipe {parent_id}"
+        )
+
+    await adjust_counters(
+        session, recipe.author_id, recipe_count=-1, saves_received_count=-recipe.save_count
+    )
+    recipe_id = recipe.id
+    recipe.deleted_at = func.now()
+    session.add(recipe)
+    await enqueue(session, "purge_deleted", dedupe_key="purge_deleted")
     await session.commit()
+    invalidate_flattened(recipe_id)
 
 
 async def create_recipe_version(
@@ -58,11 +101,182 @@ async def create_recipe_version(
         "previous_version_id": base_recipe.id,
         "original_recipe_id": base_recipe.original_recipe_id or base_recipe.id,
         "author_id": current_user_id,
+        # Saves stay with the version that was saved
+        "save_count": 0,
         **update_data
     })
     
     new_version = Recipe(**version_data)
+    await validate_sub_recipes(session, new_version)
     session.add(new_version)
+    await adjust_counters(session, current_user_id, recipe_count=1)
     await session.commit()
     await session.refresh(new_version)
     return new_version
+
+
+async def save_recipe(session: AsyncSession, user: User, recipe_id: uuid.UUID) -> None:
+    """
+    Save a recipe for a user and count it on the recipe and its author.
+    """
+    # As in save_recipes, a recipe the user may not see doesn't exist for them
+    visible = await session.execute(
+        select(Recipe.id).where(Recipe.id == recipe_id, visible_recipes(user))
+    )
+    if visible.first() is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Recipe not found")
+
+    result = await session.execute(
+        pg_insert(UserRecipeSave)
+        .values(user_id=user.id, recipe_id=recipe_id, created_at=datetime.utcnow())
+        .on_conflict_do_nothing()
+        .returning(UserRecipeSave.recipe_id)
+    )
+    if result.first() is None:
+        raise HTTPException(status.HTTP_409_CONFLICT, detail="Recipe already saved")
+
+    await count_saves(session, [recipe_id], 1)
+    await session.commit()
+
+
+async def unsave_recipe(session: AsyncSession, user: User, recipe_id: uuid.UUID) -> None:
+    """
+    Remove a user's save of a recipe and uncount it.
+    """
+    result = await session.execute(
+        delete(UserRecipeSave)
+        .where(UserRecipeSave.user_id == user.id, UserRecipeSave.recipe_id == recipe_id)
+        .returning(UserRecipeSave.recipe_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.first() is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Saved recipe not found")
+
+    await count_saves(session, [recipe_id], -1)
+    await session.commit()
+
+
+async def save_recipes(session: AsyncSession, user: User, recipe_ids: list[uuid.UUID]) -> list[uuid.UUID]:
+    """
+    Save many recipes for a user in one transaction.
+
+    Recipes that don't exist, that the user may not see or that are already
+    saved are skipped. Returns the IDs that were newly saved.
+    """
+    rows = (
+        select(literal(user.id), Recipe.id, literal(datetime.utcnow()))
+        .where(Recipe.id.in_(recipe_ids), visible_recipes(user))
+    )
+    result = await session.execute(
+        pg_insert(UserRecipeSave)
+        .from_select(["user_id", "recipe_id", "created_at"], rows)
+        .on_conflict_do_nothing()
+        .returning(UserRecipeSave.recipe_id)
+    )
+    saved = list(result.scalars())
+    await count_saves(session, saved, 1)
+    await session.commit()
+    return saved
+
+
+async def unsave_recipes(session: AsyncSession, user: User, recipe_ids: list[uuid.UUID]) -> list[uuid.UUID]:
+    """
+    Remove many of a user's saves in one transaction. Returns the IDs that
+    were saved before.
+    """
+    result = await session.execute(
+        delete(UserRecipeSave)
+        .where(UserRecipeSave.user_id == user.id, UserRecipeSave.recipe_id.in_(recipe_ids))
+        .returning(UserRecipeSave.recipe_id)
+        .execution_options(synchronize_session=False)
+    )
+    unsaved = list(result.scalars())
+    await count_saves(session, unsaved, -1)
+    await session.commit()
+    return unsaved
+
+
+async def count_saves(session: AsyncSession, recipe_ids: list[uuid.UUID], delta: int) -> None:
+    """
+    Move the save counts of the recipes and of their authors by `delta` each,
+    in two statements however many recipes and authors there are. The
+    caller commits.
+    """
+    if not recipe_ids:
+        return
+    criteria = [Recipe.id.in_(recipe_ids)]
+    if delta < 0:
+        criteria.append(Recipe.save_count > 0)
+    result = await session.execute(
+        update(Recipe)
+        .where(*criteria)
+        .values(save_count=Recipe.save_count + delta)
+        .returning(Recipe.author_id)
+        .execution_options(synchronize_session=False)
+    )
+    per_author = Counter(result.scalars())
+    if not per_author:
+        return
+
+    authors = func.unnest(
+        literal(list(per_author), ARRAY(Uuid)), literal(list(per_author.values()), ARRAY(Integer))
+    ).table_valued("author_id", "saves").render_derived()
+    await session.execute(
+        update(User)
+        .where(User.id == authors.c.author_id)
+        .values(saves_received_count=User.saves_received_count + authors.c.saves * delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_recipes_by_ids(
+    session: AsyncSession, viewer: User | None, recipe_ids: list[uuid.UUID]
+) -> list[Recipe]:
+    """
+    Many recipes in one query, in the order asked for. Missing recipes and
+    private ones the viewer may not see are left out.
+    """
+    result = await session.execute(
+        select(Recipe).where(Recipe.id.in_(recipe_ids), visible_recipes(viewer))
+    )
+    found = {recipe.id: recipe for recipe in result.scalars()}
+    return [found[recipe_id] for recipe_id in dict.fromkeys(recipe_ids) if recipe_id in found]
+
+
+async def annotate_recipes(
+    session: AsyncSession, viewer: User | None, recipes: Sequence[Recipe]
+) -> list[RecipePublic]:
+    """
+    Fill in the per-viewer flags of a page of recipes.
+
+    One query per flag over the whole page, so a page costs three queries
+    however many recipes it holds. Anonymous viewers get no flags.
+    """
+    page = [RecipePublic.model_validate(recipe) for recipe in recipes]
+    if viewer is None or not page:
+        return page
+
+    recipe_ids = [recipe.id for recipe in page]
+    author_ids = list({recipe.author_id for recipe in page})
+
+    saved = set((await session.execute(
+        select(UserRecipeSave.recipe_id)
+        .where(UserRecipeSave.user_id == viewer.id, UserRecipeSave.recipe_id.in_(recipe_ids))
+    )).scalars())
+    followed = set((await session.execute(
+        select(UserFollow.followed_id)
+        .where(UserFollow.follower_id == viewer.id, UserFollow.followed_id.in_(author_ids))
+    )).scalars())
+    in_lists = defaultdict(list)
+    for recipe_id, list_id in (await session.execute(
+        select(RecipeListRecipe.recipe_id, RecipeListRecipe.recipe_list_id)
+        .join(RecipeList, RecipeList.id == RecipeListRecipe.recipe_list_id)
+        .where(RecipeList.user_id == viewer.id, RecipeListRecipe.recipe_id.in_(recipe_ids))
+    )).all():
+        in_lists[recipe_id].append(list_id)
+
+    for recipe in page:
+        recipe.saved_by_me = recipe.id in saved
+        recipe.author_followed = recipe.author_id in followed
+        recipe.in_lists = in_lists[recipe.id]
+    return page
@@ -0,0 +1,233 @@
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from sqlmodel import func, select
+from sqlalchemy import Uuid, delete, literal, or_, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import User
+from app.models.recipe.recipe import (
+    Recipe,
+    RecipeList,
+    RecipeListCreate,
+    RecipeListRecipe,
+    RecipeListRecipesPublic,
+    RecipeListsPublic,
+    RecipeListUpdate,
+)
+from app.utils.pagination import decode_position_cursor, encode_position_cursor
+
+
+def visible_recipes(viewer: User | None):
+    """
+    Filter for recipes `viewer` may see: public ones and their own.
+    """
+    if viewer is None:
+        return Recipe.private.is_(False)
+    return or_(Recipe.private.is_(False), Recipe.author_id == viewer.id)
+
+
+def _requested(recipe_ids: list[uuid.UUID]):
+    # The IDs as a (recipe_id, ordinality) table, in request order, without duplicates
+    ids = literal(list(dict.fromkeys(recipe_ids)), ARRAY(Uuid))
+    return func.unnest(ids).table_valued("recipe_id", with_ordinality="ordinality").render_derived()
+
+
+async def create_recipe_list(session: AsyncSession, user: User, list_in: RecipeListCreate) -> RecipeList:
+    recipe_list = RecipeList.model_validate(list_in, update={"user_id": user.id})
+    session.add(recipe_list)
+    await session.commit()
+    await session.refresh(recipe_list)
+    return recipe_list
+
+
+async def get_recipe_list(session: AsyncSession, list_id: uuid.UUID, viewer: User) -> RecipeList:
+    """
+    Get a list `viewer` may see. Private lists of other users are reported
+    as missing.
+    """
+    recipe_list = await session.get(RecipeList, list_id)
+    if not recipe_list or (recipe_list.private and recipe_list.user_id != viewer.id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Recipe list not found")
+    return recipe_list
+
+
+async def get_own_recipe_list(session: AsyncSession, list_id: uuid.UUID, user: User) -> RecipeList:
+    recipe_list = await get_recipe_list(session, list_id, user)
+    if recipe_list.user_id != user.id:
+        raise HTTPException(status.HTTP_403_FORBIDDEN, detail="Cannot modify another user's recipe list")
+    return recipe_list
+
+
+async def get_recipe_lists(
+    session: AsyncSession, owner_id: uuid.UUID, viewer: User, skip: int = 0, limit: int = 50
+) -> RecipeListsPublic:
+    """
+    A user's recipe lists, newest first. Only the owner sees private ones.
+    """
+    criteria = [RecipeList.user_id == owner_id]
+    if owner_id != viewer.id:
+        criteria.append(RecipeList.private.is_(False))
+
+    count = (await session.execute(select(func.count()).select_from(RecipeList).where(*criteria))).scalar()
+    result = await session.execute(
+        select(RecipeList)
+        .where(*criteria)
+        .order_by(RecipeList.created_at.desc(), RecipeList.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return RecipeListsPublic(data=result.scalars().all(), count=count)
+
+
+async def update_recipe_list(
+    session: AsyncSession, recipe_list: RecipeList, list_in: RecipeListUpdate
+) -> RecipeList:
+    recipe_list.sqlmodel_update(list_in.model_dump(exclude_unset=True))
+    session.add(recipe_list)
+    await session.commit()
+    await session.refresh(recipe_list)
+    return recipe_list
+
+
+async def delete_recipe_list(session: AsyncSession, recipe_list: RecipeList) -> None:
+    await session.execute(
+        delete(RecipeListRecipe)
+        .where(RecipeListRecipe.recipe_list_id == recipe_list.id)
+        .execution_options(synchronize_session=False)
+    )
+    await session.delete(recipe_list)
+    await session.commit()
+
+
+async def _touch(session: AsyncSession, recipe_list: RecipeList, added: int = 0) -> None:
+    # Bump the list's recipe count and modification time, commit and reload
+    await session.execute(
+        update(RecipeList)
+        .where(RecipeList.id == recipe_list.id)
+        .values(recipe_count=RecipeList.recipe_count + added, last_modified_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    await session.refresh(recipe_list)
+
+
+async def add_recipes(
+    session: AsyncSession, recipe_list: RecipeList, user: User, recipe_ids: list[uuid.UUID]
+) -> int:
+    """
+    Append recipes to the end of a list, in the order given, in one statement.
+
+    IDs that don't exist, that `user` may not see or that are already in
+    the list are skipped. Returns the number of recipes added.
+    """
+    requested = _requested(recipe_ids)
+    last_position = (
+        select(func.coalesce(func.max(RecipeListRecipe.position), -1))
+        .where(RecipeListRecipe.recipe_list_id == recipe_list.id)
+        .scalar_subquery()
+    )
+    rows = (
+        select(literal(recipe_list.id), Recipe.id, last_position + requested.c.ordinality)
+        .join(requested, requested.c.recipe_id == Recipe.id)
+        .where(visible_recipes(user))
+    )
+    result = await session.execute(
+        pg_insert(RecipeListRecipe)
+        .from_select(["recipe_list_id", "recipe_id", "position"], rows)
+        .on_conflict_do_nothing()
+        .returning(RecipeListRecipe.recipe_id)
+    )
+    added = len(result.all())
+    await _touch(session, recipe_list, added)
+    return added
+
+
+async def remove_recipes(session: AsyncSession, recipe_list: RecipeList, recipe_ids: list[uuid.UUID]) -> int:
+    """
+    Remove recipes from a list in one statement. Returns the number removed.
+    """
+    result = await session.execute(
+        delete(RecipeListRecipe)
+        .where(
+            RecipeListRecipe.recipe_list_id == recipe_list.id,
+            RecipeListRecipe.recipe_id.in_(recipe_ids),
+        )
+        .returning(RecipeListRecipe.recipe_id)
+        .execution_options(synchronize_session=False)
+    )
+    removed = len(result.all())
+    await _touch(session, recipe_list, -removed)
+    return removed
+
+
+async def reorder_recipes(session: AsyncSession, recipe_list: RecipeList, recipe_ids: list[uuid.UUID]) -> None:
+    """
+    Move the given recipes to the front of a list, in the order given.
+
+    The rest keep their relative order after them. Positions are rewritten
+    as 0..n-1 in a single UPDATE.
+    """
+    requested = _requested(recipe_ids)
+    ranked = (
+        select(
+            RecipeListRecipe.recipe_id,
+            (
+                func.row_number().over(
+                    order_by=(
+                        requested.c.ordinality.asc().nulls_last(),
+                        RecipeListRecipe.position,
+                        RecipeListRecipe.recipe_id,
+                    )
+                ) - 1
+            ).label("position"),
+        )
+        .outerjoin(requested, requested.c.recipe_id == RecipeListRecipe.recipe_id)
+        .where(RecipeListRecipe.recipe_list_id == recipe_list.id)
+        .subquery()
+    )
+    await session.execute(
+        update(RecipeListRecipe)
+        .where(
+            RecipeListRecipe.recipe_list_id == recipe_list.id,
+            RecipeListRecipe.recipe_id == ranked.c.recipe_id,
+        )
+        .values(position=ranked.c.position)
+        .execution_options(synchronize_session=False)
+    )
+    await _touch(session, recipe_list)
+
+
+async def get_list_recipes(
+    session: AsyncSession,
+    recipe_list: RecipeList,
+    viewer: User,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> RecipeListRecipesPublic:
+    """
+    One page of a list's recipes in list order.
+
+    Recipes are read with the list rows in a single join, keyset paginated
+    on (position, recipe ID). Private recipes are only shown to their author.
+    """
+    statement = (
+        select(Recipe, RecipeListRecipe.position)
+        .join(RecipeListRecipe, RecipeListRecipe.recipe_id == Recipe.id)
+        .where(RecipeListRecipe.recipe_list_id == recipe_list.id, visible_recipes(viewer))
+    )
+    if cursor:
+        statement = statement.where(
+            tuple_(RecipeListRecipe.position, RecipeListRecipe.recipe_id) > tuple_(*decode_position_cursor(cursor))
+        )
+    statement = statement.order_by(RecipeListRecipe.position, RecipeListRecipe.recipe_id).limit(limit)
+    rows = (await session.execute(statement)).all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        recipe, position = rows[-1]
+        next_cursor = encode_position_cursor(position, recipe.id)
+    return RecipeListRecipesPublic(data=[recipe for recipe, _ in rows], next_cursor=next_cursor)
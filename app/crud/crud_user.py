@@ -1,16 +1,21 @@
+import uuid
 from typing import Any
 
-from sqlmodel import select
+from sqlmodel import func, select
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.jobs import enqueue
+from app.models.recipe.recipe import Recipe
 from app.models.user import User, UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, needs_rehash, verify_password
+from app.utils.sub_recipes import invalidate_flattened
 
 
 async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
     db_obj = User.model_validate(
         user_create, 
-        update={"password_hash": get_password_hash(user_create.password)}
+        update={"password_hash": await get_password_hash(user_create.password)}
     )
     session.add(db_obj)
     await session.commit()
@@ -23,7 +28,7 @@ async def update_user(*, session: AsyncSession, db_user: User, user_in: UserUpda
     extra_data = {}
     if "password" in user_data:
         password = user_data["password"]
-        password_hash = get_password_hash(password)
+        password_hash = await get_password_hash(password)
         extra_data["password_hash"] = password_hash
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
@@ -32,6 +37,30 @@ async def update_user(*, session: AsyncSession, db_user: User, user_in: UserUpda
     return db_user
 
 
+async def delete_user(*, session: AsyncSession, db_user: User) -> None:
+    """
+    Tombstone a user and their recipes. Reads stop seeing them at once;
+    their rows are removed by a purge job queued in the same transaction.
+    """
+    db_user.deleted_at = func.now()
+    # Unique, so freed for a new signup without waiting for the purge
+    db_user.email = f"{db_user.id}@deleted.invalid"
+    db_user.username = f"deleted-{db_user.id}"
+    session.add(db_user)
+    result = await session.execute(
+        update(Recipe)
+        .where(Recipe.author_id == db_user.id, Recipe.deleted_at.is_(None))
+        .values(deleted_at=func.now())
+        .returning(Recipe.id)
+        .execution_options(synchronize_session=False)
+    )
+    recipe_ids = list(result.scalars())
+    await enqueue(session, "purge_deleted", dedupe_key="purge_deleted")
+    await session.commit()
+    for recipe_id in recipe_ids:
+        invalidate_flattened(recipe_id)
+
+
 async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
     statement = select(User).where(User.email == email)
     session_user = await session.execute(statement)
@@ -42,6 +71,27 @@ async def authenticate(*, session: AsyncSession, email: str, password: str) -> U
     db_user = await get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.password_hash):
+    if not await verify_password(password, db_user.password_hash):
         return None
+    # Upgrade hashes made with older parameters while the password is at hand
+    if needs_rehash(db_user.password_hash):
+        db_user.password_hash = await get_password_hash(password)
+        session.add(db_user)
+        await session.commit()
+        await session.refresh(db_user)
     return db_user
+
+
+async def adjust_counters(session: AsyncSession, user_id: uuid.UUID, **deltas: int) -> None:
+    """
+    Add to a user's counter columns in place, e.g. recipe_count=1.
+
+    The increment happens in the UPDATE itself, so concurrent writers never
+    lose each other's changes. The caller commits.
+    """
+    await session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values({name: getattr(User, name) + delta for name, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
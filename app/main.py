@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 import sentry_sdk
@@ -6,9 +7,15 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from starlette.middleware.cors import CORSMiddleware
 
-from app.core.db import init_db
+from app.core import metrics
+from app.core.db import engine, init_db
 from app.core.config import settings
 from app.api.main import api_router
+from app.core.jobs import start_workers
+from app.core.timing import ServerTimingMiddleware
+# Imported for the job kinds it registers
+from app.utils import job_handlers
+from app.utils.outliers import outlier_detection_loop
 
 
 logging.basicConfig(
@@ -26,7 +33,21 @@ if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
 async def lifespan(app: FastAPI):
     logger.info("Creating initial data")
     await init_db() 
+
+    # Background work: scheduled runs, and job workers unless they run apart
+    tasks = []
+    if settings.OUTLIER_DETECTION_INTERVAL_MINUTES:
+        tasks.append(asyncio.create_task(
+            outlier_detection_loop(settings.OUTLIER_DETECTION_INTERVAL_MINUTES)
+        ))
+    tasks.extend(start_workers(settings.JOB_WORKERS))
+    tasks.append(asyncio.create_task(
+        metrics.monitor_loop(engine.pool, settings.METRICS_SAMPLE_SECONDS)
+    ))
     yield
+    for task in tasks:
+        task.cancel()
+    metrics.mark_process_dead()
 
 # App instance
 app = FastAPI(
@@ -48,5 +69,8 @@ if settings.all_cors_origins:
         allow_origins=settings.all_cors_origins,
     )
 
+# Outermost, so the timing covers every other middleware
+app.add_middleware(ServerTimingMiddleware)
+
 # Include routers
 app.include_router(api_router)
@@ -1,6 +1,8 @@
 from .user import User
 
 from .recipe.recipe import Recipe
+from .feed import TimelineEntry
+from .job import Job
 # from .recipe.action import Action
 # from .recipe.allergen import Allergen
 # from .recipe.claim import Claim
@@ -0,0 +1,27 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Index
+from sqlmodel import Field, SQLModel
+
+from app.models.recipe.recipe import RecipePublic
+
+
+class TimelineEntry(SQLModel, table=True):
+    # Clearing a deleted recipe out of every timeline
+    __table_args__ = (Index("ix_timelineentry_recipe_id", "recipe_id"),)
+
+    # Primary key order makes a feed page one index range read per user
+    user_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True)
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), primary_key=True)
+    )
+    recipe_id: uuid.UUID = Field(foreign_key="recipe.id", primary_key=True)
+    author_id: uuid.UUID = Field(foreign_key="user.id")
+
+
+class FeedPublic(SQLModel):
+    data: List[RecipePublic]
+    # Pass back as `cursor` for the next page; NULL on the last page
+    next_cursor: Optional[str] = None
@@ -0,0 +1,61 @@
+import uuid
+
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import Column, DateTime, Index, JSON, func, text
+from sqlmodel import Field
+from sqlmodel import SQLModel
+
+
+class JobBase(SQLModel):
+    kind: str = Field(max_length=64)  # Name of a registered handler, e.g. "purge_deleted"
+    status: str = Field(default="queued", max_length=16)  # "queued", "running", "succeeded", "failed"
+    attempts: int = 0
+    max_attempts: int = 5
+    progress_done: int = 0
+    progress_total: Optional[int] = None
+    error: Optional[str] = None
+
+class Job(JobBase, table=True):
+    __table_args__ = (
+        # Dequeue: queued jobs in the order they become due
+        Index("ix_job_queued_run_at", "run_at", postgresql_where=text("status = 'queued'")),
+        # Recovering jobs whose worker stopped sending heartbeats
+        Index("ix_job_running_heartbeat_at", "heartbeat_at", postgresql_where=text("status = 'running'")),
+        # At most one queued job per dedupe key
+        Index("ix_job_queued_dedupe_key", "dedupe_key", unique=True, postgresql_where=text("status = 'queued'")),
+        # Pruning finished jobs, and unlinking them from purged users
+        Index("ix_job_finished_at", "finished_at", postgresql_where=text("finished_at IS NOT NULL")),
+        Index("ix_job_created_by", "created_by", postgresql_where=text("created_by IS NOT NULL")),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Keyword arguments for the handler
+    payload: dict[str, Any] = Field(default_factory=dict, sa_type=JSON)
+    result: Optional[dict[str, Any]] = Field(default=None, sa_type=JSON)
+    dedupe_key: Optional[str] = Field(default=None, max_length=255)
+    created_by: Optional[uuid.UUID] = Field(default=None, foreign_key="user.id")
+    worker: Optional[str] = None
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    )
+    # Not picked up before this; pushed back by retries
+    run_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    )
+    started_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    heartbeat_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    finished_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+
+class JobPublic(JobBase):
+    id: uuid.UUID
+    result: Optional[dict[str, Any]] = None
+    created_by: Optional[uuid.UUID] = None
+    created_at: datetime
+    run_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class JobsPublic(SQLModel):
+    data: list[JobPublic]
+    count: int
@@ -10,7 +10,7 @@ class FoodItemBase(SQLModel):
     description: Optional[str] = None
 
 class FoodItem(FoodItemBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4(), primary_key=True)
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     # Relationships
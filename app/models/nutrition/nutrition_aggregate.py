@@ -0,0 +1,38 @@
+import uuid
+
+from datetime import datetime
+from typing import Optional
+from pydantic import computed_field
+from sqlalchemy import Column, DateTime, func
+from sqlmodel import Field
+from sqlmodel import SQLModel
+
+
+class NutritionAggregateBase(SQLModel):
+    food_id: uuid.UUID = Field(foreign_key="fooditem.id", primary_key=True)
+    nutrition_id: str = Field(primary_key=True)
+    # Running aggregates over all entries for (food, nutrient), Welford style
+    entry_count: int = 0
+    value_sum: float = 0.0
+    mean: float = 0.0
+    m2: float = 0.0  # Sum of squared deviations from the mean
+
+class NutritionAggregate(NutritionAggregateBase, table=True):
+    updated_at: datetime = Field(
+        sa_column=Column(
+            DateTime(timezone=True),
+            server_default=func.now(),
+            onupdate=func.now()
+        )
+    )
+
+class NutritionAggregatePublic(NutritionAggregateBase):
+    updated_at: datetime
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def variance(self) -> Optional[float]:
+        # Sample variance, undefined for a single entry
+        if self.entry_count < 2:
+            return None
+        return self.m2 / (self.entry_count - 1)
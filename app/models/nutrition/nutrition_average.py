@@ -1,5 +1,8 @@
+import uuid
+
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 from sqlmodel import SQLModel
 from .food_item import FoodItem
@@ -7,15 +10,29 @@ from .food_item import FoodItem
 
 class NutritionAverageBase(SQLModel):
     version_id: str = Field(primary_key=True)
-    food_id: str = Field(foreign_key="fooditem.id", primary_key=True)
+    food_id: uuid.UUID = Field(foreign_key="fooditem.id", primary_key=True)
     nutrition_id: str = Field(primary_key=True)
     value: float
 
 class NutritionAverage(NutritionAverageBase, table=True):
+    # Lookups by version (and food) use the primary key
+    __table_args__ = (
+        Index("ix_nutritionaverage_food_id", "food_id"),
+    )
+
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    food_item: FoodItem = Relationship(back_populates="nutrition_averages")
+
 class NutritionAverageCreate(NutritionAverageBase):
     pass
 
 class NutritionAveragePublic(NutritionAverageBase):
     created_at: datetime
+
+class FoodNutritionMatrix(SQLModel):
+    version_id: str
+    food_ids: List[uuid.UUID]  # Rows
+    nutrition_ids: List[str]  # Columns
+    units: List[Optional[str]]  # Unit name per column
+    values: List[List[Optional[float]]]  # NULL where a food has no value
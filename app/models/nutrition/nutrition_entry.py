@@ -1,29 +1,68 @@
 import uuid
 
 from datetime import datetime
+from pydantic import field_validator
 from typing import Optional, List
-from sqlmodel import Field
+from sqlalchemy import Index
+from sqlmodel import Field, Relationship
 from sqlmodel import SQLModel
 
 
 class NutritionEntryBase(SQLModel):
-    food_id: str = Field(foreign_key="fooditem.id")
+    food_id: uuid.UUID = Field(foreign_key="fooditem.id")
     nutrition_id: str  # e.g., "H001"
     value: float
     source: str  # e.g., "manual", "csv_import", "api"
-    created_by: uuid.UUID = Field(foreign_key="user.id")
 
 class NutritionEntry(NutritionEntryBase, table=True):
-    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4(), primary_key=True)
+    __table_args__ = (
+        # Per (food, nutrient) aggregation and outlier scans, index-only with the value
+        Index("ix_nutritionentry_food_id_nutrition_id", "food_id", "nutrition_id", postgresql_include=["value"]),
+        # Purging a deleted user's entries
+        Index("ix_nutritionentry_created_by", "created_by"),
+    )
+
+    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4, primary_key=True)
+    created_by: uuid.UUID = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    food_item: "FoodItem" = Relationship(back_populates="nutrition_entries") # type: ignore
+
 class NutritionEntryCreate(NutritionEntryBase):
     pass
 
+# The author of an entry is whoever created it, never part of a request
+class NutritionEntryUpdate(SQLModel):
+    food_id: Optional[uuid.UUID] = None
+    nutrition_id: Optional[str] = None
+    value: Optional[float] = None
+    source: Optional[str] = None
+
+    # Fields may be left out, but every column is required, and a NULL
+    # value would poison the running aggregates
+    @field_validator("food_id", "nutrition_id", "value", "source")
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
 class NutritionEntryPublic(NutritionEntryBase):
     id: uuid.UUID
+    created_by: uuid.UUID
     created_at: datetime
 
 class NutritionEntriesPublic(SQLModel):
     data: List[NutritionEntryPublic]
     count: int
+
+class NutritionImportError(SQLModel):
+    row: int  # Line number in the uploaded file
+    error: str
+
+class NutritionImportResult(SQLModel):
+    rows: int  # Data rows read
+    inserted: int
+    duplicates: int  # Valid rows already imported by an earlier attempt
+    rejected: int
+    errors: List[NutritionImportError]  # Capped at NUTRITION_IMPORT_MAX_ERRORS
@@ -2,19 +2,27 @@ import uuid
 
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import Field
 from sqlmodel import SQLModel
 
 
 class OutlierFlagBase(SQLModel):
-    entry_id: str = Field(foreign_key="nutritionentry.id")
-    flagged_by: Optional[uuid.UUID] = Field(foreign_key="user.id")  # NULL if auto-detected
+    entry_id: uuid.UUID = Field(foreign_key="nutritionentry.id")
+    flagged_by: Optional[uuid.UUID] = Field(default=None, foreign_key="user.id")  # NULL if auto-detected
     decision: str  # "pending", "keep", "delete"
-    reviewed_by: Optional[uuid.UUID] = Field(foreign_key="user.id")
+    reviewed_by: Optional[uuid.UUID] = Field(default=None, foreign_key="user.id")
     reviewed_at: Optional[datetime] = None
 
 class OutlierFlag(OutlierFlagBase, table=True):
-    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4(), primary_key=True)
+    __table_args__ = (
+        Index("ix_outlierflag_entry_id", "entry_id"),
+        # Review queue, oldest first
+        Index("ix_outlierflag_decision_created_at", "decision", "created_at"),
+    )
+
+    id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class OutlierFlagCreate(OutlierFlagBase):
     pass
@@ -22,3 +30,8 @@ class OutlierFlagCreate(OutlierFlagBase):
 class OutlierFlagPublic(OutlierFlagBase):
     id: uuid.UUID
     created_at: datetime
+
+class OutlierDetectionResult(SQLModel):
+    scanned: int  # Entries loaded
+    groups: int  # (food, nutrient) groups
+    flagged: int  # New pending flags written
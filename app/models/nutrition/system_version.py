@@ -1,5 +1,8 @@
+import uuid
+
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
+from sqlalchemy import Index, text
 from sqlmodel import Field
 from sqlmodel import SQLModel
 
@@ -12,10 +15,36 @@ class SystemVersionBase(SQLModel):
     description: Optional[str] = None
 
 class SystemVersion(SystemVersionBase, table=True):
-    published_at: datetime = Field(default_factory=datetime.utcnow)
+    __table_args__ = (
+        # Latest published version
+        Index(
+            "ix_systemversion_published_order", "year", "month", "sub_version",
+            postgresql_where=text("published_at IS NOT NULL"),
+        ),
+    )
+
+    # NULL while the version is a draft; published versions are immutable
+    published_at: Optional[datetime] = None
 
 class SystemVersionCreate(SystemVersionBase):
     pass
 
 class SystemVersionPublic(SystemVersionBase):
-    published_at: datetime
+    published_at: Optional[datetime]
+
+class NutritionDiffEntry(SQLModel):
+    food_id: uuid.UUID
+    nutrition_id: str
+    kind: Literal["added", "removed", "changed"]
+    base_value: Optional[float]
+    target_value: Optional[float]
+    relative_change: Optional[float]  # NULL for added/removed pairs and moves away from zero
+
+class NutritionVersionDiff(SQLModel):
+    base_version: str
+    target_version: str
+    added: int
+    removed: int
+    changed: int
+    count: int  # Entries matching the requested kind
+    data: List[NutritionDiffEntry]
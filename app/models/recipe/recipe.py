@@ -1,6 +1,6 @@
 from pydantic import model_validator
 from sqlmodel import Field, SQLModel, Relationship
-from sqlalchemy import Column, DateTime, func, JSON
+from sqlalchemy import Column, DateTime, Index, func, text, JSON
 from typing import List, Optional, Literal, Union
 import uuid
 from datetime import datetime
@@ -45,6 +45,9 @@ class RawMaterialIngredient(SQLModel):
 class SubRecipeIngredient(SQLModel):
     type: Literal["sub_recipe"]
     # recipe_code: str = Field(regex=r"^[1-9A-F]{7}-[1-9A-F]{5}$")
+    # ID of the nested recipe (a specific version). Required on upload, but
+    # missing from sub-recipes stored before nesting was resolved by ID
+    recipe_id: Optional[str] = Field(default=None, regex=r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
     internal_id: str = Field(regex=r"^C[0-9A-F]{3}$")
     quantity: TimedQuantity
 
@@ -109,6 +112,9 @@ class VisualReferences(SQLModel):
 # ---------------------------
 
 class UserRecipeSave(SQLModel, table=True):
+    # Purging a deleted recipe's saves
+    __table_args__ = (Index("ix_userrecipesave_recipe_id", "recipe_id"),)
+
     user_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True)
     recipe_id: uuid.UUID = Field(foreign_key="recipe.id", primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -122,8 +128,17 @@ class UserRecipeSave(SQLModel, table=True):
 # Database Model
 # ---------------------------
 class RecipeListRecipe(SQLModel, table=True):
+    __table_args__ = (
+        # A list's recipes in order, read one page at a time
+        Index("ix_recipelistrecipe_list_position", "recipe_list_id", "position", "recipe_id"),
+        # Removing a deleted recipe from every list holding it
+        Index("ix_recipelistrecipe_recipe_id", "recipe_id"),
+    )
+
     recipe_list_id: uuid.UUID = Field(foreign_key="recipelist.id", primary_key=True)
     recipe_id: uuid.UUID = Field(foreign_key="recipe.id", primary_key=True)
+    # Explicit order within the list, ascending
+    position: int = Field(default=0)
     added_at: datetime = Field(
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
     )
@@ -144,6 +159,18 @@ class RecipeBase(SQLModel):
     visual_references: VisualReferences | None = Field(default=None, sa_type=JSON)
 
 class Recipe(RecipeBase, table=True):
+    __table_args__ = (
+        # An author's recipes, newest first (feed backfill and pull)
+        Index("ix_recipe_author_id_created_at", "author_id", "created_at"),
+        # Tombstoned recipes waiting to be purged
+        Index("ix_recipe_deleted_at", "deleted_at", postgresql_where=text("deleted_at IS NOT NULL")),
+        # Unlinking the later versions of a purged recipe
+        Index("ix_recipe_original_recipe_id", "original_recipe_id"),
+        Index("ix_recipe_previous_version_id", "previous_version_id"),
+        # Finding the recipes that nest a sub-recipe (containment queries)
+        Index("ix_recipe_ingredients", text("(ingredients::jsonb) jsonb_path_ops"), postgresql_using="gin"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     description: str
     created_at: datetime = Field(
@@ -160,6 +187,10 @@ class Recipe(RecipeBase, table=True):
         )
     )
     save_count: int = Field(default=0)
+    # Set on delete; the row is hidden from reads until it is purged
+    deleted_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
     version_number: int = Field(default=1, ge=1)
     original_recipe_id: Optional[uuid.UUID] = Field(
         default=None,
@@ -202,20 +233,46 @@ class RecipePublic(RecipeBase):
     version_number: int
     original_recipe_id: Optional[uuid.UUID] = None
     previous_version_id: Optional[uuid.UUID] = None
-    current_author_id: uuid.UUID = Field(
+    current_author_id: Optional[uuid.UUID] = Field(
+        default=None,
         description="User who created THIS version",
         foreign_key="user.id"
     )
+    # Per-viewer flags, only set for signed-in users
+    saved_by_me: Optional[bool] = None
+    author_followed: Optional[bool] = None
+    in_lists: Optional[List[uuid.UUID]] = Field(
+        default=None,
+        description="IDs of the viewer's lists containing this recipe"
+    )
 
 class RecipesPublic(SQLModel):
     data: list[RecipePublic]
     count: int
 
-class RecipeList(SQLModel, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    name: str = Field(index=True)
+class FlattenedIngredient(SQLModel):
+    ingredient_id: str
+    quantity: TimedQuantity
+
+class FlattenedRecipePublic(SQLModel):
+    recipe_id: uuid.UUID
+    servings: float
+    ingredients: list[FlattenedIngredient]
+
+class RecipeListBase(SQLModel):
+    name: str = Field(index=True, max_length=255)
     private: bool = Field(default=False)
+
+class RecipeList(RecipeListBase, table=True):
+    __table_args__ = (
+        # A user's lists, newest first
+        Index("ix_recipelist_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_id: uuid.UUID = Field(foreign_key="user.id")
+    # Maintained on bulk add/remove so list pages need no count(*)
+    recipe_count: int = Field(default=0)
     created_at: datetime = Field(
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
     )
@@ -226,3 +283,32 @@ class RecipeList(SQLModel, table=True):
     # Relationships
     user: "User" = Relationship(back_populates="recipe_lists") # type: ignore
     recipes: List["Recipe"] = Relationship(back_populates="recipe_lists", link_model=RecipeListRecipe)
+
+class RecipeListCreate(RecipeListBase):
+    pass
+
+class RecipeListUpdate(SQLModel):
+    name: Optional[str] = Field(default=None, max_length=255)
+    private: Optional[bool] = None
+
+class RecipeListPublic(RecipeListBase):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    recipe_count: int
+    created_at: datetime
+    last_modified_at: datetime
+
+class RecipeListsPublic(SQLModel):
+    data: list[RecipeListPublic]
+    count: int
+
+class RecipeListRecipesPublic(SQLModel):
+    data: list[RecipePublic]
+    # Pass back as `cursor` for the next page; NULL on the last page
+    next_cursor: Optional[str] = None
+
+class RecipeIds(SQLModel):
+    recipe_ids: List[uuid.UUID] = Field(min_length=1, max_length=500)
+
+class RecipeIdsPublic(SQLModel):
+    recipe_ids: List[uuid.UUID]
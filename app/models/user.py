@@ -1,9 +1,9 @@
 import uuid
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from pydantic import EmailStr
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import Column, DateTime, Index, func, text
 from sqlmodel import Field, SQLModel, Relationship
 
 from app.models.recipe.recipe import UserRecipeSave
@@ -18,6 +18,11 @@ class UserBase(SQLModel):
 
 # Database model, database table inferred from class name
 class User(UserBase, table=True):
+    __table_args__ = (
+        # Tombstoned users waiting to be purged
+        Index("ix_user_deleted_at", "deleted_at", postgresql_where=text("deleted_at IS NOT NULL")),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     email: EmailStr = Field(unique=True, index=True, max_length=255)
     password_hash: str
@@ -27,13 +32,31 @@ class User(UserBase, table=True):
             server_default=func.now()
         )
     )
+    # Set on delete; the row is hidden from reads until it is purged
+    deleted_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
 
     # Relationship for recipes the user has saved
     saved_recipes: List[UserRecipeSave] = Relationship(back_populates="user")
 
+    # Maintained on follow/unfollow; decides whether new recipes are fanned out
+    follower_count: int = Field(default=0)
+
+    # Profile counters, updated in the same transaction as the rows they count
+    following_count: int = Field(default=0)
+    recipe_count: int = Field(default=0)
+    saves_received_count: int = Field(default=0)
+
     # Following relationships
-    following_relationships: List["UserFollow"] = Relationship(back_populates="follower")
-    follower_relationships: List["UserFollow"] = Relationship(back_populates="followed")
+    following_relationships: List["UserFollow"] = Relationship(
+        back_populates="follower",
+        sa_relationship_kwargs={"foreign_keys": "[UserFollow.follower_id]"},
+    )
+    follower_relationships: List["UserFollow"] = Relationship(
+        back_populates="followed",
+        sa_relationship_kwargs={"foreign_keys": "[UserFollow.followed_id]"},
+    )
     
     # Convenience properties to get actual User instances
     @property
@@ -80,6 +103,26 @@ class UpdatePassword(SQLModel):
 # Properties to return via API, id is always required
 class UserPublic(UserBase):
     id: uuid.UUID
+    follower_count: int = 0
+    following_count: int = 0
+    recipe_count: int = 0
+    saves_received_count: int = 0
+
+
+# Properties other users may see
+class UserProfile(SQLModel):
+    id: uuid.UUID
+    username: str
+    follower_count: int = 0
+    following_count: int = 0
+    recipe_count: int = 0
+    saves_received_count: int = 0
+
+
+class UserProfilesPublic(SQLModel):
+    data: list[UserProfile]
+    # Pass back as `cursor` for the next page; NULL on the last page
+    next_cursor: Optional[str] = None
 
 
 class UsersPublic(SQLModel):
@@ -87,6 +130,12 @@ class UsersPublic(SQLModel):
     count: int
 
 class UserFollow(SQLModel, table=True):
+    # Follower and following lists are keyset range reads on these
+    __table_args__ = (
+        Index("ix_userfollow_followed_id_created_at", "followed_id", "created_at", "follower_id"),
+        Index("ix_userfollow_follower_id_created_at", "follower_id", "created_at", "followed_id"),
+    )
+
     follower_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True)
     followed_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True)
     created_at: datetime = Field(
@@ -94,8 +143,14 @@ class UserFollow(SQLModel, table=True):
     )
 
     # Relationships
-    follower: "User" = Relationship(back_populates="following_relationships")
-    followed: "User" = Relationship(back_populates="follower_relationships")
+    follower: "User" = Relationship(
+        back_populates="following_relationships",
+        sa_relationship_kwargs={"foreign_keys": "[UserFollow.follower_id]"},
+    )
+    followed: "User" = Relationship(
+        back_populates="follower_relationships",
+        sa_relationship_kwargs={"foreign_keys": "[UserFollow.followed_id]"},
+    )
 
 
 # JSON payload containing access token
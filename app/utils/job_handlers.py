@@ -0,0 +1,32 @@
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.jobs import JobContext, JobFailed, job_handler
+from app.crud import crud_nutrition
+from app.utils import outliers, purge
+
+
+# Every process running job workers imports this module, so each kind is
+# registered before a job of that kind can be claimed
+
+
+@job_handler("purge_deleted")
+async def purge_deleted(session: AsyncSession, context: JobContext) -> dict:
+    users, recipes = await purge.purge_deleted(session, progress=context.progress)
+    return {"users": users, "recipes": recipes}
+
+
+@job_handler("detect_outliers")
+async def detect_outliers(session: AsyncSession, context: JobContext) -> dict:
+    result = await outliers.detect_outliers(session)
+    return result.model_dump()
+
+
+@job_handler("rebuild_nutrition_averages")
+async def rebuild_nutrition_averages(session: AsyncSession, context: JobContext, version_id: str) -> dict:
+    try:
+        count = await crud_nutrition.rebuild_nutrition_averages(session=session, version_id=version_id)
+    except HTTPException as e:
+        # The version went away or was published after the job was queued
+        raise JobFailed(e.detail)
+    return {"averages": count}
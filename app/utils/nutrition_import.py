@@ -0,0 +1,221 @@
+import csv
+import json
+import math
+import uuid
+import codecs
+from datetime import datetime
+from typing import AsyncIterator, Literal
+
+from sqlmodel import select
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    MetaData,
+    String,
+    Table,
+    Uuid,
+    false,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.crud_nutrition import add_to_aggregates, entry_partials
+from app.models.user import User
+from app.models.recipe.nutrition import Nutrition
+from app.models.nutrition.food_item import FoodItem
+from app.models.nutrition.nutrition_entry import (
+    NutritionEntry,
+    NutritionImportError,
+    NutritionImportResult,
+)
+
+
+# Namespace for entry IDs derived from an idempotency key, so a retried import inserts nothing twice
+IMPORT_NAMESPACE = uuid.UUID("6f1c1f0e-3b7a-4d8e-9a57-1f0c2e9b8d41")
+
+ENTRY_COLUMNS = ["id", "food_id", "nutrition_id", "value", "source", "created_by", "created_at"]
+
+# Per-transaction staging table the upload is COPY'd into
+staging = Table(
+    "nutritionentry_import",
+    MetaData(),
+    Column("id", Uuid, primary_key=True),
+    Column("food_id", Uuid, nullable=False),
+    Column("nutrition_id", String, nullable=False),
+    Column("value", Float, nullable=False),
+    Column("source", String, nullable=False),
+    Column("created_by", Uuid, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("inserted", Boolean, nullable=False, server_default=false()),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+# Nutrient reference IDs (never change after init_db)
+_nutrition_ids: set[str] = set()
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Decode incrementally so multi-byte characters may span chunks
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def _rows(
+    chunks: AsyncIterator[bytes], format: Literal["csv", "ndjson"]
+) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Yield (line number, row, parse error) for every non-blank line of the upload.
+    """
+    header = None
+    line_number = 0
+    async for line in _lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        if format == "ndjson":
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f"Invalid JSON: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Expected a JSON object"
+                continue
+            yield line_number, row, None
+        elif header is None:
+            header = [name.strip() for name in next(csv.reader([line]))]
+        else:
+            values = next(csv.reader([line]))
+            if len(values) != len(header):
+                yield line_number, None, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_number, dict(zip(header, values)), None
+
+
+def _parse(row: dict, default_source: str) -> tuple[uuid.UUID, str, float, str]:
+    try:
+        food_id = uuid.UUID(str(row["food_id"]))
+    except KeyError:
+        raise ValueError("Missing food_id")
+    except ValueError:
+        raise ValueError(f"Invalid food_id: {row['food_id']}")
+
+    nutrition_id = str(row.get("nutrition_id", "")).strip()
+    if nutrition_id not in _nutrition_ids:
+        raise ValueError(f"Unknown nutrition_id: {nutrition_id or None}")
+
+    try:
+        value = float(row["value"])
+    except KeyError:
+        raise ValueError("Missing value")
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value: {row['value']}")
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid value: {row['value']}")
+
+    return food_id, nutrition_id, value, str(row.get("source") or default_source)
+
+
+async def import_nutrition_entries(
+    session: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    format: Literal["csv", "ndjson"],
+    user: User,
+    import_key: str | None = None,
+) -> NutritionImportResult:
+    """
+    Stream a CSV or NDJSON upload of nutrition entries into the database.
+
+    Rows are validated in chunks against the food and nutrient reference data
+    and COPY'd into a temporary staging table, then moved into the entries
+    table and merged into the running aggregates in two set-based statements.
+    With an `import_key`, entry IDs are derived from it and the line number, so
+    retrying the upload with the same key never inserts a row twice. Without
+    one every row is new: two uploads may well share a row by chance.
+    """
+    if not _nutrition_ids:
+        result = await session.execute(select(Nutrition.id))
+        _nutrition_ids.update(result.scalars().all())
+
+    connection = await session.connection()
+    await connection.run_sync(staging.create)
+    raw_connection = await connection.get_raw_connection()
+
+    result = NutritionImportResult(rows=0, inserted=0, duplicates=0, rejected=0, errors=[])
+    now = datetime.utcnow()
+    default_source = f"{format}_import"
+
+    def reject(line_number: int, error: str) -> None:
+        result.rejected += 1
+        if len(result.errors) < settings.NUTRITION_IMPORT_MAX_ERRORS:
+            result.errors.append(NutritionImportError(row=line_number, error=error))
+
+    async def flush(chunk: list[tuple[int, uuid.UUID, str, float, str]]) -> None:
+        # One lookup per chunk for the foods it references
+        food_ids = {food_id for _, food_id, _, _, _ in chunk}
+        known = await session.execute(select(FoodItem.id).where(FoodItem.id.in_(food_ids)))
+        known_food_ids = set(known.scalars().all())
+
+        records = []
+        for line_number, food_id, nutrition_id, value, source in chunk:
+            if food_id not in known_food_ids:
+                reject(line_number, f"Unknown food_id: {food_id}")
+                continue
+            if import_key:
+                entry_id = uuid.uuid5(IMPORT_NAMESPACE, f"{user.id}:{import_key}:{line_number}")
+            else:
+                entry_id = uuid.uuid4()
+            records.append((entry_id, food_id, nutrition_id, value, source, user.id, now))
+
+        if records:
+            await raw_connection.driver_connection.copy_records_to_table(
+                staging.name, records=records, columns=ENTRY_COLUMNS
+            )
+
+    chunk = []
+    async for line_number, row, error in _rows(chunks, format):
+        result.rows += 1
+        if error:
+            reject(line_number, error)
+            continue
+        try:
+            chunk.append((line_number, *_parse(row, default_source)))
+        except ValueError as e:
+            reject(line_number, str(e))
+            continue
+        if len(chunk) >= settings.NUTRITION_IMPORT_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+
+    # Move new rows into the entries table and mark which ones were inserted
+    inserted = (
+        pg_insert(NutritionEntry)
+        .from_select(ENTRY_COLUMNS, select(*(staging.c[name] for name in ENTRY_COLUMNS)))
+        .on_conflict_do_nothing(index_elements=["id"])
+        .returning(NutritionEntry.id)
+        .cte("inserted")
+    )
+    marked = await session.execute(
+        update(staging).where(staging.c.id == inserted.c.id).values(inserted=True)
+    )
+    result.inserted = marked.rowcount
+    result.duplicates = result.rows - result.rejected - result.inserted
+
+    await add_to_aggregates(session, entry_partials(staging.c.inserted, entries=staging))
+    await session.commit()
+    return result
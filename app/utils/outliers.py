@@ -0,0 +1,169 @@
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Sequence
+
+import numpy as np
+
+from sqlmodel import select
+from sqlalchemy import Row, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.core.jobs import enqueue
+from app.models.nutrition.nutrition_entry import NutritionEntry
+from app.models.nutrition.outlier_flag import OutlierFlag, OutlierDetectionResult
+
+
+logger = logging.getLogger(__name__)
+
+# Scale factors turning MAD / mean absolute deviation into a standard deviation
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.253314
+
+# Arbitrary key so only one worker runs detection at a time
+ADVISORY_LOCK_KEY = 0x0F1A6
+
+
+def _segment_medians(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # `values` sorted within each contiguous segment
+    lower = values[starts + (counts - 1) // 2]
+    upper = values[starts + counts // 2]
+    return (lower + upper) / 2
+
+
+def robust_outliers(
+    groups: np.ndarray,
+    values: np.ndarray,
+    threshold: float,
+    min_group_size: int,
+) -> np.ndarray:
+    """
+    Flag values whose modified z-score within their group exceeds `threshold`.
+
+    `groups` holds a dense integer group code per value. Medians and median
+    absolute deviations are computed for all groups at once from sorted
+    segments; groups whose MAD is zero fall back to the mean absolute deviation.
+    Returns a boolean mask aligned with `values`.
+    """
+    if not len(values):
+        return np.zeros(0, dtype=bool)
+
+    # Sort by group, then value, so each group is a contiguous sorted segment
+    order = np.lexsort((values, groups))
+    grouped, ordered = groups[order], values[order]
+    counts = np.bincount(grouped)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    medians = _segment_medians(ordered, starts, counts)
+    deviations = np.abs(ordered - medians[grouped])
+    # Groups stay contiguous when re-sorting by deviation within them
+    mads = _segment_medians(deviations[np.lexsort((deviations, grouped))], starts, counts)
+    mean_ads = np.bincount(grouped, weights=deviations) / counts
+
+    spread = np.where(mads > 0, MAD_SCALE * mads, MEAN_AD_SCALE * mean_ads)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = deviations / spread[grouped]
+    outlier = (counts[grouped] >= min_group_size) & (spread[grouped] > 0) & (scores > threshold)
+
+    mask = np.empty_like(outlier)
+    mask[order] = outlier
+    return mask
+
+
+async def _flag_outliers(session: AsyncSession, rows: Sequence[Row], now: datetime) -> tuple[int, int, int]:
+    """
+    Score whole (food, nutrient) groups, given as (food_id, nutrition_id, id,
+    value, has_flag) rows sorted by group, and insert `pending` flags for
+    outliers that have none yet. Returns the number of entries, groups and
+    new flags.
+    """
+    keys = [(row[0], row[1]) for row in rows]
+    starts = np.fromiter(
+        (i == 0 or keys[i] != keys[i - 1] for i in range(len(rows))), dtype=bool, count=len(rows)
+    )
+    groups = np.cumsum(starts) - 1
+    values = np.fromiter((row[3] for row in rows), dtype=np.float64, count=len(rows))
+    flagged = np.fromiter((row[4] for row in rows), dtype=bool, count=len(rows))
+
+    outliers = robust_outliers(
+        groups, values, settings.OUTLIER_Z_THRESHOLD, settings.OUTLIER_MIN_GROUP_SIZE
+    )
+    new_ids = [rows[i][2] for i in np.flatnonzero(outliers & ~flagged)]
+
+    for start in range(0, len(new_ids), settings.OUTLIER_FLAG_BATCH_SIZE):
+        batch = new_ids[start:start + settings.OUTLIER_FLAG_BATCH_SIZE]
+        await session.execute(
+            insert(OutlierFlag),
+            [
+                {"id": uuid.uuid4(), "entry_id": entry_id, "decision": "pending", "created_at": now}
+                for entry_id in batch
+            ],
+        )
+    return len(rows), int(starts.sum()), len(new_ids)
+
+
+async def detect_outliers(session: AsyncSession) -> OutlierDetectionResult:
+    """
+    Flag outlying nutrition entries per (food, nutrient) group.
+
+    Streams entries in group order from the (food, nutrient) index and
+    scores them a batch of whole groups at a time, so memory stays bounded
+    by OUTLIER_SCAN_BATCH_SIZE and the largest group rather than the table.
+    Inserts `pending` flags for entries that have no flag yet.
+    """
+    # Skip if another worker is already running detection
+    locked = await session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY}
+    )
+    if not locked.scalar():
+        logger.info("Outlier detection already running elsewhere, skipping")
+        return OutlierDetectionResult(scanned=0, groups=0, flagged=0)
+
+    has_flag = select(OutlierFlag.id).where(OutlierFlag.entry_id == NutritionEntry.id).exists()
+    result = await session.stream(
+        select(
+            NutritionEntry.food_id, NutritionEntry.nutrition_id,
+            NutritionEntry.id, NutritionEntry.value, has_flag,
+        )
+        .order_by(NutritionEntry.food_id, NutritionEntry.nutrition_id)
+        .execution_options(yield_per=settings.OUTLIER_SCAN_BATCH_SIZE)
+    )
+
+    now = datetime.utcnow()
+    counts = []
+    pending: list[Row] = []
+    async for partition in result.partitions():
+        for row in partition:
+            # Only cut the batch between groups, so each is scored whole
+            if (
+                len(pending) >= settings.OUTLIER_SCAN_BATCH_SIZE
+                and (row[0], row[1]) != (pending[-1][0], pending[-1][1])
+            ):
+                counts.append(await _flag_outliers(session, pending, now))
+                pending = []
+            pending.append(row)
+    if pending:
+        counts.append(await _flag_outliers(session, pending, now))
+    await session.commit()
+
+    scanned, groups, flagged = map(sum, zip((0, 0, 0), *counts))
+
+    return OutlierDetectionResult(scanned=scanned, groups=groups, flagged=flagged)
+
+
+async def outlier_detection_loop(interval_minutes: int) -> None:
+    """
+    Queue an outlier detection job every `interval_minutes` until cancelled.
+    Every API process schedules; the dedupe key keeps it to one queued job.
+    """
+    while True:
+        await asyncio.sleep(interval_minutes * 60)
+        try:
+            async with AsyncSessionLocal() as session:
+                await enqueue(session, "detect_outliers", dedupe_key="detect_outliers")
+                await session.commit()
+        except Exception:
+            logger.exception("Scheduling outlier detection failed")
@@ -0,0 +1,45 @@
+import uuid
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+
+def _encode(value: str) -> str:
+    # URL-safe without escaping, and opaque so clients don't build their own
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> str:
+    # Raises ValueError for anything we didn't encode
+    return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+
+
+def encode_cursor(created_at: datetime, id: uuid.UUID) -> str:
+    """
+    Opaque keyset cursor for the row after which the next page starts.
+    """
+    return _encode(f"{created_at.isoformat()}_{id}")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        created_at, id = _decode(cursor).rsplit("_", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(id)
+    except ValueError:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor")
+
+
+def encode_position_cursor(position: int, id: uuid.UUID) -> str:
+    """
+    Keyset cursor for lists ordered by an explicit position.
+    """
+    return _encode(f"{position}_{id}")
+
+
+def decode_position_cursor(cursor: str) -> tuple[int, uuid.UUID]:
+    try:
+        position, id = _decode(cursor).split("_", 1)
+        return int(position), uuid.UUID(id)
+    except ValueError:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid cursor")
@@ -0,0 +1,241 @@
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from sqlmodel import func, select
+from sqlalchemy import delete, exists, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.crud.crud_nutrition import entry_partials, remove_from_aggregates
+from app.crud.crud_recipe import count_saves
+from app.models.job import Job
+from app.models.user import User, UserFollow
+from app.models.feed import TimelineEntry
+from app.models.recipe.recipe import Recipe, RecipeList, RecipeListRecipe, UserRecipeSave
+from app.models.nutrition.nutrition_entry import NutritionEntry
+from app.models.nutrition.outlier_flag import OutlierFlag
+from app.utils.sub_recipes import nests
+
+
+def _batch(model, *criteria, limit: int):
+    # Rows of `model` among the first `limit` matching `criteria`, by primary key
+    key = list(model.__table__.primary_key.columns)
+    return tuple_(*key).in_(select(*key).where(*criteria).limit(limit))
+
+
+async def _drain(session: AsyncSession, step: Callable[[int], Awaitable[int]]) -> int:
+    """
+    Run `step(limit)` until it handles fewer than a batch of rows,
+    committing after each batch so no lock is held for long.
+    """
+    total = 0
+    while True:
+        handled = await step(settings.PURGE_BATCH_SIZE)
+        await session.commit()
+        total += handled
+        if handled < settings.PURGE_BATCH_SIZE:
+            return total
+
+
+def _deleting(session: AsyncSession, model, *criteria, then=None) -> Callable[[int], Awaitable[int]]:
+    """
+    Step deleting a batch of `model` rows matching `criteria`.
+
+    `then` is an optional (column, callback) pair: the callback is awaited
+    with that column of the deleted rows, in the same transaction.
+    """
+    column, callback = then or (list(model.__table__.primary_key.columns)[0], None)
+
+    async def step(limit: int) -> int:
+        result = await session.execute(
+            delete(model)
+            .where(_batch(model, *criteria, limit=limit))
+            .returning(column)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = list(result.scalars())
+        if deleted and callback:
+            await callback(deleted)
+        return len(deleted)
+    return step
+
+
+def _updating(session: AsyncSession, model, *criteria, **values) -> Callable[[int], Awaitable[int]]:
+    # Step setting `values` on a batch of `model` rows matching `criteria`
+    async def step(limit: int) -> int:
+        result = await session.execute(
+            update(model)
+            .where(_batch(model, *criteria, limit=limit))
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+    return step
+
+
+def _adjust(session: AsyncSession, model, **deltas: int) -> Callable[[list], Awaitable[None]]:
+    # Callback adding `deltas` to counters of the `model` rows with the given IDs
+    async def callback(ids: list) -> None:
+        await session.execute(
+            update(model)
+            .where(model.id.in_(ids))
+            .values({name: getattr(model, name) + delta for name, delta in deltas.items()})
+            .execution_options(synchronize_session=False)
+        )
+    return callback
+
+
+def _unnested():
+    # Recipes no other recipe nests. Flattening reads tombstoned sub-recipes,
+    # so a recipe nested by any recipe that may still be flattened is kept;
+    # once its parents are gone a later purge picks it up
+    parent = aliased(Recipe)
+    return ~exists().where(nests(parent, Recipe.id))
+
+
+async def purge_recipe(session: AsyncSession, recipe_id: uuid.UUID) -> None:
+    """
+    Remove a tombstoned recipe and the rows referencing it. Callers pick
+    only recipes no other recipe nests.
+
+    The author's counters were adjusted when the recipe was tombstoned;
+    list counts are adjusted here as the entries go.
+    """
+    await _drain(session, _deleting(session, UserRecipeSave, UserRecipeSave.recipe_id == recipe_id))
+    await _drain(session, _deleting(
+        session, RecipeListRecipe, RecipeListRecipe.recipe_id == recipe_id,
+        then=(RecipeListRecipe.recipe_list_id, _adjust(session, RecipeList, recipe_count=-1)),
+    ))
+    await _drain(session, _deleting(session, TimelineEntry, TimelineEntry.recipe_id == recipe_id))
+    # Later versions outlive the recipe they were made from
+    await _drain(session, _updating(session, Recipe, Recipe.original_recipe_id == recipe_id, original_recipe_id=None))
+    await _drain(session, _updating(session, Recipe, Recipe.previous_version_id == recipe_id, previous_version_id=None))
+
+    await session.execute(
+        delete(Recipe).where(Recipe.id == recipe_id).execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+
+async def _purge_nutrition_entries(session: AsyncSession, user_id: uuid.UUID, limit: int) -> int:
+    # One batch of a user's nutrition entries, taken out of the aggregates first.
+    # Locked until the batch commits, so a concurrent purge passes over them
+    # rather than taking them out of the aggregates a second time
+    result = await session.execute(
+        select(NutritionEntry.id)
+        .where(NutritionEntry.created_by == user_id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    entry_ids = list(result.scalars())
+    if entry_ids:
+        await remove_from_aggregates(session, entry_partials(NutritionEntry.id.in_(entry_ids)))
+        await session.execute(
+            delete(OutlierFlag)
+            .where(OutlierFlag.entry_id.in_(entry_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(
+            delete(NutritionEntry)
+            .where(NutritionEntry.id.in_(entry_ids))
+            .execution_options(synchronize_session=False)
+        )
+    return len(entry_ids)
+
+
+async def purge_user(session: AsyncSession, user_id: uuid.UUID) -> int:
+    """
+    Remove a tombstoned user, everything they own and their marks on other
+    users' counters. Returns the number of their recipes purged.
+
+    Recipes still nested by another recipe are kept, and so is the user
+    row they reference, until a later purge finds them unnested.
+    """
+    # delete_user hid their recipes already; this catches any created since
+    await _drain(session, _updating(
+        session, Recipe, Recipe.author_id == user_id, Recipe.deleted_at.is_(None), deleted_at=func.now()
+    ))
+
+    await _drain(session, _deleting(
+        session, UserFollow, UserFollow.follower_id == user_id,
+        then=(UserFollow.followed_id, _adjust(session, User, follower_count=-1)),
+    ))
+    await _drain(session, _deleting(
+        session, UserFollow, UserFollow.followed_id == user_id,
+        then=(UserFollow.follower_id, _adjust(session, User, following_count=-1)),
+    ))
+    await _drain(session, _deleting(session, TimelineEntry, TimelineEntry.user_id == user_id))
+    await _drain(session, _deleting(
+        session, UserRecipeSave, UserRecipeSave.user_id == user_id,
+        then=(UserRecipeSave.recipe_id, lambda recipe_ids: count_saves(session, recipe_ids, -1)),
+    ))
+
+    own_lists = select(RecipeList.id).where(RecipeList.user_id == user_id)
+    await _drain(session, _deleting(session, RecipeListRecipe, RecipeListRecipe.recipe_list_id.in_(own_lists)))
+    await _drain(session, _deleting(session, RecipeList, RecipeList.user_id == user_id))
+
+    await _drain(session, lambda limit: _purge_nutrition_entries(session, user_id, limit))
+    await _drain(session, _updating(session, OutlierFlag, OutlierFlag.flagged_by == user_id, flagged_by=None))
+    await _drain(session, _updating(session, OutlierFlag, OutlierFlag.reviewed_by == user_id, reviewed_by=None))
+    await _drain(session, _updating(session, Job, Job.created_by == user_id, created_by=None))
+
+    recipes = 0
+    while recipe_ids := await _tombstoned(session, Recipe, Recipe.author_id == user_id, _unnested()):
+        for recipe_id in recipe_ids:
+            await purge_recipe(session, recipe_id)
+        recipes += len(recipe_ids)
+
+    kept = await session.execute(
+        select(Recipe.id).where(Recipe.author_id == user_id).limit(1).execution_options(include_deleted=True)
+    )
+    if kept.first() is None:
+        await session.execute(
+            delete(User).where(User.id == user_id).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    return recipes
+
+
+async def _tombstoned(session: AsyncSession, model, *criteria, after=None) -> list:
+    # IDs of a batch of tombstoned rows, which ordinary reads don't see, in
+    # ID order from just past `after`
+    if after is not None:
+        criteria += (model.id > after,)
+    result = await session.execute(
+        select(model.id)
+        .where(model.deleted_at.is_not(None), *criteria)
+        .order_by(model.id)
+        .limit(settings.PURGE_BATCH_SIZE)
+        .execution_options(include_deleted=True)
+    )
+    return list(result.scalars())
+
+
+async def purge_deleted(
+    session: AsyncSession, progress: Optional[Callable[[int], Awaitable[None]]] = None
+) -> tuple[int, int]:
+    """
+    Purge every tombstoned user and recipe. Returns (users, recipes) purged.
+
+    `progress` is awaited with the running total after each batch.
+    """
+    users = recipes = 0
+    # Recipes first, deleted users' included, so a user whose recipes were
+    # only nested by recipes purged here goes in the same run
+    while recipe_ids := await _tombstoned(session, Recipe, _unnested()):
+        for recipe_id in recipe_ids:
+            await purge_recipe(session, recipe_id)
+        recipes += len(recipe_ids)
+        if progress:
+            await progress(users + recipes)
+    # Users whose recipes are still nested stay tombstoned, so page past them
+    after = None
+    while user_ids := await _tombstoned(session, User, after=after):
+        for user_id in user_ids:
+            recipes += await purge_user(session, user_id)
+        users += len(user_ids)
+        after = user_ids[-1]
+        if progress:
+            await progress(users + recipes)
+    return users, recipes
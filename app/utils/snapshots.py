@@ -0,0 +1,202 @@
+import os
+import uuid
+import shutil
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import Cache
+from app.core.config import settings
+from app.models.recipe.nutrition import Nutrition
+from app.models.recipe.unit import Unit
+from app.models.nutrition.nutrition_average import NutritionAverage
+
+
+logger = logging.getLogger(__name__)
+
+# Open snapshots per worker; the arrays themselves live in the shared page cache
+snapshot_cache = Cache("nutrition_snapshot", maxsize=settings.NUTRITION_SNAPSHOT_CACHE_SIZE)
+
+_build_lock = asyncio.Lock()
+
+
+def snapshot_path(version_id: str) -> Path:
+    # Quote so any version ID is a single safe directory name
+    return Path(settings.NUTRITION_SNAPSHOT_DIR) / f"v-{quote(version_id, safe='')}"
+
+
+class NutritionSnapshot:
+    """
+    Read-only columnar view of a published version's nutrition averages.
+
+    Foods are rows and nutrients columns. Values are stored densely (NaN for
+    missing) or, for sparse versions, in CSR form. Arrays are memory-mapped,
+    so every worker shares one copy through the OS page cache.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        food_ids = np.load(path / "foods.npy", mmap_mode="r")
+        self.nutrition_ids: list[str] = np.load(path / "nutrients.npy").tolist()
+        self.unit_ids: list[str | None] = [u or None for u in np.load(path / "unit_ids.npy").tolist()]
+        self.units: list[str | None] = [u or None for u in np.load(path / "units.npy").tolist()]
+        self.rows = {uuid.UUID(bytes=food_id.tobytes()): row for row, food_id in enumerate(food_ids)}
+
+        if (path / "values.npy").exists():
+            self.values = np.load(path / "values.npy", mmap_mode="r")
+            self.indptr = self.indices = None
+        else:
+            self.values = np.load(path / "data.npy", mmap_mode="r")
+            self.indptr = np.load(path / "indptr.npy", mmap_mode="r")
+            self.indices = np.load(path / "indices.npy", mmap_mode="r")
+
+    def row(self, food_id: uuid.UUID) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Column indices and values of one food (both empty if it has none).
+        """
+        row = self.rows.get(food_id)
+        if row is None:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        if self.indptr is None:
+            values = self.values[row]
+            columns = np.flatnonzero(~np.isnan(values))
+            return columns, values[columns]
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.values[start:end]
+
+    def food(self, food_id: uuid.UUID) -> dict[str, dict]:
+        columns, values = self.row(food_id)
+        return {
+            self.nutrition_ids[column]: {
+                "value": value,
+                "unit_id": self.unit_ids[column],
+                "unit": self.units[column],
+            }
+            for column, value in zip(columns.tolist(), values.tolist())
+        }
+
+    def coordinates(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Row indices, column indices and values of every stored value.
+        """
+        if self.indptr is None:
+            rows, columns = np.nonzero(~np.isnan(self.values))
+            return rows, columns, self.values[rows, columns]
+        rows = np.repeat(np.arange(len(self.rows)), np.diff(self.indptr))
+        return rows, np.asarray(self.indices), np.asarray(self.values)
+
+    def dense(self, food_ids: list[uuid.UUID]) -> np.ndarray:
+        """
+        Dense food x nutrient matrix of the given foods, NaN where missing.
+        """
+        rows = np.array([self.rows.get(food_id, -1) for food_id in food_ids], dtype=np.int64)
+        known = rows >= 0
+        matrix = np.full((len(food_ids), len(self.nutrition_ids)), np.nan)
+        if self.indptr is None:
+            matrix[known] = self.values[rows[known]]
+        else:
+            for i in np.flatnonzero(known):
+                start, end = self.indptr[rows[i]], self.indptr[rows[i] + 1]
+                matrix[i, self.indices[start:end]] = self.values[start:end]
+        return matrix
+
+
+def _write(path: Path, food_ids: list[uuid.UUID], nutrition_ids: list[str],
+           unit_ids: list[str | None], units: list[str | None],
+           rows: np.ndarray, columns: np.ndarray, values: np.ndarray) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write into a scratch directory and rename it into place, so readers
+    # never see a partial snapshot
+    scratch = Path(tempfile.mkdtemp(prefix=".build-", dir=path.parent))
+    try:
+        foods = np.frombuffer(b"".join(food_id.bytes for food_id in food_ids), dtype=np.uint8)
+        np.save(scratch / "foods.npy", foods.reshape(len(food_ids), 16))
+        np.save(scratch / "nutrients.npy", np.array(nutrition_ids, dtype=str))
+        np.save(scratch / "unit_ids.npy", np.array([u or "" for u in unit_ids], dtype=str))
+        np.save(scratch / "units.npy", np.array([u or "" for u in units], dtype=str))
+
+        shape = (len(food_ids), len(nutrition_ids))
+        # Dense costs 8 bytes per cell, CSR about 12 per value
+        if 8 * shape[0] * shape[1] <= 12 * len(values):
+            dense = np.full(shape, np.nan)
+            dense[rows, columns] = values
+            np.save(scratch / "values.npy", dense)
+        else:
+            order = np.lexsort((columns, rows))
+            indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+            np.save(scratch / "indptr.npy", indptr)
+            np.save(scratch / "indices.npy", columns[order].astype(np.int32))
+            np.save(scratch / "data.npy", values[order])
+
+        try:
+            os.rename(scratch, path)
+        except OSError:
+            # Another worker finished the same snapshot first
+            if not path.exists():
+                raise
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+async def build_snapshot(session: AsyncSession, version_id: str) -> Path:
+    """
+    Write the columnar snapshot of a version's nutrition averages to disk.
+    """
+    result = await session.execute(
+        select(
+            NutritionAverage.food_id,
+            NutritionAverage.nutrition_id,
+            NutritionAverage.value,
+            Nutrition.unit_id,
+            Unit.name,
+        )
+        .outerjoin(Nutrition, Nutrition.id == NutritionAverage.nutrition_id)
+        .outerjoin(Unit, Unit.id == Nutrition.unit_id)
+        .where(NutritionAverage.version_id == version_id)
+    )
+    averages = result.all()
+
+    food_ids = sorted({food_id for food_id, *_ in averages})
+    nutrients = {nutrition_id: (unit_id, unit) for _, nutrition_id, _, unit_id, unit in averages}
+    nutrition_ids = sorted(nutrients)
+    food_rows = {food_id: row for row, food_id in enumerate(food_ids)}
+    nutrition_columns = {nutrition_id: column for column, nutrition_id in enumerate(nutrition_ids)}
+
+    path = snapshot_path(version_id)
+    await asyncio.to_thread(
+        _write,
+        path,
+        food_ids,
+        nutrition_ids,
+        [nutrients[nutrition_id][0] for nutrition_id in nutrition_ids],
+        [nutrients[nutrition_id][1] for nutrition_id in nutrition_ids],
+        np.fromiter((food_rows[row[0]] for row in averages), dtype=np.int64, count=len(averages)),
+        np.fromiter((nutrition_columns[row[1]] for row in averages), dtype=np.int64, count=len(averages)),
+        np.fromiter((row[2] for row in averages), dtype=np.float64, count=len(averages)),
+    )
+    logger.info(f"Wrote nutrition snapshot of version {version_id} ({len(averages)} values)")
+    return path
+
+
+async def get_snapshot(session: AsyncSession, version_id: str) -> NutritionSnapshot:
+    """
+    Open the snapshot of a published version, building it first if missing.
+    """
+    snapshot = snapshot_cache.get(version_id)
+    if snapshot is None:
+        path = snapshot_path(version_id)
+        if not path.exists():
+            async with _build_lock:
+                if not path.exists():
+                    await build_snapshot(session, version_id)
+        snapshot = await asyncio.to_thread(NutritionSnapshot, path)
+        snapshot_cache.set(version_id, snapshot)
+    return snapshot
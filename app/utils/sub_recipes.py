@@ -0,0 +1,296 @@
+import uuid
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+
+from sqlmodel import func, select
+from sqlalchemy import String, cast
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import Cache
+from app.core.config import settings
+from app.models.recipe.recipe import Recipe, FlattenedRecipePublic
+from app.models.recipe.unit import Unit, UnitType
+
+
+# Unit every convertible quantity is normalised to
+BASE_UNITS = {UnitType.weight: "B001", UnitType.volume: "B006"}
+
+# Reverse edges of cached recipes (child recipe ID -> parent recipe IDs)
+_parents: dict[uuid.UUID, set[uuid.UUID]] = defaultdict(set)
+
+
+def _unlink(recipe_id: uuid.UUID, flattened: tuple) -> None:
+    # A flattening leaving the cache no longer needs its children's edges
+    for child_id in flattened[2]:
+        parents = _parents.get(child_id)
+        if parents is not None:
+            parents.discard(recipe_id)
+            if not parents:
+                del _parents[child_id]
+
+
+# Flattened bill of materials for one batch of a recipe, keyed by recipe ID:
+# (servings, totals, sub-recipe IDs). Every version of a recipe is its own
+# row, so the ID identifies the version.
+flattened_cache = Cache(
+    "recipe_flatten", maxsize=settings.RECIPE_FLATTEN_CACHE_SIZE, on_evict=_unlink
+)
+
+# Unit reference data, loaded once (unit_id -> (type, conversion factor))
+_units: dict[str, tuple[UnitType, float | None]] = {}
+
+
+class _Evicted(Exception):
+    """
+    A sub-recipe skipped as cached while the graph loaded was evicted since.
+    """
+
+
+def _sub_recipe_ids(ingredients: list[dict]) -> list[uuid.UUID]:
+    # Sub-recipes stored before nesting by ID have no recipe_id to follow
+    return [
+        uuid.UUID(ingredient["recipe_id"])
+        for ingredient in ingredients
+        if ingredient.get("type") == "sub_recipe" and ingredient.get("recipe_id")
+    ]
+
+
+def _unprocessable(detail: str) -> HTTPException:
+    return HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
+
+def _unresolvable(ingredient: dict) -> HTTPException:
+    return _unprocessable(f"Sub-recipe ingredient {ingredient['internal_id']} has no recipe_id")
+
+
+async def _get_units(session: AsyncSession) -> dict[str, tuple[UnitType, float | None]]:
+    if not _units:
+        result = await session.execute(select(Unit.id, Unit.type, Unit.conversion_factor))
+        _units.update({unit_id: (unit_type, factor) for unit_id, unit_type, factor in result.all()})
+    return _units
+
+
+async def load_recipe_graph(
+    session: AsyncSession,
+    nodes: dict[uuid.UUID, tuple[list[dict], int]],
+    skip_cached: bool = False,
+    include_deleted: bool = False,
+) -> dict[uuid.UUID, tuple[list[dict], int]]:
+    """
+    Load every recipe reachable from `nodes` through sub-recipe ingredients.
+
+    Issues one query per nesting level rather than one per recipe. `nodes`
+    maps recipe IDs to (ingredients, serving count) and is extended in place.
+    With `skip_cached`, recipes whose flattening is cached are not descended into;
+    with `include_deleted`, tombstoned recipes still resolve.
+    """
+    frontier = set(nodes)
+    while frontier:
+        pending = {
+            child
+            for recipe_id in frontier
+            for child in _sub_recipe_ids(nodes[recipe_id][0])
+            if child not in nodes and not (skip_cached and child in flattened_cache)
+        }
+        if not pending:
+            break
+
+        result = await session.execute(
+            select(Recipe.id, Recipe.ingredients, Recipe.serving_info)
+            .where(Recipe.id.in_(pending))
+            .execution_options(include_deleted=include_deleted)
+        )
+        for recipe_id, ingredients, serving_info in result.all():
+            nodes[recipe_id] = (ingredients, serving_info["count"])
+
+        missing = pending - nodes.keys()
+        if missing:
+            raise _unprocessable(f"Unknown sub-recipe: {min(map(str, missing))}")
+        frontier = pending
+    return nodes
+
+
+def find_cycle(nodes: dict[uuid.UUID, tuple[list[dict], int]]) -> list[uuid.UUID] | None:
+    """
+    Return the first sub-recipe cycle found in the graph as a path, or None.
+    """
+    # 1 = on the current DFS path, 2 = fully explored
+    state: dict[uuid.UUID, int] = {}
+    for start in nodes:
+        if start in state:
+            continue
+        state[start] = 1
+        path = [start]
+        stack = [iter(_sub_recipe_ids(nodes[start][0]))]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                state[path.pop()] = 2
+                stack.pop()
+            elif state.get(child) == 1:
+                return path[path.index(child):] + [child]
+            elif child not in state and child in nodes:
+                state[child] = 1
+                path.append(child)
+                stack.append(iter(_sub_recipe_ids(nodes[child][0])))
+    return None
+
+
+async def validate_sub_recipes(session: AsyncSession, recipe: Recipe) -> None:
+    """
+    Check that every nested recipe exists and the nesting has no cycles.
+    """
+    for ingredient in recipe.ingredients:
+        if ingredient.get("type") == "sub_recipe" and not ingredient.get("recipe_id"):
+            raise _unresolvable(ingredient)
+
+    nodes = {recipe.id: (recipe.ingredients, recipe.serving_info["count"])}
+    await load_recipe_graph(session, nodes)
+    cycle = find_cycle(nodes)
+    if cycle:
+        raise _unprocessable(
+            "Sub-recipe cycle: " + " -> ".join(str(recipe_id) for recipe_id in cycle)
+        )
+
+
+def nests(parent, recipe_id):
+    """
+    Filter for `parent` (Recipe or an alias of it) using `recipe_id` as a
+    sub-recipe. `recipe_id` may be a column, to correlate with another recipe.
+    """
+    entry = func.jsonb_build_object("type", "sub_recipe", "recipe_id", cast(recipe_id, String))
+    return cast(parent.ingredients, JSONB).contains(func.jsonb_build_array(entry))
+
+
+async def nesting_recipe(session: AsyncSession, recipe_id: uuid.UUID) -> uuid.UUID | None:
+    """
+    The ID of a live recipe using `recipe_id` as a sub-recipe, or None.
+    """
+    result = await session.execute(select(Recipe.id).where(nests(Recipe, str(recipe_id))).limit(1))
+    return result.scalar()
+
+
+def _to_base(quantity: dict, units: dict) -> tuple[str, float]:
+    unit = units.get(quantity["unit_id"])
+    if unit:
+        unit_type, factor = unit
+        if unit_type in BASE_UNITS and factor is not None:
+            return BASE_UNITS[unit_type], quantity["value"] * factor
+    return quantity["unit_id"], quantity["value"]
+
+
+def _scale_factor(quantity: dict, servings: int, totals: dict, units: dict) -> float:
+    """
+    How many batches of a sub-recipe a parent uses.
+
+    Count units (portions, pieces) are taken as servings, weights and volumes
+    as a share of the sub-recipe's total raw materials of the same kind.
+    """
+    unit = units.get(quantity["unit_id"])
+    if unit is None:
+        raise _unprocessable(f"Unknown unit_id for sub-recipe: {quantity['unit_id']}")
+    unit_type, factor = unit
+
+    if unit_type == UnitType.count:
+        return quantity["value"] / servings
+    base_unit = BASE_UNITS.get(unit_type)
+    if base_unit is None or factor is None:
+        raise _unprocessable(f"Sub-recipes cannot be measured in unit_id {quantity['unit_id']}")
+    batch = sum(value for (_, unit_id), value in totals.items() if unit_id == base_unit)
+    if not batch:
+        raise _unprocessable(f"Sub-recipe has no {unit_type.value} to scale by")
+    return quantity["value"] * factor / batch
+
+
+def _flatten(
+    recipe_id: uuid.UUID,
+    nodes: dict[uuid.UUID, tuple[list[dict], int]],
+    units: dict,
+    visiting: set[uuid.UUID],
+) -> tuple[int, dict[tuple[str, str], float], frozenset[uuid.UUID]]:
+    cached = flattened_cache.get(recipe_id)
+    if cached is not None:
+        return cached
+    if recipe_id not in nodes:
+        raise _Evicted(recipe_id)
+    if recipe_id in visiting:
+        raise _unprocessable(f"Sub-recipe cycle through {recipe_id}")
+    visiting.add(recipe_id)
+
+    ingredients, servings = nodes[recipe_id]
+    totals: dict[tuple[str, str], float] = defaultdict(float)
+    children = set()
+    for ingredient in ingredients:
+        if ingredient["type"] == "raw_material":
+            unit_id, value = _to_base(ingredient["quantity"], units)
+            totals[(ingredient["ingredient_id"], unit_id)] += value
+            continue
+        if not ingredient.get("recipe_id"):
+            raise _unresolvable(ingredient)
+
+        child_id = uuid.UUID(ingredient["recipe_id"])
+        child_servings, child_totals, _ = _flatten(child_id, nodes, units, visiting)
+        factor = _scale_factor(ingredient["quantity"], child_servings, child_totals, units)
+        for key, value in child_totals.items():
+            totals[key] += value * factor
+        children.add(child_id)
+
+    visiting.discard(recipe_id)
+    flattened = (servings, dict(totals), frozenset(children))
+    flattened_cache.set(recipe_id, flattened)
+    for child_id in children:
+        _parents[child_id].add(recipe_id)
+    return flattened
+
+
+async def flatten_recipe(
+    session: AsyncSession, recipe: Recipe, servings: float | None = None
+) -> FlattenedRecipePublic:
+    """
+    Resolve nested sub-recipes into a bill of raw materials.
+
+    Quantities of the same ingredient are summed across the whole tree, with
+    weights in grams and volumes in millilitres. Results are scaled to
+    `servings` when given, otherwise to the recipe's own serving count.
+    """
+    units = await _get_units(session)
+    nodes = {recipe.id: (recipe.ingredients, recipe.serving_info["count"])}
+    while True:
+        if recipe.id not in flattened_cache:
+            # Sub-recipes tombstoned along with their author resolve until purged
+            await load_recipe_graph(session, nodes, skip_cached=True, include_deleted=True)
+        try:
+            recipe_servings, totals, _ = _flatten(recipe.id, nodes, units, set())
+            break
+        except _Evicted:
+            # Loaded on the next pass, now that it is no longer cached
+            continue
+
+    factor = servings / recipe_servings if servings else 1
+    return FlattenedRecipePublic(
+        recipe_id=recipe.id,
+        servings=servings or recipe_servings,
+        ingredients=[
+            {"ingredient_id": ingredient_id, "quantity": {"value": value * factor, "unit_id": unit_id}}
+            for (ingredient_id, unit_id), value in sorted(totals.items())
+        ],
+    )
+
+
+def invalidate_flattened(recipe_id: uuid.UUID) -> None:
+    """
+    Drop the cached flattening of a recipe and of every recipe nesting it.
+    """
+    stack = [recipe_id]
+    seen: set[uuid.UUID] = set()
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        flattened = flattened_cache.pop(current)
+        if flattened is not None:
+            _unlink(current, flattened)
+        stack.extend(_parents.pop(current, ()))
@@ -0,0 +1,177 @@
+import uuid
+from typing import Literal, Optional
+
+import numpy as np
+
+from fastapi import HTTPException
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import Cache
+from app.core.config import settings
+from app.crud.crud_nutrition import is_version_published
+from app.utils import snapshots
+from app.models.nutrition.nutrition_average import NutritionAverage
+from app.models.nutrition.system_version import (
+    SystemVersion,
+    NutritionDiffEntry,
+    NutritionVersionDiff,
+)
+
+
+KINDS = ("added", "removed", "changed")
+
+# Full sorted diffs between two published versions, keyed by (base, target, threshold)
+diff_cache = Cache("nutrition_version_diff", maxsize=settings.NUTRITION_DIFF_CACHE_SIZE)
+
+
+async def _load(
+    session: AsyncSession, version_id: str
+) -> tuple[list[uuid.UUID], list[str], np.ndarray, np.ndarray, np.ndarray]:
+    # (food IDs, nutrient IDs, row indices, column indices, values) of one version
+    if await is_version_published(session, version_id):
+        snapshot = await snapshots.get_snapshot(session, version_id)
+        return (list(snapshot.rows), snapshot.nutrition_ids, *snapshot.coordinates())
+
+    result = await session.execute(
+        select(NutritionAverage.food_id, NutritionAverage.nutrition_id, NutritionAverage.value)
+        .where(NutritionAverage.version_id == version_id)
+    )
+    averages = result.all()
+    food_rows: dict[uuid.UUID, int] = {}
+    nutrition_columns: dict[str, int] = {}
+    rows = np.fromiter(
+        (food_rows.setdefault(food_id, len(food_rows)) for food_id, _, _ in averages),
+        dtype=np.int64, count=len(averages),
+    )
+    columns = np.fromiter(
+        (nutrition_columns.setdefault(nutrition_id, len(nutrition_columns)) for _, nutrition_id, _ in averages),
+        dtype=np.int64, count=len(averages),
+    )
+    values = np.fromiter((value for _, _, value in averages), dtype=np.float64, count=len(averages))
+    return list(food_rows), list(nutrition_columns), rows, columns, values
+
+
+def _keys(
+    rows: np.ndarray, columns: np.ndarray,
+    food_map: np.ndarray, nutrition_map: np.ndarray, width: int,
+) -> np.ndarray:
+    # One int64 key per (food, nutrient) pair in the shared ID space
+    return food_map[rows] * width + nutrition_map[columns]
+
+
+def compare(
+    base_keys: np.ndarray, base_values: np.ndarray,
+    target_keys: np.ndarray, target_values: np.ndarray,
+    threshold: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compare two sets of (pair key, value), each key unique within its set.
+
+    Returns (keys, kinds, base values, target values, relative changes) for
+    added pairs, removed pairs and pairs whose value moved by more than
+    `threshold` relative to the base, sorted by magnitude: added and removed
+    pairs first by value, then changes by relative change. `kinds` holds
+    indices into KINDS; missing values and undefined changes are NaN.
+    """
+    common, base_index, target_index = np.intersect1d(
+        base_keys, target_keys, assume_unique=True, return_indices=True
+    )
+    added = ~np.isin(target_keys, common, assume_unique=True)
+    removed = ~np.isin(base_keys, common, assume_unique=True)
+
+    before, after = base_values[base_index], target_values[target_index]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = (after - before) / np.abs(before)
+    # A move away from zero is an infinite relative change, zero to zero none
+    relative = np.where(before == 0, np.where(after == 0, 0.0, np.inf), relative)
+    changed = np.abs(relative) > threshold
+
+    added_count, removed_count, changed_count = int(added.sum()), int(removed.sum()), int(changed.sum())
+    nan = np.full(added_count + removed_count, np.nan)
+    keys = np.concatenate((target_keys[added], base_keys[removed], common[changed]))
+    kinds = np.repeat(np.arange(3), (added_count, removed_count, changed_count))
+    base = np.concatenate((nan[:added_count], base_values[removed], before[changed]))
+    target = np.concatenate((target_values[added], nan[added_count:], after[changed]))
+    relatives = np.concatenate((nan, relative[changed]))
+
+    # Added/removed first, then largest magnitude first, ties by key
+    magnitude = np.where(np.isnan(relatives), np.abs(np.fmax(base, target)), np.abs(relatives))
+    order = np.lexsort((keys, -magnitude, kinds == 2))
+    return keys[order], kinds[order], base[order], target[order], relatives[order]
+
+
+async def diff_versions(
+    session: AsyncSession,
+    base_version: str,
+    target_version: str,
+    threshold: float = 0.01,
+    kind: Optional[Literal["added", "removed", "changed"]] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> NutritionVersionDiff:
+    """
+    Diff the nutrition averages of two system versions.
+
+    Both versions are loaded as columnar arrays (from their snapshots when
+    published), mapped to a shared (food, nutrient) key space and compared
+    in a few vectorised passes. Diffs between two published versions are
+    cached, so paging through one only computes it once.
+    """
+    for version_id in (base_version, target_version):
+        if not await session.get(SystemVersion, version_id):
+            raise HTTPException(status_code=404, detail=f"System version not found: {version_id}")
+
+    key = (base_version, target_version, threshold)
+    diff = diff_cache.get(key)
+    if diff is None:
+        base_foods, base_nutrients, base_rows, base_columns, base_values = await _load(session, base_version)
+        target_foods, target_nutrients, target_rows, target_columns, target_values = await _load(session, target_version)
+
+        foods = list(dict.fromkeys(base_foods + target_foods))
+        nutrients = list(dict.fromkeys(base_nutrients + target_nutrients))
+        food_index = {food_id: i for i, food_id in enumerate(foods)}
+        nutrition_index = {nutrition_id: i for i, nutrition_id in enumerate(nutrients)}
+
+        def mapping(ids: list, index: dict) -> np.ndarray:
+            return np.array([index[i] for i in ids], dtype=np.int64)
+
+        width = max(len(nutrients), 1)
+        diff = (foods, nutrients, width, *compare(
+            _keys(base_rows, base_columns, mapping(base_foods, food_index), mapping(base_nutrients, nutrition_index), width),
+            base_values,
+            _keys(target_rows, target_columns, mapping(target_foods, food_index), mapping(target_nutrients, nutrition_index), width),
+            target_values,
+            threshold,
+        ))
+        if await is_version_published(session, base_version) and await is_version_published(session, target_version):
+            diff_cache.set(key, diff)
+
+    foods, nutrients, width, keys, kinds, base, target, relatives = diff
+    counts = np.bincount(kinds, minlength=3)
+    selected = np.flatnonzero(kinds == KINDS.index(kind)) if kind else np.arange(len(keys))
+    page = selected[skip:skip + limit]
+
+    def value(array: np.ndarray, i: int) -> Optional[float]:
+        # NaN and the infinite change away from zero aren't valid JSON
+        return float(array[i]) if np.isfinite(array[i]) else None
+
+    return NutritionVersionDiff(
+        base_version=base_version,
+        target_version=target_version,
+        added=int(counts[0]),
+        removed=int(counts[1]),
+        changed=int(counts[2]),
+        count=len(selected),
+        data=[
+            NutritionDiffEntry(
+                food_id=foods[keys[i] // width],
+                nutrition_id=nutrients[keys[i] % width],
+                kind=KINDS[kinds[i]],
+                base_value=value(base, i),
+                target_value=value(target, i),
+                relative_change=value(relatives, i),
+            )
+            for i in page.tolist()
+        ],
+    )
@@ -0,0 +1,52 @@
+"""
+Run background job workers apart from the API processes.
+
+    python -m app.worker --workers 4
+
+Set JOB_WORKERS=0 for the API processes when jobs run here instead.
+"""
+import signal
+import asyncio
+import logging
+import argparse
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.jobs import start_workers
+# Imported for the job kinds it registers
+from app.utils import job_handlers
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+async def run(workers: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    tasks = start_workers(workers)
+    logger.info(f"Started {workers} job workers")
+    await stop.wait()
+
+    # Cancelled jobs are put back in the queue for the next worker
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(settings.JOB_WORKERS, 1))
+    args = parser.parse_args()
+    asyncio.run(run(args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Drive the hot API endpoints in-process at a fixed concurrency and record
+throughput and latency percentiles.
+
+The app is called through httpx's ASGI transport, so no server or network
+is involved, against the database configured in the environment. That must
+be a scratch database migrated with `alembic upgrade head`. With --seed,
+bench users, recipes and nutrition data are created first; the nutrition
+tables are emptied to do so.
+
+    python -m benchmarks.api_load --seed --yes --output before.json
+    python -m benchmarks.api_load --compare before.json --output after.json
+
+With --compare, exits non-zero when any scenario's p95 latency or
+throughput is more than --tolerance worse than in the given report.
+"""
+import os
+
+# Rate limits would turn most of a load test into 429s
+for name in (
+    "LOGIN_RATE_PER_IP_PER_MINUTE", "LOGIN_RATE_PER_IP_BURST",
+    "LOGIN_RATE_PER_ACCOUNT_PER_MINUTE", "LOGIN_RATE_PER_ACCOUNT_BURST",
+):
+    os.environ.setdefault(name, "1000000")
+
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+import httpx
+from sqlmodel import select, func
+
+from app.main import app
+from app.core import security
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, engine
+from app.models.user import User
+from app.models.recipe.recipe import Recipe
+from app.models.nutrition.food_item import FoodItem
+from app.models.nutrition.system_version import SystemVersion
+from benchmarks import scratch
+from benchmarks.nutrition_queries import seed as seed_nutrition
+
+
+PASSWORD = "bench-password"
+LOGIN_EMAIL = "bench-login@example.com"
+RECIPE_CODE_DIGITS = "123456789ABCDEF"
+DISHES = ["stew", "salad", "bake", "soup", "roast"]
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def bench_email(i: int) -> str:
+    return f"bench-load-{i}@example.com"
+
+
+def recipe_upload(rng: random.Random, template: dict, titles: list[str]) -> bytes:
+    # The sample recipe under a new title and recipe code
+    recipe = dict(template)
+    recipe["title"] = f"{rng.choice(titles)} {rng.choice(DISHES)}"
+    recipe["recipe_metadata"] = {
+        **template["recipe_metadata"],
+        "recipe_code": "".join(rng.choices(RECIPE_CODE_DIGITS, k=7)) + "-" + "".join(rng.choices(RECIPE_CODE_DIGITS, k=5)),
+    }
+    return json.dumps(recipe).encode()
+
+
+async def seed(client: httpx.AsyncClient, rng: random.Random, args: argparse.Namespace, context: dict) -> None:
+    # Users share one password hash, so seeding doesn't hash per user
+    password_hash = await security.get_password_hash(PASSWORD)
+    async with AsyncSessionLocal() as session:
+        emails = [LOGIN_EMAIL] + [bench_email(i) for i in range(args.users)]
+        existing = set((await session.execute(select(User.email).where(User.email.in_(emails)))).scalars())
+        for email in emails:
+            if email not in existing:
+                session.add(User(
+                    email=email,
+                    username=email.split("@")[0],
+                    password_hash=password_hash,
+                    # Only superusers may log in
+                    is_superuser=email == LOGIN_EMAIL,
+                ))
+        await session.commit()
+
+    await load_context(context)
+    missing = args.recipes - len(context["recipe_ids"])
+    for i in range(max(missing, 0)):
+        headers = rng.choice(context["tokens"])
+        response = await client.post(
+            "/recipes",
+            files={"file": ("bench.json", recipe_upload(rng, context["template"], context["titles"]), "application/json")},
+            headers=headers,
+        )
+        response.raise_for_status()
+
+    async with engine.connect() as connection:
+        await seed_nutrition(connection, args.foods, nutrients=40, entries=1, versions=2, seed=args.random_seed)
+        await connection.commit()
+
+
+async def load_context(context: dict) -> None:
+    with open("app/data/recipe.json") as f:
+        context["template"] = json.load(f)
+    with open("app/data/ingredients.json") as f:
+        context["titles"] = sorted({item["Name"] for item in json.load(f)})
+
+    async with AsyncSessionLocal() as session:
+        users = (await session.execute(
+            select(User.id).where(User.email.like("bench-load-%")).order_by(User.email)
+        )).scalars().all()
+        context["tokens"] = [
+            {"Authorization": f"Bearer {security.create_access_token(user_id, timedelta(hours=1))}"}
+            for user_id in users
+        ]
+        context["recipe_ids"] = [str(recipe_id) for recipe_id in (await session.execute(
+            select(Recipe.id).where(Recipe.author_id.in_(users)).order_by(Recipe.id)
+        )).scalars()]
+        context["food_ids"] = [str(food_id) for food_id in (await session.execute(
+            select(FoodItem.id).order_by(FoodItem.id).limit(1000)
+        )).scalars()]
+        context["published"] = (await session.execute(
+            select(func.count()).select_from(SystemVersion).where(SystemVersion.published_at.is_not(None))
+        )).scalar()
+
+
+# Each scenario sends one request: (method, url, request keyword arguments)
+def login(rng, context):
+    return "POST", "/login/access-token", {"data": {"username": LOGIN_EMAIL, "password": PASSWORD}}
+
+def list_recipes(rng, context):
+    return "GET", "/recipes", {"params": {"limit": 20}, "headers": rng.choice(context["tokens"])}
+
+def search_recipes(rng, context):
+    word = rng.choice(context["titles"]).split()[0]
+    return "GET", "/recipes/search", {"params": {"query": word, "limit": 20}, "headers": rng.choice(context["tokens"])}
+
+def get_recipe(rng, context):
+    return "GET", f"/recipes/{rng.choice(context['recipe_ids'])}", {}
+
+def save_recipe(rng, context):
+    # Saved in bulk, so repeats of a pair are not conflicts
+    return "POST", "/recipes/me/saved-recipes", {
+        "json": {"recipe_ids": [rng.choice(context["recipe_ids"])]}, "headers": rng.choice(context["tokens"])
+    }
+
+def unsave_recipe(rng, context):
+    return "DELETE", "/recipes/me/saved-recipes", {
+        "params": {"recipe_ids": [rng.choice(context["recipe_ids"])]}, "headers": rng.choice(context["tokens"])
+    }
+
+def create_recipe(rng, context):
+    upload = recipe_upload(rng, context["template"], context["titles"])
+    return "POST", "/recipes", {
+        "files": {"file": ("bench.json", upload, "application/json")}, "headers": rng.choice(context["tokens"])
+    }
+
+def food_nutrition(rng, context):
+    return "GET", f"/foods/{rng.choice(context['food_ids'])}/nutrition", {}
+
+def foods_nutrition(rng, context):
+    return "GET", "/foods/nutrition", {"params": {"food_ids": rng.sample(context["food_ids"], 50)}}
+
+
+SCENARIOS = {
+    scenario.__name__: scenario
+    for scenario in (
+        login, list_recipes, search_recipes, get_recipe, save_recipe,
+        unsave_recipe, create_recipe, food_nutrition, foods_nutrition,
+    )
+}
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def run_scenario(client, scenario, context: dict, rng: random.Random, requests: int, concurrency: int) -> dict:
+    latencies, db_ms, queries = [], [], []
+    statuses: dict[str, int] = {}
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = scenario(rng, context)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            timing = SERVER_TIMING_DB.search(response.headers.get("server-timing", ""))
+            if timing:
+                db_ms.append(float(timing.group(1)))
+                queries.append(int(timing.group(2)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if int(status) >= 400),
+        "statuses": statuses,
+        "throughput_rps": requests / elapsed,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies),
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1],
+        },
+        "db_ms_mean": statistics.fmean(db_ms) if db_ms else None,
+        "queries_mean": statistics.fmean(queries) if queries else None,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.random_seed)
+    context: dict = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        if args.seed:
+            await seed(client, rng, args, context)
+        await load_context(context)
+        if not context["recipe_ids"] or not context["food_ids"] or not context["published"]:
+            raise SystemExit("No bench data in this database, run with --seed first")
+
+        results = {}
+        for name in args.scenarios:
+            scenario = SCENARIOS[name]
+            # Same request sequence on every run, after a warm-up
+            await run_scenario(client, scenario, context, random.Random(args.random_seed), args.warmup, args.concurrency)
+            result = await run_scenario(
+                client, scenario, context, random.Random(args.random_seed), args.requests, args.concurrency
+            )
+            results[name] = result
+            print(
+                f"{name:16} {result['throughput_rps']:8.1f} req/s  p50 {result['latency_ms']['p50']:8.2f}  "
+                f"p95 {result['latency_ms']['p95']:8.2f}  p99 {result['latency_ms']['p99']:8.2f} ms  "
+                f"{result['errors']} errors"
+            )
+
+    await engine.dispose()
+    return {
+        "recorded_at": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "random_seed": args.random_seed,
+            "recipes": len(context["recipe_ids"]),
+            "users": len(context["tokens"]),
+            "password_hash_method": settings.PASSWORD_HASH_METHOD,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Print each scenario against the baseline and return the regressions:
+    p95 latency or throughput more than `tolerance` worse.
+    """
+    regressions = []
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'} ({baseline['recorded_at']}):")
+    for name, result in report["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        p95 = result["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1
+        rps = result["throughput_rps"] / before["throughput_rps"] - 1
+        regressed = p95 > tolerance or rps < -tolerance
+        print(f"{name:16} p95 {p95:+7.1%}  throughput {rps:+7.1%}{'  REGRESSED' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="create bench users, recipes and nutrition data first")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--foods", type=int, default=1000)
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="untimed requests per scenario first")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before failing --compare")
+    scratch.add_argument(parser)
+    args = parser.parse_args()
+    if args.seed:
+        scratch.confirm(args, "the nutrition tables")
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Fill a scratch database with a large synthetic data set.
+
+Recipes are valid documents built from the reference data in app/data:
+ingredient, unit, nutrient, tool, container, claim, category, resting time
+and control point codes. Users follow one another, save recipes and keep
+lists. Nutrition entries and averages span several system versions. Every
+row is drawn from --random-seed, so a seed and a --size always give the
+same data, and rows are loaded with COPY. The tables are emptied first.
+
+    python -m benchmarks.dataset --size 10 --yes
+
+--size 1 is 1,000 users, 10,000 recipes, 20,000 follows, 50,000 saves and
+100,000 nutrition entries; everything scales linearly with it. Counters,
+timelines and nutrition aggregates are derived in the database afterwards.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.recipe.recipe import RecipeCreate
+from benchmarks import scratch
+
+
+# Rows per size unit
+USERS = 1_000
+RECIPES = 10_000
+FOLLOWS = 20_000
+SAVES = 50_000
+NUTRITION_ENTRIES = 100_000
+
+VERSIONS = 3
+COPY_BATCH = 10_000
+# Recipes embedding an earlier recipe as an ingredient
+SUB_RECIPE_SHARE = 0.05
+PRIVATE_SHARE = 0.05
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+
+TABLES = [
+    "timelineentry", "recipelistrecipe", "recipelist", "userrecipesave", "userfollow", "recipe",
+    "outlierflag", "nutritionaggregate", "nutritionaverage", "nutritionentry", "systemversion",
+    "fooditem", "job", '"user"',
+]
+DISHES = ["stew", "salad", "bake", "soup", "roast", "curry", "pie", "skewers", "bowl", "gratin"]
+STYLES = ["classic", "spicy", "smoky", "quick", "rustic", "creamy", "crispy", "herby", "slow-cooked"]
+
+
+def reference_ids(name: str, pattern: str) -> list[str]:
+    # Some reference files carry comments, so codes are read from the raw text
+    with open(f"app/data/{name}.json") as f:
+        found = re.findall(r'"(?:id|ID)"\s*:\s*"([^"]+)"', f.read())
+    return sorted({code for code in found if re.fullmatch(pattern, code)})
+
+
+def load_reference() -> dict:
+    with open("app/data/ingredients.json") as f:
+        ingredients = [item for item in json.load(f) if re.fullmatch(r"[A-F0-9]{7}", item["ID"])]
+    with open("app/data/units.json") as f:
+        units = json.load(f)["units"]
+    with open("app/data/nutritions.json") as f:
+        nutrients = [item for item in json.load(f)["nutritions"] if re.fullmatch(r"H[0-9A-F]{3}", item["id"])]
+    unit_ids = {kind: [u["id"] for u in units if u["type"] == kind] for kind in ("weight", "volume", "count", "time")}
+
+    return {
+        "ingredients": ingredients,
+        "units": unit_ids,
+        "nutrients": nutrients,
+        "tools": reference_ids("tools", r"E[0-9A-F]{3}"),
+        "containers": reference_ids("containers", r"P[0-9A-F]{3}"),
+        "claims": reference_ids("claims", r"J[0-9A-F]{3}"),
+        "categories": reference_ids("categories", r"K[0-9A-F]{3}"),
+        "resting_times": reference_ids("resting_times", r"R[0-9A-F]{3}"),
+        "control_points": reference_ids("critical_control_points", r"M[0-9A-F]{3}"),
+    }
+
+
+class Generator:
+    """
+    Draws every row from one random stream, so output depends only on the
+    seed and the sizes.
+    """
+
+    def __init__(self, seed: int, reference: dict) -> None:
+        self.rng = random.Random(seed)
+        self.ref = reference
+
+    def new_id(self) -> uuid.UUID:
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def moment(self) -> datetime:
+        return START + timedelta(seconds=self.rng.randrange(SPAN_SECONDS))
+
+    def popular(self, items: list):
+        # Heavily skewed towards the front, like follows and saves in practice
+        return items[int(len(items) * self.rng.random() ** 3)]
+
+    def code(self, digits: str, length: int) -> str:
+        return "".join(self.rng.choices(digits, k=length))
+
+    def quantity(self, kind: str, low: float, high: float) -> dict:
+        return {"value": round(self.rng.uniform(low, high), 1), "unit_id": self.rng.choice(self.ref["units"][kind])}
+
+    def recipe(self, author_id: uuid.UUID, earlier: list[uuid.UUID]) -> dict:
+        rng, ref = self.rng, self.ref
+        main = rng.choice(ref["ingredients"])
+
+        ingredients = []
+        for i in range(rng.randint(3, 12)):
+            internal_id = f"C{i + 1:03X}"
+            if earlier and rng.random() < SUB_RECIPE_SHARE:
+                ingredients.append({
+                    "type": "sub_recipe",
+                    "recipe_id": str(rng.choice(earlier)),
+                    "internal_id": internal_id,
+                    "quantity": self.quantity("count", 1, 4),
+                })
+            else:
+                ingredient = main if i == 0 else rng.choice(ref["ingredients"])
+                ingredients.append({
+                    "type": "raw_material",
+                    "ingredient_id": ingredient["ID"],
+                    "internal_id": internal_id,
+                    "quantity": self.quantity(rng.choice(["weight", "weight", "volume", "count"]), 1, 500),
+                })
+
+        steps = []
+        internal_ids = [ingredient["internal_id"] for ingredient in ingredients]
+        for i in range(rng.randint(2, 10)):
+            used = rng.sample(internal_ids, rng.randint(1, min(3, len(internal_ids))))
+            steps.append({
+                "step_id": f"S{i + 1:03X}",
+                "components": [
+                    {"internal_id": internal_id, "quantity": self.quantity("weight", 1, 250)}
+                    for internal_id in used
+                ],
+                "ccp_checkpoints": rng.sample(ref["control_points"], rng.randint(0, 2)),
+            })
+
+        prep, cook = rng.randint(5, 60), rng.randint(0, 180)
+        minutes = self.ref["units"]["time"][0]
+        return {
+            "title": f"{rng.choice(STYLES).capitalize()} {main['Name']} {rng.choice(DISHES)}",
+            "description": f"A {rng.choice(STYLES)} {rng.choice(DISHES)} built around {main['Name']}.",
+            "private": rng.random() < PRIVATE_SHARE,
+            "author_id": author_id,
+            "format_version": {"major": 1, "minor": 3, "compatibility_hash": f"{self.code('0123456789ABCDEF', 4)}-{self.code('0123456789ABCDEF', 4)}"},
+            "recipe_metadata": {
+                "recipe_code": f"{self.code('123456789ABCDEF', 7)}-{self.code('123456789ABCDEF', 5)}",
+                "date": self.moment().date().isoformat(),
+                "category_id": rng.choice(ref["categories"]),
+                "claims": rng.sample(ref["claims"], rng.randint(0, 3)),
+                "base_idea_from": "",
+                "effective_working_times": {
+                    "prep": {"value": prep, "unit_id": minutes},
+                    "cook": {"value": cook, "unit_id": minutes},
+                },
+                "resting_times": [
+                    {"value": rng.randint(5, 60), "unit_id": minutes, "resting_definition_id": resting_id}
+                    for resting_id in rng.sample(ref["resting_times"], rng.randint(0, 2))
+                ],
+                "total": {"value": prep + cook, "unit_id": minutes},
+                "equipment": [{"id": tool_id} for tool_id in rng.sample(ref["tools"], rng.randint(1, 4))],
+            },
+            "ingredients": ingredients,
+            "instructions": {"steps": steps},
+            "nutrition": {
+                "base_units": ["per_serving", "per_100g"],
+                "values": [
+                    {
+                        "nutrition_id": nutrient["id"],
+                        "per_serving": round(rng.lognormvariate(2, 1), 2),
+                        "per_100g": round(rng.lognormvariate(1.5, 1), 2),
+                        "unit_id": nutrient["unit_id"],
+                    }
+                    for nutrient in rng.sample(ref["nutrients"], rng.randint(3, 10))
+                ],
+            },
+            "serving_info": {"count": rng.randint(1, 8), "container": {"id": rng.choice(ref["containers"])}},
+        }
+
+
+def batches(records, size: int = COPY_BATCH):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+async def copy(raw, table: str, columns: list[str], records) -> int:
+    count = 0
+    for batch in batches(records):
+        await raw.copy_records_to_table(table, records=batch, columns=columns)
+        count += len(batch)
+    return count
+
+
+def unique_pairs(gen: Generator, owners: list, targets: list, total: int, per_owner_max: int):
+    # About `total` distinct (owner, target) pairs, targets skewed to the popular
+    remaining = total
+    for owner in owners:
+        if remaining <= 0:
+            return
+        wanted = min(int(gen.rng.expovariate(len(owners) / total)) + 1, per_owner_max, remaining)
+        chosen = set()
+        for _ in range(wanted * 2):
+            target = gen.popular(targets)
+            if target != owner:
+                chosen.add(target)
+            if len(chosen) == wanted:
+                break
+        remaining -= len(chosen)
+        yield from ((owner, target) for target in chosen)
+
+
+async def generate(connection, size: float, seed: int) -> dict:
+    gen = Generator(seed, load_reference())
+    rng = gen.rng
+    raw = (await connection.get_raw_connection()).driver_connection
+    await connection.execute(text(f"TRUNCATE {', '.join(TABLES)} CASCADE"))
+    counts = {}
+
+    # Every user shares one unusable password hash
+    user_ids = [gen.new_id() for _ in range(int(USERS * size))]
+    counts["user"] = await copy(raw, "user", [
+        "id", "username", "email", "password_hash", "is_active", "is_superuser", "joined_date",
+        "follower_count", "following_count", "recipe_count", "saves_received_count",
+    ], (
+        (user_id, f"user{i}", f"user{i}@example.com", "!", True, False, gen.moment(), 0, 0, 0, 0)
+        for i, user_id in enumerate(user_ids)
+    ))
+
+    recipe_ids: list[uuid.UUID] = []
+    public_ids: list[uuid.UUID] = []
+
+    def recipes():
+        for i in range(int(RECIPES * size)):
+            document = gen.recipe(gen.popular(user_ids), recipe_ids[-1000:])
+            if i < 100:
+                # Generated documents must stay valid as the schema changes
+                RecipeCreate.model_validate(document)
+            recipe_id = gen.new_id()
+            recipe_ids.append(recipe_id)
+            if not document["private"]:
+                public_ids.append(recipe_id)
+            created_at = gen.moment()
+            yield (
+                recipe_id, document["title"], document["description"], document["private"], document["author_id"],
+                json.dumps(document["format_version"]), json.dumps(document["recipe_metadata"]),
+                json.dumps(document["ingredients"]), json.dumps(document["instructions"]),
+                json.dumps(document["nutrition"]), json.dumps(document["serving_info"]),
+                created_at, created_at, 0, 1,
+            )
+
+    counts["recipe"] = await copy(raw, "recipe", [
+        "id", "title", "description", "private", "author_id", "format_version", "recipe_metadata",
+        "ingredients", "instructions", "nutrition", "serving_info", "created_at", "last_modified_at",
+        "save_count", "version_number",
+    ], recipes())
+
+    counts["userfollow"] = await copy(raw, "userfollow", ["follower_id", "followed_id", "created_at"], (
+        (follower_id, followed_id, gen.moment())
+        for follower_id, followed_id in unique_pairs(gen, user_ids, user_ids, int(FOLLOWS * size), 500)
+    ))
+    counts["userrecipesave"] = await copy(raw, "userrecipesave", ["user_id", "recipe_id", "created_at"], (
+        (user_id, recipe_id, gen.moment().replace(tzinfo=None))
+        for user_id, recipe_id in unique_pairs(gen, user_ids, public_ids, int(SAVES * size), 1000)
+    ))
+
+    list_ids = [(gen.new_id(), user_id) for user_id in user_ids if rng.random() < 0.5]
+    counts["recipelist"] = await copy(raw, "recipelist", ["id", "user_id", "name", "private", "recipe_count", "created_at", "last_modified_at"], (
+        (list_id, user_id, f"{rng.choice(STYLES)} {rng.choice(DISHES)}s", rng.random() < 0.2, 0, gen.moment(), gen.moment())
+        for list_id, user_id in list_ids
+    ))
+    counts["recipelistrecipe"] = await copy(raw, "recipelistrecipe", ["recipe_list_id", "recipe_id", "position", "added_at"], (
+        (list_id, recipe_id, position, gen.moment())
+        for list_id, _ in list_ids
+        for position, recipe_id in enumerate(dict.fromkeys(gen.popular(public_ids) for _ in range(rng.randint(1, 20))))
+    ))
+
+    counts.update(await generate_nutrition(raw, gen, user_ids, size))
+    return counts
+
+
+async def generate_nutrition(raw, gen: Generator, user_ids: list, size: float) -> dict:
+    rng, counts = gen.rng, {}
+    now = START.replace(tzinfo=None)
+    # Food names are unique; a few ingredients share one
+    names = dict.fromkeys(ingredient["Name"] for ingredient in gen.ref["ingredients"])
+    foods = [(gen.new_id(), name) for name in names]
+    nutrient_ids = [nutrient["id"] for nutrient in gen.ref["nutrients"]]
+    counts["fooditem"] = await copy(raw, "fooditem", ["id", "name", "created_at"], (
+        (food_id, name, now) for food_id, name in foods
+    ))
+
+    # Each (food, nutrient) has a typical value; entries scatter around it
+    # with the odd gross error for outlier detection to find
+    typical = {}
+
+    def entries():
+        for _ in range(int(NUTRITION_ENTRIES * size)):
+            food_id = gen.popular(foods)[0]
+            nutrition_id = rng.choice(nutrient_ids)
+            base = typical.setdefault((food_id, nutrition_id), rng.lognormvariate(2, 1))
+            value = base * (rng.uniform(5, 20) if rng.random() < 0.002 else rng.gauss(1, 0.05))
+            yield gen.new_id(), food_id, nutrition_id, max(value, 0.0), "synthetic", rng.choice(user_ids), now
+
+    counts["nutritionentry"] = await copy(raw, "nutritionentry", [
+        "id", "food_id", "nutrition_id", "value", "source", "created_by", "created_at",
+    ], entries())
+
+    # The last version is a draft
+    counts["nutritionaverage"] = 0
+    for i in range(VERSIONS):
+        version_id = f"{2024 + i // 12}.{i % 12 + 1}.0"
+        await raw.execute(
+            "INSERT INTO systemversion (version_id, year, month, sub_version, published_at) VALUES ($1, $2, $3, $4, $5)",
+            version_id, 2024 + i // 12, i % 12 + 1, 0, now + timedelta(days=30 * i) if i < VERSIONS - 1 else None,
+        )
+        counts["nutritionaverage"] += await copy(raw, "nutritionaverage", [
+            "version_id", "food_id", "nutrition_id", "value", "created_at",
+        ], (
+            (version_id, food_id, nutrition_id, base * rng.gauss(1, 0.02), now)
+            for (food_id, nutrition_id), base in typical.items()
+        ))
+    counts["systemversion"] = VERSIONS
+    return counts
+
+
+async def derive(connection) -> None:
+    # Counters, timelines and aggregates the API maintains as it writes
+    statements = [
+        'UPDATE "user" SET follower_count = c.n FROM (SELECT followed_id, count(*) AS n FROM userfollow GROUP BY 1) c WHERE "user".id = c.followed_id',
+        'UPDATE "user" SET following_count = c.n FROM (SELECT follower_id, count(*) AS n FROM userfollow GROUP BY 1) c WHERE "user".id = c.follower_id',
+        "UPDATE recipe SET save_count = c.n FROM (SELECT recipe_id, count(*) AS n FROM userrecipesave GROUP BY 1) c WHERE recipe.id = c.recipe_id",
+        'UPDATE "user" SET recipe_count = c.n, saves_received_count = c.saves '
+        "FROM (SELECT author_id, count(*) AS n, sum(save_count) AS saves FROM recipe GROUP BY 1) c "
+        'WHERE "user".id::text = c.author_id::text',
+        "UPDATE recipelist SET recipe_count = c.n FROM (SELECT recipe_list_id, count(*) AS n FROM recipelistrecipe GROUP BY 1) c WHERE recipelist.id = c.recipe_list_id",
+        # As following backfills: each follow brings the author's recent
+        # public recipes, except from authors too big to fan out
+        "INSERT INTO timelineentry (user_id, created_at, recipe_id, author_id) "
+        "SELECT f.follower_id, r.created_at, r.id, r.author_id FROM userfollow f "
+        'JOIN "user" a ON a.id = f.followed_id AND a.follower_count <= :max_followers '
+        "CROSS JOIN LATERAL (SELECT id, created_at, author_id FROM recipe "
+        "WHERE recipe.author_id = f.followed_id AND NOT recipe.private "
+        "ORDER BY created_at DESC LIMIT :backfill) r ON CONFLICT DO NOTHING",
+        "INSERT INTO nutritionaggregate (food_id, nutrition_id, entry_count, value_sum, mean, m2) "
+        "SELECT food_id, nutrition_id, count(*), sum(value), avg(value), var_pop(value) * count(*) "
+        "FROM nutritionentry GROUP BY food_id, nutrition_id",
+    ]
+    for statement in statements:
+        await connection.execute(text(statement), {
+            "max_followers": settings.FEED_FANOUT_MAX_FOLLOWERS,
+            "backfill": settings.FEED_BACKFILL_SIZE,
+        })
+
+
+async def run(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    async with engine.connect() as connection:
+        counts = await generate(connection, args.size, args.random_seed)
+        await derive(connection)
+        await connection.commit()
+
+        # Fresh statistics and visibility maps, as autovacuum would leave them
+        autocommit = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        for table in TABLES:
+            await autocommit.execute(text(f"VACUUM ANALYZE {table}"))
+    await engine.dispose()
+
+    for table, count in counts.items():
+        print(f"{table:20} {count:12,}")
+    print(f"Generated in {time.perf_counter() - start:.1f} s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=1, help="scale factor; 100 gives a million recipes")
+    parser.add_argument("--random-seed", type=int, default=0)
+    scratch.add_argument(parser)
+    args = parser.parse_args()
+    scratch.confirm(args, "every application table")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Record query plans and latencies of the nutrition queries.
+
+Runs against the database configured in the environment, which must be a
+scratch database migrated with `alembic upgrade head`. With --seed the
+nutrition tables are emptied and filled with a synthetic data set first.
+
+    python -m benchmarks.nutrition_queries --seed --yes --output bench.json
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import statistics
+from datetime import datetime
+
+from sqlmodel import select, func
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.core.db import engine
+from app.crud.crud_nutrition import entry_partials
+from app.models.recipe.nutrition import Nutrition
+from app.models.recipe.unit import Unit
+from app.models.nutrition.food_item import FoodItem
+from app.models.nutrition.nutrition_entry import NutritionEntry
+from app.models.nutrition.nutrition_average import NutritionAverage
+from app.models.nutrition.nutrition_aggregate import NutritionAggregate
+from app.models.nutrition.outlier_flag import OutlierFlag
+from app.models.nutrition.system_version import SystemVersion
+from benchmarks import scratch
+
+
+TABLES = ["outlierflag", "nutritionaggregate", "nutritionaverage", "nutritionentry", "systemversion", "fooditem"]
+
+
+async def seed(connection, foods: int, nutrients: int, entries: int, versions: int, seed: int) -> None:
+    rng = random.Random(seed)
+    await connection.execute(text(f"TRUNCATE {', '.join(TABLES)}"))
+    raw = (await connection.get_raw_connection()).driver_connection
+
+    user_id = uuid.UUID(int=rng.getrandbits(128))
+    await raw.execute(
+        'INSERT INTO "user" (id, username, email, password_hash, is_active, is_superuser) '
+        "VALUES ($1, $2, $3, '-', true, false) ON CONFLICT DO NOTHING",
+        user_id, f"bench-{user_id.hex[:8]}", f"bench-{user_id.hex[:8]}@example.com",
+    )
+
+    now = datetime.utcnow()
+    food_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(foods)]
+    nutrition_ids = [f"H{i:03X}" for i in range(1, nutrients + 1)]
+    await raw.copy_records_to_table(
+        "fooditem",
+        records=[(food_id, f"food {i}", now) for i, food_id in enumerate(food_ids)],
+        columns=["id", "name", "created_at"],
+    )
+
+    records = []
+    for food_id in food_ids:
+        for nutrition_id in nutrition_ids:
+            base = rng.lognormvariate(2, 1)
+            for _ in range(entries):
+                value = base * rng.gauss(1, 0.05)
+                records.append((uuid.UUID(int=rng.getrandbits(128)), food_id, nutrition_id, value, "bench", user_id, now))
+    await raw.copy_records_to_table(
+        "nutritionentry",
+        records=records,
+        columns=["id", "food_id", "nutrition_id", "value", "source", "created_by", "created_at"],
+    )
+
+    # Flag one entry in a thousand, a third of them still pending
+    flags = [
+        (uuid.UUID(int=rng.getrandbits(128)), record[0], rng.choice(["pending", "keep", "delete"]), now)
+        for record in records[::1000]
+    ]
+    await raw.copy_records_to_table(
+        "outlierflag", records=flags, columns=["id", "entry_id", "decision", "created_at"]
+    )
+
+    for i in range(versions):
+        version_id = f"bench.{i}"
+        await raw.execute(
+            "INSERT INTO systemversion (version_id, year, month, sub_version, published_at) VALUES ($1, $2, $3, $4, $5)",
+            version_id, 2024 + i // 12, i % 12 + 1, 0, now if i < versions - 1 else None,
+        )
+        await raw.copy_records_to_table(
+            "nutritionaverage",
+            records=[
+                (version_id, food_id, nutrition_id, rng.lognormvariate(2, 1), now)
+                for food_id in food_ids
+                for nutrition_id in nutrition_ids
+            ],
+            columns=["version_id", "food_id", "nutrition_id", "value", "created_at"],
+        )
+
+    await raw.execute(
+        "INSERT INTO nutritionaggregate (food_id, nutrition_id, entry_count, value_sum, mean, m2) "
+        "SELECT food_id, nutrition_id, count(*), sum(value), avg(value), var_pop(value) * count(*) "
+        "FROM nutritionentry GROUP BY food_id, nutrition_id"
+    )
+
+
+async def queries(connection) -> dict:
+    # Same statements crud_nutrition and the nutrition routes issue
+    sample = (await connection.execute(select(FoodItem.id).limit(200))).scalars().all()
+    version_id = (await connection.execute(
+        select(SystemVersion.version_id).where(SystemVersion.published_at.is_not(None)).limit(1)
+    )).scalar()
+    food_id = sample[0]
+    has_flag = select(OutlierFlag.id).where(OutlierFlag.entry_id == NutritionEntry.id).exists()
+
+    return {
+        "latest_published_version": (
+            select(SystemVersion.version_id)
+            .where(SystemVersion.published_at.is_not(None))
+            .order_by(SystemVersion.year.desc(), SystemVersion.month.desc(), SystemVersion.sub_version.desc())
+            .limit(1)
+        ),
+        "food_nutrition_batch": (
+            select(
+                NutritionAverage.food_id,
+                NutritionAverage.nutrition_id,
+                NutritionAverage.value,
+                Nutrition.unit_id,
+                Unit.name,
+            )
+            .outerjoin(Nutrition, Nutrition.id == NutritionAverage.nutrition_id)
+            .outerjoin(Unit, Unit.id == Nutrition.unit_id)
+            .where(NutritionAverage.version_id == version_id)
+            .where(NutritionAverage.food_id.in_(sample))
+            .order_by(NutritionAverage.food_id, NutritionAverage.nutrition_id)
+        ),
+        "food_nutrition_single": (
+            select(NutritionAverage.nutrition_id, NutritionAverage.value)
+            .where(NutritionAverage.version_id == version_id)
+            .where(NutritionAverage.food_id == food_id)
+        ),
+        "averages_by_food": select(NutritionAverage).where(NutritionAverage.food_id == food_id),
+        "food_aggregates": (
+            select(NutritionAggregate)
+            .where(NutritionAggregate.food_id == food_id)
+            .order_by(NutritionAggregate.nutrition_id)
+        ),
+        "entry_partials_one_group": entry_partials(
+            NutritionEntry.food_id == food_id, NutritionEntry.nutrition_id == "H001"
+        ),
+        "entry_partials_all": entry_partials(),
+        "outlier_scan": select(
+            NutritionEntry.id,
+            NutritionEntry.value,
+            func.dense_rank().over(order_by=(NutritionEntry.food_id, NutritionEntry.nutrition_id)) - 1,
+            has_flag,
+        ),
+        "pending_outlier_flags": (
+            select(OutlierFlag)
+            .where(OutlierFlag.decision == "pending")
+            .order_by(OutlierFlag.created_at, OutlierFlag.id)
+            .limit(100)
+        ),
+    }
+
+
+def plan_nodes(plan: dict) -> list[str]:
+    # Flatten a JSON plan into "Node Type [on relation] [using index]" strings
+    node = plan["Node Type"]
+    if "Relation Name" in plan:
+        node += f" on {plan['Relation Name']}"
+    if "Index Name" in plan:
+        node += f" using {plan['Index Name']}"
+    return [node] + [child for sub in plan.get("Plans", []) for child in plan_nodes(sub)]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    async with engine.connect() as connection:
+        if args.seed:
+            await seed(connection, args.foods, args.nutrients, args.entries, args.versions, args.random_seed)
+            await connection.commit()
+            # Fresh statistics and visibility maps, as autovacuum would leave them
+            autocommit = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            for table in TABLES:
+                await autocommit.execute(text(f"VACUUM ANALYZE {table}"))
+
+        sizes = {}
+        for model in (FoodItem, NutritionEntry, NutritionAverage, NutritionAggregate, OutlierFlag, SystemVersion):
+            sizes[model.__tablename__] = (await connection.execute(select(func.count()).select_from(model))).scalar()
+
+        results = {}
+        for name, statement in (await queries(connection)).items():
+            sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+            explained = await connection.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"))
+            plan = explained.scalar()[0]
+
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                await connection.execute(text(sql))
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+
+            results[name] = {
+                "sql": sql,
+                "nodes": plan_nodes(plan["Plan"]),
+                "plan": plan,
+                "latency_ms": {
+                    "mean": statistics.fmean(latencies),
+                    "p50": latencies[len(latencies) // 2],
+                    "p95": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+                },
+            }
+            print(f"{name:28} p50 {results[name]['latency_ms']['p50']:9.2f} ms  {', '.join(results[name]['nodes'][:3])}")
+
+    await engine.dispose()
+    return {"recorded_at": datetime.utcnow().isoformat(), "table_sizes": sizes, "queries": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="empty and refill the nutrition tables first")
+    parser.add_argument("--foods", type=int, default=10_000)
+    parser.add_argument("--nutrients", type=int, default=40)
+    parser.add_argument("--entries", type=int, default=2, help="entries per (food, nutrient)")
+    parser.add_argument("--versions", type=int, default=3)
+    parser.add_argument("--random-seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--output", help="write plans and latencies to this JSON file")
+    scratch.add_argument(parser)
+    args = parser.parse_args()
+    if args.seed:
+        scratch.confirm(args, "the nutrition tables")
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Check the number of SQL statements each endpoint issues against the budgets
+checked in to benchmarks/query_budgets.json.
+
+Endpoints are called in-process, as in the load benchmark, against a small
+fixed fixture: bench users, who follow one another, recipes and nutrition
+data. Every run empties the tables and seeds the fixture afresh, so neither
+earlier runs nor the rows their create and save requests added change the
+counts; it needs a scratch database, confirmed with --yes. Caches are
+warmed before each endpoint, so the counts are those of a steady-state
+request and don't depend on which endpoints ran before. Each endpoint is
+called a few times and its worst request counts.
+
+    python -m benchmarks.query_budget --yes
+    python -m benchmarks.query_budget --yes --update
+
+tests/test_query_budgets.py runs the same check when SCRATCH_DATABASE names
+the configured database.
+
+Exits non-zero when an endpoint goes over its budget or has none, printing
+a diff of the budget file against the measured counts and the statements
+of each offending request grouped by shape, so a per-item query shows up
+as one statement run many times. --update writes the measured counts as
+the new budgets, to commit along with a change that needs them.
+"""
+import os
+import json
+import random
+import asyncio
+import difflib
+import argparse
+from collections import Counter
+
+import httpx
+from sqlalchemy import text
+from sqlmodel import select
+
+from app.main import app
+from app.core import limits, timing
+from app.core.db import AsyncSessionLocal, engine
+from app.core.nplusone import fingerprint
+from app.models.user import User
+from benchmarks import api_load, dataset, scratch
+
+
+BUDGETS = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+# Small, but more rows than a page, so per-row queries show in list endpoints
+FIXTURE = argparse.Namespace(users=5, recipes=40, foods=100, random_seed=0)
+FOLLOWS_PER_USER = 3
+REQUESTS = 5
+
+
+# Unlike the load benchmark's random words, always matches, so the results'
+# per-row queries show
+def search_recipes(rng, context):
+    return "GET", "/recipes/search", {
+        "params": {"query": rng.choice(api_load.DISHES), "limit": 20}, "headers": rng.choice(context["tokens"])
+    }
+
+
+# Endpoints beyond the load benchmark's scenarios that list rows per request
+def feed(rng, context):
+    return "GET", "/users/me/feed", {"params": {"limit": 20}, "headers": rng.choice(context["tokens"])}
+
+def saved_recipes(rng, context):
+    return "GET", "/users/me/saved-recipes", {"params": {"limit": 20}, "headers": rng.choice(context["tokens"])}
+
+def followers(rng, context):
+    return "GET", f"/users/{rng.choice(context['user_ids'])}/followers", {"headers": rng.choice(context["tokens"])}
+
+def user_profile(rng, context):
+    return "GET", f"/users/{rng.choice(context['user_ids'])}/profile", {"headers": rng.choice(context["tokens"])}
+
+def flattened_recipe(rng, context):
+    return "GET", f"/recipes/{rng.choice(context['recipe_ids'])}/flattened", {}
+
+
+ENDPOINTS = {
+    **api_load.SCENARIOS,
+    **{
+        scenario.__name__: scenario
+        for scenario in (search_recipes, feed, saved_recipes, followers, user_profile, flattened_recipe)
+    },
+}
+
+
+async def load_context(context: dict) -> None:
+    await api_load.load_context(context)
+    async with AsyncSessionLocal() as session:
+        # Same order as the tokens
+        context["user_ids"] = [str(user_id) for user_id in (await session.execute(
+            select(User.id).where(User.email.like("bench-load-%")).order_by(User.email)
+        )).scalars()]
+
+
+async def seed(client: httpx.AsyncClient, context: dict) -> None:
+    async with engine.begin() as connection:
+        await connection.execute(text(f"TRUNCATE {', '.join(dataset.TABLES)} CASCADE"))
+    await api_load.seed(client, random.Random(FIXTURE.random_seed), FIXTURE, context)
+    await load_context(context)
+    # Each user follows the next few, through the API so timelines fill
+    users = list(zip(context["user_ids"], context["tokens"]))
+    for i, (_, headers) in enumerate(users):
+        for followed_id, _ in users[i + 1:i + 1 + FOLLOWS_PER_USER]:
+            (await client.post(f"/users/{followed_id}/follow", headers=headers)).raise_for_status()
+
+
+def lift_rate_limits() -> None:
+    # Logins are measured repeatedly, from one address and for one account
+    for limiter in limits.limiters.values():
+        if isinstance(limiter, limits.TokenBucketLimiter):
+            limiter.rate = limiter.burst = 1_000_000
+
+
+async def warm(client: httpx.AsyncClient, context: dict) -> None:
+    # Token and user caches, as in a worker that has served these users;
+    # writes evict the user they change
+    for headers in context["tokens"]:
+        (await client.get("/users/me", headers=headers)).raise_for_status()
+
+
+async def measure(client: httpx.AsyncClient, scenario, context: dict, requests: int) -> tuple[int, list[str]]:
+    """
+    Call an endpoint `requests` times and return the most statements one
+    call ran, with those statements.
+    """
+    worst = None
+    rng = random.Random(FIXTURE.random_seed)
+    for _ in range(requests):
+        method, url, kwargs = scenario(rng, context)
+        with timing.tracking() as tracked:
+            response = await client.request(method, url, **kwargs)
+        if response.status_code >= 400:
+            raise SystemExit(f"{scenario.__name__}: {method} {url} returned {response.status_code}: {response.text[:500]}")
+        if worst is None or tracked.queries > worst.queries:
+            worst = tracked
+    return worst.queries, [statement for _, statement in worst.statements]
+
+
+async def check(endpoints: list[str], requests: int = REQUESTS) -> tuple[dict[str, int], dict[str, list[str]]]:
+    """
+    Seed the fixture and measure each endpoint. Returns the statement counts
+    and the statements of each endpoint's worst request.
+    """
+    lift_rate_limits()
+    context: dict = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+        await seed(client, context)
+        measured, statements = {}, {}
+        for name in endpoints:
+            await warm(client, context)
+            await measure(client, ENDPOINTS[name], context, 1)
+            measured[name], statements[name] = await measure(client, ENDPOINTS[name], context, requests)
+    await engine.dispose()
+    return measured, statements
+
+
+def load_budgets() -> dict[str, int]:
+    if not os.path.exists(BUDGETS):
+        return {}
+    with open(BUDGETS) as f:
+        return json.load(f)
+
+
+def report(budgets: dict[str, int], measured: dict[str, int], statements: dict[str, list[str]]) -> list[str]:
+    """
+    Print how the measured counts compare with the budgets and return the
+    endpoints that fail: over budget or without one.
+    """
+    failed = [name for name, count in measured.items() if count > budgets.get(name, -1)]
+    for name, count in measured.items():
+        budget = budgets.get(name)
+        note = "NO BUDGET" if budget is None else "OVER BUDGET" if count > budget else ""
+        print(f"{name:18} {count:4} statements  budget {budget if budget is not None else '-':>4}  {note}")
+    if not failed:
+        under = [name for name, count in measured.items() if count < budgets[name]]
+        if under:
+            print(f"\nUnder budget: {', '.join(under)}. Tighten with --update.")
+        return failed
+
+    print()
+    print("".join(difflib.unified_diff(
+        json.dumps(budgets, indent=2).splitlines(keepends=True),
+        json.dumps({**budgets, **measured}, indent=2).splitlines(keepends=True),
+        fromfile="query_budgets.json",
+        tofile="measured",
+    )))
+    for name in failed:
+        print(f"\n{name} ran:")
+        for shape, runs in Counter(fingerprint(statement) for statement in statements[name]).most_common():
+            print(f"  {runs:4} x {shape[:300]}")
+    return failed
+
+
+def run(args: argparse.Namespace) -> None:
+    measured, statements = asyncio.run(check(args.endpoints, args.requests))
+    budgets = load_budgets()
+    if args.update:
+        with open(BUDGETS, "w") as f:
+            json.dump({**budgets, **measured}, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {len(measured)} budgets to {BUDGETS}")
+        return
+    if report(budgets, measured, statements):
+        raise SystemExit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="calls per endpoint")
+    parser.add_argument("--update", action="store_true", help="write the measured counts as the budgets")
+    scratch.add_argument(parser)
+    args = parser.parse_args()
+    scratch.confirm(args, "every application table")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
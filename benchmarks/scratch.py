@@ -0,0 +1,31 @@
+"""
+Guard for benchmarks that empty tables, so pointing one at the wrong
+database by accident doesn't wipe it.
+"""
+import os
+import argparse
+
+from app.core.config import settings
+
+
+def add_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--yes", action="store_true", help="confirm the configured database is a scratch one that may be emptied"
+    )
+
+
+def is_scratch() -> bool:
+    # Confirmation without --yes, as for tests: SCRATCH_DATABASE names the configured database
+    return os.environ.get("SCRATCH_DATABASE") == settings.POSTGRES_DB
+
+
+def confirm(args: argparse.Namespace, tables: str) -> None:
+    """
+    Exit unless --yes was given or SCRATCH_DATABASE names the database,
+    naming the database that would be emptied.
+    """
+    if not (args.yes or is_scratch()):
+        raise SystemExit(
+            f"This empties {tables} in database {settings.POSTGRES_DB!r} on "
+            f"{settings.POSTGRES_SERVER}:{settings.POSTGRES_PORT}. Pass --yes if it is a scratch database."
+        )
@@ -0,0 +1,35 @@
+import pytest
+from starlette.requests import Request
+
+from app.core import limits
+from app.core.config import settings
+
+
+def _request(client: str, headers: dict[str, str]) -> Request:
+    return Request({
+        "type": "http",
+        "client": (client, 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.mark.parametrize("trusted, headers, ip", [
+    # Without trusted proxies, forwarding headers are ignored
+    ([], {"X-Forwarded-For": "203.0.113.7"}, "10.0.0.2"),
+    (["10.0.0.2"], {"X-Forwarded-For": "203.0.113.7"}, "203.0.113.7"),
+    # A client can prepend anything; only the hop added by a trusted proxy counts
+    (["10.0.0.2"], {"X-Forwarded-For": "198.51.100.1, 203.0.113.7"}, "203.0.113.7"),
+    (["10.0.0.2", "10.0.0.3"], {"X-Forwarded-For": "198.51.100.1, 203.0.113.7, 10.0.0.3"}, "203.0.113.7"),
+    (["*"], {"X-Forwarded-For": "203.0.113.7, 10.0.0.3"}, "203.0.113.7"),
+    (["10.0.0.2"], {"Forwarded": 'for=198.51.100.1, for="203.0.113.7:4711";proto=https'}, "203.0.113.7"),
+    (["10.0.0.2"], {"Forwarded": 'for="[2001:db8::1]:4711"'}, "2001:db8::1"),
+    (["10.0.0.2"], {}, "10.0.0.2"),
+])
+def test_client_ip(monkeypatch, trusted, headers, ip):
+    monkeypatch.setattr(settings, "FORWARDED_ALLOW_IPS", trusted)
+    assert limits.client_ip(_request("10.0.0.2", headers)) == ip
+
+
+def test_untrusted_client_cannot_forward(monkeypatch):
+    monkeypatch.setattr(settings, "FORWARDED_ALLOW_IPS", ["10.0.0.2"])
+    assert limits.client_ip(_request("198.51.100.9", {"X-Forwarded-For": "203.0.113.7"})) == "198.51.100.9"
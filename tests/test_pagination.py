@@ -0,0 +1,31 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import pagination
+
+
+ID = uuid.UUID("6f1c2b9e-8d4a-4c3e-9b7a-2e5f0d1c3a4b")
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = pagination.encode_cursor(created_at, ID)
+    # Safe in a query string as is
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+    assert pagination.decode_cursor(cursor) == (created_at, ID)
+
+
+def test_position_cursor_round_trip():
+    assert pagination.decode_position_cursor(pagination.encode_position_cursor(7, ID)) == (7, ID)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", f"2024-05-01T12:30:15_{ID}", "////", "gA"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        pagination.decode_cursor(cursor)
+    assert error.value.status_code == 422
+    with pytest.raises(HTTPException):
+        pagination.decode_position_cursor(cursor)
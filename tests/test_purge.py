@@ -0,0 +1,90 @@
+import json
+import uuid
+import random
+import asyncio
+
+import pytest
+from sqlmodel import select
+
+import app.main  # noqa: F401  (every model mapped)
+from app.core.db import AsyncSessionLocal, engine
+from app.crud import crud_recipe, crud_user
+from app.models.recipe.recipe import Recipe, RecipeCreate
+from app.models.user import User
+from app.utils import purge
+from app.utils.sub_recipes import flatten_recipe
+from benchmarks import api_load, scratch
+
+
+pytestmark = pytest.mark.skipif(
+    not scratch.is_scratch(), reason="writes to the database; set SCRATCH_DATABASE to its name to run"
+)
+
+
+async def _user(session, name: str) -> User:
+    user = User(email=f"{name}@purge.test", username=name, password_hash="x")
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+async def _recipe(session, author: User, sub_recipe: Recipe | None = None) -> Recipe:
+    with open("app/data/recipe.json") as f:
+        data = json.loads(api_load.recipe_upload(random.Random(), json.load(f), ["Purge"]))
+    data["author_id"] = author.id
+    if sub_recipe:
+        data["ingredients"].append({
+            "type": "sub_recipe",
+            "recipe_id": str(sub_recipe.id),
+            "internal_id": "C0FF",
+            "quantity": {"value": 1, "unit_id": "B001"},
+        })
+    return await crud_recipe.create_recipe(session, RecipeCreate.model_validate(data), "purge.json")
+
+
+async def _exists(session, model, id: uuid.UUID) -> bool:
+    result = await session.execute(
+        select(model.id).where(model.id == id).execution_options(include_deleted=True)
+    )
+    return result.first() is not None
+
+
+async def _scenario():
+    suffix = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as session:
+        leaving = await _user(session, f"leaving-{suffix}")
+        staying = await _user(session, f"staying-{suffix}")
+        nested = await _recipe(session, leaving)
+        loose = await _recipe(session, leaving)
+        parent = await _recipe(session, staying, sub_recipe=nested)
+        nested_id, loose_id, parent_id = nested.id, loose.id, parent.id
+        leaving_id, staying_id = leaving.id, staying.id
+
+        await crud_user.delete_user(session=session, db_user=leaving)
+        # Their recipes disappear with them, not when the purge runs
+        visible = await session.execute(select(Recipe.id).where(Recipe.id.in_([nested_id, loose_id])))
+        assert visible.first() is None
+
+        await purge.purge_deleted(session)
+        assert not await _exists(session, Recipe, loose_id)
+        # Still nested by a live recipe, so kept along with its author
+        assert await _exists(session, Recipe, nested_id)
+        assert await _exists(session, User, leaving_id)
+        parent = await session.get(Recipe, parent_id)
+        flattened = await flatten_recipe(session, parent)
+        assert flattened.ingredients
+
+        await crud_recipe.delete_recipe(session, parent)
+        await purge.purge_deleted(session)
+        for model, id in [(Recipe, parent_id), (Recipe, nested_id), (User, leaving_id)]:
+            assert not await _exists(session, model, id)
+
+        await session.delete(await session.get(User, staying_id))
+        await session.commit()
+    # Pooled connections belong to this event loop
+    await engine.dispose()
+
+
+def test_purge_keeps_recipes_nested_by_others():
+    asyncio.run(_scenario())
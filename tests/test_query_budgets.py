@@ -0,0 +1,13 @@
+import asyncio
+
+import pytest
+
+from benchmarks import query_budget, scratch
+
+
+@pytest.mark.skipif(
+    not scratch.is_scratch(), reason="empties the database; set SCRATCH_DATABASE to its name to run"
+)
+def test_query_budgets():
+    measured, statements = asyncio.run(query_budget.check(list(query_budget.ENDPOINTS)))
+    assert not query_budget.report(query_budget.load_budgets(), measured, statements)
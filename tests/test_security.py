@@ -0,0 +1,16 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.core import security
+
+
+@pytest.mark.parametrize("method", ["scrypt", "scrypt:32768:8:1", "pbkdf2:sha256", "pbkdf2:sha256:600000"])
+def test_hash_with_current_method_needs_no_rehash(monkeypatch, method):
+    monkeypatch.setattr(security, "_HASH_PREFIX", security._stored_method(method))
+    assert not security.needs_rehash(generate_password_hash("secret", method))
+
+
+def test_hash_with_other_method_needs_rehash(monkeypatch):
+    monkeypatch.setattr(security, "_HASH_PREFIX", security._stored_method("scrypt"))
+    assert security.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256"))
+    assert security.needs_rehash(generate_password_hash("secret", "scrypt:16384:8:1"))
@@ -0,0 +1,55 @@
+import json
+import uuid
+import asyncio
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from app.utils import version_diff
+
+
+FOODS = [uuid.UUID(int=1), uuid.UUID(int=2)]
+
+
+class _Session:
+    async def get(self, model, key):
+        return object()
+
+
+def _versions(monkeypatch, versions: dict[str, tuple[list[float], list[float]]]) -> None:
+    # Each version holds (energy, protein) averages of the first food only
+    async def load(session, version_id):
+        values = np.array(versions[version_id][0] + versions[version_id][1])
+        return [FOODS[0]], ["energy", "protein"], np.array([0, 0]), np.array([0, 1]), values
+
+    async def is_version_published(session, version_id):
+        return False
+
+    monkeypatch.setattr(version_diff, "_load", load)
+    monkeypatch.setattr(version_diff, "is_version_published", is_version_published)
+
+
+def test_compare_change_away_from_zero_is_infinite():
+    keys, kinds, base, target, relatives = version_diff.compare(
+        np.array([0, 1, 2]), np.array([0.0, 0.0, 10.0]),
+        np.array([0, 1, 2]), np.array([5.0, 0.0, 10.0]),
+        0.01,
+    )
+    assert keys.tolist() == [0]
+    assert kinds.tolist() == [version_diff.KINDS.index("changed")]
+    assert np.isinf(relatives[0])
+
+
+def test_diff_from_zero_serialises_without_relative_change(monkeypatch):
+    _versions(monkeypatch, {"base": ([0.0], [10.0]), "target": ([5.0], [12.0])})
+
+    diff = asyncio.run(version_diff.diff_versions(_Session(), "base", "target"))
+
+    assert diff.changed == 2
+    # Infinite change sorts first and has no relative change
+    assert [entry.nutrition_id for entry in diff.data] == ["energy", "protein"]
+    assert diff.data[0].relative_change is None
+    assert (diff.data[0].base_value, diff.data[0].target_value) == (0.0, 5.0)
+    assert diff.data[1].relative_change == 0.2
+    # As the response is rendered, which rejects infinities
+    json.dumps(jsonable_encoder(diff), allow_nan=False)